@@ -1,6 +1,6 @@
 
 from typing import Generator, Optional
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import jwt, JWTError
 from sqlalchemy.ext.asyncio import AsyncSession
@@ -14,6 +14,8 @@ from app.services.llm import LLMService
 from app.services.storage import MinIOService
 from app.services.summary import SummaryService
 from app.services.flashcard import FlashcardService
+from app.services.ingestion import IngestionWorker
+from app.services.jobs import JobRunner
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl=f"{config.settings.API_STR}/auth/login/access-token")
 
@@ -50,16 +52,20 @@ async def get_current_user(
         raise credentials_exception
     return user
 
-def get_rag_service() -> RagService:
-    return RagService(
-        qdrant_url=config.settings.QDRANT_URL,
-        qdrant_api_key=config.settings.QDRANT_API_KEY
-    )
+def get_rag_service(request: Request) -> RagService:
+    # RagService được khởi tạo 1 lần trong lifespan (app/main.py)
+    return request.app.state.rag_service
 
-def get_llm_service() -> LLMService:
-    return LLMService(
-        api_key=config.settings.GOOGLE_API_KEY
-    )
+def get_llm_service(request: Request) -> LLMService:
+    # LLMService được khởi tạo 1 lần trong lifespan (app/main.py)
+    return request.app.state.llm_service
+
+def get_ingestion_worker(request: Request) -> IngestionWorker:
+    return request.app.state.ingestion_worker
+
+def get_job_runner(request: Request) -> Optional[JobRunner]:
+    # None khi job runner chạy ở process riêng (JOB_RUNNER_ENABLED=False)
+    return request.app.state.job_runner
 
 def get_storage_service() -> MinIOService:
     return MinIOService()
@@ -1,31 +1,53 @@
 
+import json
 import shutil
 import tempfile
 import os
+import time
 from pathlib import Path
 import logging
-from typing import Any, List, Optional
+from typing import Any, Dict, List, Optional
 logger = logging.getLogger(__name__)
 
 
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status, UploadFile, File
+from fastapi.encoders import jsonable_encoder
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from sqlalchemy.orm import selectinload
 
 from app.api import deps
+from app.core.database import SessionLocal
 from app.models.user import User
 from app.models.chat import ChatSession, ChatMessage
-from app.models.document import Document, DocumentStatus
+from app.models.document import Document, DocumentIngestion, DocumentStatus
 from app.schemas import chat as chat_schema
+from app.schemas.document import (
+    DocumentChunkInfo,
+    DocumentChunkList,
+    DocumentContentChunk,
+    DocumentMetadata,
+    DocumentStatusResponse,
+    IngestionResult,
+    UploadResponse,
+)
 from app.schemas import summary as summary_schema
 from app.services.rag.service import RagService, QueryWithLLMResult
+from app.services.document_content import get_document_content, load_content_infos
+from app.services.ingestion import IngestionJob, IngestionQueueFullError, IngestionWorker
 from app.services.llm import LLMService
 from app.services.storage import MinIOService
 from app.services.summary import SummaryService
 
 router = APIRouter()
 
+# Chu kỳ kiểm tra lại trạng thái document khi stream status
+DOCUMENT_STATUS_POLL_SECONDS = 2.0
+# Thời gian tối đa của 1 stream status, hết hạn thì gửi event `timeout` (client mở lại hoặc poll /status)
+DOCUMENT_STATUS_STREAM_MAX_SECONDS = 600.0
+
 @router.get("/", response_model=chat_schema.PaginatedChatSessionSummary)
 async def list_chats(
     db: AsyncSession = Depends(deps.get_db),
@@ -158,6 +180,7 @@ async def send_message(
     user_id_str = str(current_user.id)
     chat_id = chat.id
     has_docs = len(chat.documents) > 0
+    metadata_filter = _document_scope(chat, request.document_ids)
 
     # 2. Save User Message
     user_msg = ChatMessage(
@@ -173,6 +196,7 @@ async def send_message(
     # We can also use request.use_rag flag to force behavior if needed.
     ai_response_content = ""
     sources = []
+    retrieved_k = None
 
     try:
         if has_docs and request.use_rag:
@@ -184,13 +208,14 @@ async def send_message(
                 session_id=str(chat_id),
                 question=request.question,
                 llm_service=llm_service,
-                k=5
+                metadata_filter=metadata_filter,
             )
             ai_response_content = rag_result.answer["content"]
             sources = rag_result.answer["references"]
+            retrieved_k = rag_result.chosen_k
         else:
             # Social Chat (No RAG)
-            ai_response_content = llm_service.generate(prompt=request.question)
+            ai_response_content = await llm_service.agenerate(prompt=request.question)
             sources = [] # No sources
             
         # 4. Save AI Message
@@ -210,21 +235,129 @@ async def send_message(
         await db.commit()
         await db.refresh(ai_msg)
         
-        return ai_msg
+        return chat_schema.ChatMessage.model_validate(ai_msg).model_copy(update={"retrieved_k": retrieved_k})
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@router.post("/{session_id}/files", response_model=Any)
+def _document_scope(chat: ChatSession, document_ids: Optional[List[int]]) -> Optional[Dict[str, Any]]:
+    """metadata_filter cho các document được chọn (document_id lưu dạng str trong metadata)"""
+    if document_ids is None:
+        return None
+    chat_document_ids = {doc.id for doc in chat.documents}
+    selected = set(document_ids)
+    if not selected or not selected <= chat_document_ids:
+        raise HTTPException(status_code=400, detail="One or more documents not found")
+    return {"document_id": [str(doc_id) for doc_id in sorted(selected)]}
+
+def _sse_event(event: str, data: Any) -> str:
+    """Format 1 event theo chuẩn Server-Sent Events"""
+    return f"event: {event}\ndata: {json.dumps(jsonable_encoder(data), ensure_ascii=False)}\n\n"
+
+@router.post("/{session_id}/messages/stream")
+async def stream_message(
+    session_id: int,
+    request: chat_schema.ChatRequest,
+    db: AsyncSession = Depends(deps.get_db),
+    current_user: User = Depends(deps.get_current_user),
+    rag_service: RagService = Depends(deps.get_rag_service),
+    llm_service: LLMService = Depends(deps.get_llm_service),
+) -> StreamingResponse:
+    """
+    Send a message to the chat and stream the answer over Server-Sent Events.
+
+    Events: `sources` (references, RAG only), `delta` (answer text),
+    `done` (saved ChatMessage), `error`.
+    """
+    # 1. Get Chat
+    result = await db.execute(
+        select(ChatSession)
+        .filter(ChatSession.id == session_id, ChatSession.user_id == current_user.id)
+        .options(selectinload(ChatSession.documents))
+    )
+    chat = result.scalars().first()
+    if not chat:
+        raise HTTPException(status_code=404, detail="Chat not found")
+
+    user_id_str = str(current_user.id)
+    chat_id = chat.id
+    use_rag = len(chat.documents) > 0 and request.use_rag
+    metadata_filter = _document_scope(chat, request.document_ids)
+
+    # 2. Save User Message
+    user_msg = ChatMessage(
+        session_id=chat_id,
+        role="user",
+        content=request.question
+    )
+    db.add(user_msg)
+    await db.commit()
+
+    async def event_stream():
+        ai_response_content = ""
+        sources = []
+        retrieved_k = None
+        try:
+            # 3. Stream with RAG or Social
+            if use_rag:
+                async for event in rag_service.stream_query_with_llm(
+                    user_id=user_id_str,
+                    session_id=str(chat_id),
+                    question=request.question,
+                    llm_service=llm_service,
+                    metadata_filter=metadata_filter,
+                ):
+                    if event.event == "result":
+                        ai_response_content = event.data.answer["content"]
+                        sources = event.data.answer["references"]
+                        retrieved_k = event.data.chosen_k
+                    elif event.event == "delta":
+                        yield _sse_event("delta", {"content": event.data})
+                    else:
+                        yield _sse_event(event.event, event.data)
+            else:
+                parts = []
+                async for delta in llm_service.astream_generate(prompt=request.question):
+                    parts.append(delta)
+                    yield _sse_event("delta", {"content": delta})
+                ai_response_content = "".join(parts).strip()
+
+            # 4. Save AI Message once the answer is complete
+            # Request-scoped session is closed while streaming, so open a new one
+            async with SessionLocal() as stream_db:
+                ai_msg = ChatMessage(
+                    session_id=chat_id,
+                    role="ai",
+                    content=ai_response_content,
+                    sources=sources
+                )
+                stream_db.add(ai_msg)
+                await stream_db.commit()
+                await stream_db.refresh(ai_msg)
+
+            done = chat_schema.ChatMessage.model_validate(ai_msg).model_copy(update={"retrieved_k": retrieved_k})
+            yield _sse_event("done", done)
+
+        except Exception as e:
+            logger.error(f"Failed to stream answer for chat {chat_id}: {e}")
+            yield _sse_event("error", {"detail": str(e)})
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@router.post("/{session_id}/files", response_model=UploadResponse, status_code=status.HTTP_202_ACCEPTED)
 async def upload_file(
     session_id: int,
     file: UploadFile = File(...),
     db: AsyncSession = Depends(deps.get_db),
     current_user: User = Depends(deps.get_current_user),
     storage_service: MinIOService = Depends(deps.get_storage_service),
-    rag_service: RagService = Depends(deps.get_rag_service),
+    ingestion_worker: IngestionWorker = Depends(deps.get_ingestion_worker),
 ) -> Any:
-    """Upload a file to the chat and ingest it."""
+    """Upload a file to the chat and queue it for ingestion."""
     # 1. Get Chat
     result = await db.execute(
         select(ChatSession).filter(ChatSession.id == session_id, ChatSession.user_id == current_user.id)
@@ -232,97 +365,214 @@ async def upload_file(
     chat = result.scalars().first()
     if not chat:
         raise HTTPException(status_code=404, detail="Chat not found")
-    
-    user_id_str = str(current_user.id)
-
-    # 2. Save to MinIO
-    # We need to save to temp file first to be able to upload path or fileobj
-    # MinIOService supports upload_fileobj, but RagService needs a Path to ingest.
-    # So best to save to temp file, Upload to MinIO (for persistence), and Ingest (for RAG).
 
+    # 2. Save to temp file and MinIO
+    # The ingestion job may run in another process, so it always reads the file from MinIO.
+    suffix = Path(file.filename).suffix
+    tmp_path = None
     try:
-        suffix = Path(file.filename).suffix
         with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmp:
-            shutil.copyfileobj(file.file, tmp)
+            await run_in_threadpool(shutil.copyfileobj, file.file, tmp)
             tmp_path = Path(tmp.name)
-        
-        # Upload to MinIO
+
         # Object name: chat_{id}/{filename}
         object_name = f"chat_{chat.id}/{file.filename}"
-        storage_service.upload_file(tmp_path, object_name=object_name, content_type=file.content_type)
-        
-        # 3. Add to DB Document
-        doc = Document(
-            session_id=chat.id,
-            filename=file.filename,
-            file_path=object_name,
-            status=DocumentStatus.PENDING
+        await run_in_threadpool(
+            storage_service.upload_file, tmp_path, object_name=object_name, content_type=file.content_type
         )
-        db.add(doc)
-        await db.commit()
-        await db.refresh(doc)
-        doc_id = doc.id
-        
-        # 4. Ingest RAG
-        # We use tmp_path for ingestion
-        try:
-            # Metadata: document_id, session_id...
-            metadata = {
-                "document_id": str(doc_id), # Use DB ID or let RagService gen UUID? 
-                # RagService gens UUID. We should map them. 
-                # RagService returns DocumentInfo with document_id.
-                # Maybe store Rag's UUID in DB? or just use DB ID in metadata.
-                "db_document_id": doc_id,
-                "session_id": session_id,
-                "file_name": file.filename
-            }
-            summary = await rag_service.ingest_file(
-                user_id=user_id_str,
-                session_id=str(session_id),
-                file_path=tmp_path,
-                metadata=metadata
+    except Exception as e:
+        logger.error(f"Failed to store uploaded file {file.filename}: {e}")
+        raise HTTPException(status_code=500, detail=f"Upload failed: {str(e)}")
+    finally:
+        if tmp_path and tmp_path.exists():
+            os.remove(tmp_path)
+
+    # 3. Add to DB Document, with its ingestion job in the same transaction
+    doc = Document(
+        session_id=chat.id,
+        filename=file.filename,
+        file_path=object_name,
+        status=DocumentStatus.PENDING
+    )
+    db.add(doc)
+    await db.flush()
+
+    # 4. Queue ingestion
+    try:
+        await ingestion_worker.enqueue(
+            db, IngestionJob.for_document(doc, current_user.id)
+        )
+    except IngestionQueueFullError as e:
+        # Rejected upload: leave no failed Document behind in the notebook
+        await db.rollback()
+        result = await db.execute(select(Document.id).filter(Document.file_path == object_name).limit(1))
+        if result.scalar() is None:
+            # Keep the object if another document with the same filename uses it
+            try:
+                await run_in_threadpool(storage_service.delete_file, object_name)
+            except Exception as exc:
+                logger.warning(f"Failed to remove rejected upload {object_name}: {exc}")
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=str(e))
+    await db.commit()
+    await db.refresh(doc)
+    ingestion_worker.notify()
+
+    return UploadResponse(message="File uploaded and queued for indexing", document_id=doc.id, status=doc.status)
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Weak comparison (RFC 9110) against a list of entity tags or "*"."""
+    if not if_none_match:
+        return False
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag == "*":
+            return True
+        if tag.startswith("W/"):
+            tag = tag[2:]
+        if tag == etag:
+            return True
+    return False
+
+async def _get_chat_document(session_id: int, document_id: int, user_id: int, db: AsyncSession) -> Document:
+    """Load a document, verifying the chat belongs to the user."""
+    result = await db.execute(
+        select(Document)
+        .join(ChatSession, ChatSession.id == Document.session_id)
+        .filter(
+            Document.id == document_id,
+            Document.session_id == session_id,
+            ChatSession.user_id == user_id,
+        )
+    )
+    doc = result.scalars().first()
+    if not doc:
+        raise HTTPException(status_code=404, detail="Document not found")
+    return doc
+
+async def _get_ingestion_result(document_id: int, db: AsyncSession) -> Optional[IngestionResult]:
+    result = await db.execute(
+        select(DocumentIngestion).filter(DocumentIngestion.document_id == document_id)
+    )
+    ingestion = result.scalars().first()
+    return IngestionResult.model_validate(ingestion) if ingestion else None
+
+@router.get("/{session_id}/documents/{document_id}/status", response_model=DocumentStatusResponse)
+async def get_document_status(
+    session_id: int,
+    document_id: int,
+    db: AsyncSession = Depends(deps.get_db),
+    current_user: User = Depends(deps.get_current_user),
+) -> Any:
+    """Get a document's ingestion status (for polling), with counts and timings once indexed."""
+    doc = await _get_chat_document(session_id, document_id, current_user.id, db)
+    response = DocumentStatusResponse.model_validate(doc)
+    if doc.status == DocumentStatus.INDEXED:
+        response.ingestion = await _get_ingestion_result(doc.id, db)
+    return response
+
+@router.get("/{session_id}/documents/{document_id}/chunks", response_model=DocumentChunkList)
+async def get_document_chunks(
+    session_id: int,
+    document_id: int,
+    offset: int = Query(0, ge=0, description="First chunk_index"),
+    limit: int = Query(50, ge=1, le=500),
+    include_content: bool = Query(False, description="Include each chunk's text"),
+    db: AsyncSession = Depends(deps.get_db),
+    current_user: User = Depends(deps.get_current_user),
+    rag_service: RagService = Depends(deps.get_rag_service),
+) -> Any:
+    """Chunk details of an indexed document (positions, optionally text), paged by chunk_index."""
+    doc = await _get_chat_document(session_id, document_id, current_user.id, db)
+    ingestion = await _get_ingestion_result(doc.id, db)
+
+    try:
+        chunks = await rag_service.list_document_chunks(str(session_id), str(doc.id), offset=offset, limit=limit)
+    except Exception as e:
+        logger.error(f"Failed to load chunks for doc {doc.id}: {e}")
+        raise HTTPException(status_code=500, detail="Failed to load document chunks")
+
+    return DocumentChunkList(
+        document_id=doc.id,
+        offset=offset,
+        limit=limit,
+        total=ingestion.chunk_count if ingestion else None,
+        chunks=[
+            DocumentChunkInfo(
+                chunk_index=chunk.metadata.get("chunk_index", 0),
+                start_char=chunk.metadata.get("start_char"),
+                end_char=chunk.metadata.get("end_char"),
+                page_index=chunk.metadata.get("page_index"),
+                page_start_char=chunk.metadata.get("page_start_char"),
+                page_end_char=chunk.metadata.get("page_end_char"),
+                content=chunk.page_content if include_content else None,
             )
-            
-            doc.status = DocumentStatus.INDEXED
-            await db.commit()
-            
-            return {"message": "File uploaded and indexed successfully", "document_id": doc_id, "rag_info": summary}
-            
-        except Exception as e:
-            import traceback
-            traceback.print_exc()
-            # Avoid accessing doc attributes if expired
-            # doc.status = DocumentStatus.FAILED
-            # await db.commit()
-            
-            # Use update statement instead
-            from sqlalchemy import update
-            await db.execute(
-                update(Document)
-                .where(Document.id == doc_id)
-                .values(status=DocumentStatus.FAILED)
+            for chunk in chunks
+        ],
+    )
+
+@router.get("/{session_id}/documents/{document_id}/events")
+async def stream_document_status(
+    session_id: int,
+    document_id: int,
+    request: Request,
+    db: AsyncSession = Depends(deps.get_db),
+    current_user: User = Depends(deps.get_current_user),
+    ingestion_worker: IngestionWorker = Depends(deps.get_ingestion_worker),
+) -> StreamingResponse:
+    """
+    Subscribe to a document's ingestion status over Server-Sent Events.
+    Emits a `status` event on every change and closes once indexed or failed,
+    or with a `timeout` event after DOCUMENT_STATUS_STREAM_MAX_SECONDS.
+    """
+    await _get_chat_document(session_id, document_id, current_user.id, db)
+
+    async def event_stream():
+        last_status = None
+        deadline = time.monotonic() + DOCUMENT_STATUS_STREAM_MAX_SECONDS
+        while True:
+            async with SessionLocal() as stream_db:
+                result = await stream_db.execute(
+                    select(Document.status).filter(Document.id == document_id)
+                )
+                current = result.scalar()
+            if current is None:
+                yield _sse_event("error", {"detail": "Document not found"})
+                return
+            if current != last_status:
+                last_status = current
+                payload = {"document_id": document_id, "status": current}
+                if current == DocumentStatus.INDEXED:
+                    async with SessionLocal() as stream_db:
+                        ingestion = await _get_ingestion_result(document_id, stream_db)
+                    payload["ingestion"] = ingestion.model_dump() if ingestion else None
+                yield _sse_event("status", payload)
+            if current != DocumentStatus.PENDING:
+                return
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                yield _sse_event("timeout", {"document_id": document_id, "status": current})
+                return
+            if await request.is_disconnected():
+                return
+            # Notified instantly when this process indexes the document,
+            # otherwise re-check the database periodically.
+            await ingestion_worker.wait_for_update(
+                document_id, timeout=min(DOCUMENT_STATUS_POLL_SECONDS, remaining)
             )
-            await db.commit()
-            
-            raise HTTPException(status_code=500, detail=f"Ingestion failed: {str(e)}")
-        finally:
-            # Cleanup temp file
-            if tmp_path.exists():
-                os.remove(tmp_path)
-                
-    except Exception as e:
-        import traceback
-        traceback.print_exc()
-        # Also log to logger if available
 
-@router.get("/{session_id}/documents", response_model=List[Any]) # Use Any or create specific schema in list
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@router.get("/{session_id}/documents", response_model=List[DocumentMetadata])
 async def get_chat_documents(
     session_id: int,
     db: AsyncSession = Depends(deps.get_db),
     current_user: User = Depends(deps.get_current_user),
-    storage_service: MinIOService = Depends(deps.get_storage_service),
 ) -> Any:
-    """Get all documents for a chat session with content."""
+    """Get all documents for a chat session (metadata only, see /documents/{id}/content)."""
     # 1. Get Chat to verify access
     result = await db.execute(
         select(ChatSession)
@@ -333,53 +583,98 @@ async def get_chat_documents(
     if not chat:
         raise HTTPException(status_code=404, detail="Chat not found")
 
-    from app.schemas.document import DocumentWithContent
-    from app.services.rag.converter import ConverterFactory
-    
-    docs_with_content = []
-    
-    # 2. Iterate docs and fetch content
+    # 2. Content length / page count without reading the text itself
+    infos = await load_content_infos(db, [doc.id for doc in chat.documents])
+
+    items = []
     for doc in chat.documents:
-        content = ""
-        tmp_path = None
-        try:
-            # Create temp file
-            suffix = Path(doc.filename).suffix
-            with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmp:
-                tmp_path = Path(tmp.name)
-            
-            # Download from MinIO
-            storage_service.download_file(doc.file_path, tmp_path)
-            
-            # Extract content
-            # Use ConverterFactory to extract text
-            converter = ConverterFactory.create("file")
-            # We assume simple extraction for now
-            extracted_docs = converter.convert(str(tmp_path))
-            
-            # Join content
-            content = "\n\n".join([d.page_content for d in extracted_docs])
-            
-        except Exception as e:
-            logger.error(f"Failed to load content for doc {doc.id}: {e}")
-            content = "Error loading content."
-        finally:
-            if tmp_path and tmp_path.exists():
-                os.remove(tmp_path)
-        
-        # Create response object
-        # We manually construct dict or Pydantic model
-        docs_with_content.append({
-            "id": doc.id,
-            "session_id": doc.session_id,
-            "filename": doc.filename,
-            "file_path": doc.file_path,
-            "status": doc.status,
-            "created_at": doc.created_at,
-            "content": content
-        })
-
-    return docs_with_content
+        info = infos.get(doc.id)
+        items.append(DocumentMetadata(
+            id=doc.id,
+            session_id=doc.session_id,
+            filename=doc.filename,
+            file_path=doc.file_path,
+            status=doc.status,
+            created_at=doc.created_at,
+            content_length=info.content_length if info else None,
+            page_count=len(info.page_offsets) if info else None,
+        ))
+
+    return items
+
+@router.get("/{session_id}/documents/{document_id}/content", response_model=DocumentContentChunk)
+async def get_document_content_range(
+    session_id: int,
+    document_id: int,
+    request: Request,
+    response: Response,
+    start: Optional[int] = Query(None, ge=0, description="Start character (inclusive)"),
+    end: Optional[int] = Query(None, ge=0, description="End character (exclusive)"),
+    page: Optional[int] = Query(None, ge=1, description="First page (1-based)"),
+    page_count: int = Query(1, ge=1, description="Number of pages from `page`"),
+    db: AsyncSession = Depends(deps.get_db),
+    current_user: User = Depends(deps.get_current_user),
+    storage_service: MinIOService = Depends(deps.get_storage_service),
+) -> Any:
+    """
+    Get a document's extracted text, whole or as a character range (start/end)
+    or page range (page/page_count). Supports ETag / If-None-Match.
+    """
+    if page is not None and (start is not None or end is not None):
+        raise HTTPException(status_code=400, detail="Use either start/end or page/page_count, not both")
+
+    doc = await _get_chat_document(session_id, document_id, current_user.id, db)
+
+    # ETag check before loading and decompressing the text
+    info = (await load_content_infos(db, [doc.id])).get(doc.id)
+    range_key = f"p{page}+{page_count}" if page is not None else f"c{start}-{end}"
+    if info is not None:
+        etag = f'"{info.content_hash[:32]}-{range_key}"'
+        if _etag_matches(request.headers.get("if-none-match"), etag):
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+
+    try:
+        stored = await get_document_content(doc, db, storage_service)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+    total_length = len(stored.content)
+    page_offsets = stored.page_offsets
+    total_pages = len(page_offsets)
+    page_start = page_end = None
+
+    if page is not None:
+        if page > total_pages:
+            raise HTTPException(
+                status_code=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE,
+                detail=f"Document has {total_pages} pages",
+            )
+        page_start = page
+        page_end = min(page + page_count - 1, total_pages)
+        start_char = page_offsets[page_start - 1]
+        # Các trang nối với nhau bằng "\n\n", không trả về separator cuối
+        end_char = page_offsets[page_end] - 2 if page_end < total_pages else total_length
+        end_char = max(start_char, min(end_char, total_length))
+    else:
+        start_char = min(start if start is not None else 0, total_length)
+        end_char = min(end if end is not None else total_length, total_length)
+        if end_char < start_char:
+            raise HTTPException(status_code=400, detail="end must be greater than or equal to start")
+
+    response.headers["ETag"] = f'"{stored.content_hash[:32]}-{range_key}"'
+    response.headers["Cache-Control"] = "private, no-cache"
+
+    return DocumentContentChunk(
+        document_id=doc.id,
+        content=stored.content[start_char:end_char],
+        start_char=start_char,
+        end_char=end_char,
+        total_length=total_length,
+        page_start=page_start,
+        page_end=page_end,
+        total_pages=total_pages,
+        page_offsets=page_offsets,
+    )
 
 @router.delete("/{session_id}/documents/{document_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_chat_document(
@@ -530,20 +825,9 @@ async def get_document_chapters(
     if not doc:
         raise HTTPException(status_code=404, detail="Document not found")
 
-    # 3. Download and extract content
-    tmp_path = None
+    # 3. Load stored content
     try:
-        suffix = Path(doc.filename).suffix
-        with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmp:
-            tmp_path = Path(tmp.name)
-        
-        storage_service.download_file(doc.file_path, tmp_path)
-        
-        # Extract content
-        from app.services.rag.converter import ConverterFactory
-        converter = ConverterFactory.create("file")
-        extracted_docs = converter.convert(str(tmp_path))
-        content = "\n\n".join([d.page_content for d in extracted_docs])
+        content = (await get_document_content(doc, db, storage_service)).content
         
         # 4. Extract chapters
         chapters = await summary_service.extract_chapters(content)
@@ -556,9 +840,6 @@ async def get_document_chapters(
     except Exception as e:
         logger.error(f"Failed to extract chapters for doc {document_id}: {e}")
         raise HTTPException(status_code=500, detail=f"Failed to extract chapters: {str(e)}")
-    finally:
-        if tmp_path and tmp_path.exists():
-            os.remove(tmp_path)
 
 
 @router.post("/{session_id}/documents/{document_id}/summarize", response_model=summary_schema.SummaryResponse)
@@ -590,20 +871,9 @@ async def summarize_document(
     if not doc:
         raise HTTPException(status_code=404, detail="Document not found")
 
-    # 3. Download and extract content
-    tmp_path = None
+    # 3. Load stored content
     try:
-        suffix = Path(doc.filename).suffix
-        with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmp:
-            tmp_path = Path(tmp.name)
-        
-        storage_service.download_file(doc.file_path, tmp_path)
-        
-        # Extract content
-        from app.services.rag.converter import ConverterFactory
-        converter = ConverterFactory.create("file")
-        extracted_docs = converter.convert(str(tmp_path))
-        content = "\n\n".join([d.page_content for d in extracted_docs])
+        content = (await get_document_content(doc, db, storage_service)).content
         
         # 4. Get chapters if needed for chapter scope
         chapters = None
@@ -669,7 +939,4 @@ async def summarize_document(
     except Exception as e:
         logger.error(f"Failed to summarize doc {document_id}: {e}")
         raise HTTPException(status_code=500, detail=f"Failed to generate summary: {str(e)}")
-    finally:
-        if tmp_path and tmp_path.exists():
-            os.remove(tmp_path)
 
@@ -2,13 +2,10 @@
 Flashcard API endpoints for flashcard generation feature.
 """
 
-import tempfile
-import os
-from pathlib import Path
 import logging
-from typing import Any, List
+from typing import Any, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, status, BackgroundTasks
+from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from sqlalchemy.orm import selectinload
@@ -17,139 +14,24 @@ from app.api import deps
 from app.models.user import User
 from app.models.chat import ChatSession
 from app.models.document import Document
-from app.models.flashcard import FlashcardSet, Flashcard, FlashcardStatus
+from app.models.flashcard import FlashcardSet, FlashcardStatus
 from app.schemas import flashcard as flashcard_schema
-from app.services.flashcard import FlashcardService
-from app.services.storage import MinIOService
+from app.core.config import settings
+from app.services.generation_jobs import FLASHCARD_GENERATION_JOB
+from app.services.jobs import JobRunner, enqueue_job
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
 
-async def _get_documents_content(
-    document_ids: List[int],
-    session_id: int,
-    db: AsyncSession,
-    storage_service: MinIOService
-) -> str:
-    """Helper to get combined content from multiple documents."""
-    from app.services.rag.converter import ConverterFactory
-    
-    # Get documents
-    result = await db.execute(
-        select(Document).filter(
-            Document.id.in_(document_ids),
-            Document.session_id == session_id
-        )
-    )
-    docs = result.scalars().all()
-    
-    if not docs:
-        raise HTTPException(status_code=404, detail="No documents found")
-    
-    all_content = []
-    
-    for doc in docs:
-        tmp_path = None
-        try:
-            suffix = Path(doc.filename).suffix
-            with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmp:
-                tmp_path = Path(tmp.name)
-            
-            storage_service.download_file(doc.file_path, tmp_path)
-            
-            converter = ConverterFactory.create("file")
-            extracted_docs = converter.convert(str(tmp_path))
-            content = "\n\n".join([d.page_content for d in extracted_docs])
-            
-            all_content.append(f"=== {doc.filename} ===\n{content}")
-            
-        except Exception as e:
-            logger.error(f"Failed to load content for doc {doc.id}: {e}")
-        finally:
-            if tmp_path and tmp_path.exists():
-                os.remove(tmp_path)
-    
-    return "\n\n".join(all_content)
-
-
-async def _generate_flashcards_background(
-    flashcard_set_id: int,
-    session_id: int,
-    document_ids: List[int],
-    num_cards: int,
-    db_session_factory,
-    storage_service: MinIOService,
-    flashcard_service: FlashcardService
-):
-    """Background task to generate flashcards."""
-    async with db_session_factory() as db:
-        try:
-            # Update status to generating
-            result = await db.execute(select(FlashcardSet).filter(FlashcardSet.id == flashcard_set_id))
-            flashcard_set = result.scalars().first()
-            if not flashcard_set:
-                logger.error(f"FlashcardSet {flashcard_set_id} not found")
-                return
-            
-            flashcard_set.status = FlashcardStatus.GENERATING
-            await db.commit()
-            
-            # Get document content
-            content = await _get_documents_content(
-                document_ids, session_id, db, storage_service
-            )
-            
-            if not content:
-                flashcard_set.status = FlashcardStatus.FAILED
-                await db.commit()
-                return
-            
-            # Generate flashcards
-            cards = await flashcard_service.generate_flashcards(
-                content=content,
-                num_cards=num_cards
-            )
-            
-            # Save cards to database
-            for card in cards:
-                flashcard = Flashcard(
-                    flashcard_set_id=flashcard_set_id,
-                    front_text=card["front_text"],
-                    back_text=card["back_text"],
-                    order_index=card["order_index"]
-                )
-                db.add(flashcard)
-            
-            # Update flashcard set status
-            flashcard_set.status = FlashcardStatus.COMPLETED
-            flashcard_set.num_cards = len(cards)
-            await db.commit()
-            
-            logger.info(f"FlashcardSet {flashcard_set_id} generated with {len(cards)} cards")
-            
-        except Exception as e:
-            logger.error(f"Failed to generate flashcard set {flashcard_set_id}: {e}")
-            try:
-                result = await db.execute(select(FlashcardSet).filter(FlashcardSet.id == flashcard_set_id))
-                flashcard_set = result.scalars().first()
-                if flashcard_set:
-                    flashcard_set.status = FlashcardStatus.FAILED
-                    await db.commit()
-            except Exception:
-                pass
-
-
 @router.post("/{session_id}/flashcards", response_model=flashcard_schema.FlashcardSetListItem)
 async def generate_flashcards(
     session_id: int,
     request: flashcard_schema.FlashcardGenerateRequest,
-    background_tasks: BackgroundTasks,
     db: AsyncSession = Depends(deps.get_db),
     current_user: User = Depends(deps.get_current_user),
-    storage_service: MinIOService = Depends(deps.get_storage_service),
-    flashcard_service: FlashcardService = Depends(deps.get_flashcard_service),
+    job_runner: Optional[JobRunner] = Depends(deps.get_job_runner),
 ) -> Any:
     """Generate a new flashcard set from selected documents."""
     # 1. Verify chat access
@@ -180,7 +62,7 @@ async def generate_flashcards(
         if len(docs) > 2:
             title += f" và {len(docs) - 2} tài liệu khác"
     
-    # 4. Create flashcard set record
+    # 4. Create flashcard set record and its generation job in one transaction
     flashcard_set = FlashcardSet(
         session_id=session_id,
         title=title,
@@ -189,21 +71,24 @@ async def generate_flashcards(
         num_cards=request.num_cards
     )
     db.add(flashcard_set)
+    await db.flush()
+    enqueue_job(
+        db,
+        FLASHCARD_GENERATION_JOB,
+        {
+            "flashcard_set_id": flashcard_set.id,
+            "session_id": session_id,
+            "document_ids": request.document_ids,
+            "num_cards": request.num_cards,
+        },
+        max_attempts=settings.JOB_MAX_ATTEMPTS,
+    )
     await db.commit()
     await db.refresh(flashcard_set)
     
-    # 5. Start background generation
-    from app.core.database import SessionLocal
-    background_tasks.add_task(
-        _generate_flashcards_background,
-        flashcard_set_id=flashcard_set.id,
-        session_id=session_id,
-        document_ids=request.document_ids,
-        num_cards=request.num_cards,
-        db_session_factory=SessionLocal,
-        storage_service=storage_service,
-        flashcard_service=flashcard_service
-    )
+    # 5. Wake up the local job runner (if any) instead of waiting for its next poll
+    if job_runner is not None:
+        job_runner.notify()
     
     return flashcard_set
 
@@ -2,13 +2,10 @@
 Quiz API endpoints for Q&A generation feature.
 """
 
-import tempfile
-import os
-from pathlib import Path
 import logging
-from typing import Any, List
+from typing import Any, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, status, BackgroundTasks
+from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from sqlalchemy.orm import selectinload
@@ -17,144 +14,24 @@ from app.api import deps
 from app.models.user import User
 from app.models.chat import ChatSession
 from app.models.document import Document
-from app.models.quiz import Quiz, QuizQuestion, QuizStatus, QuizType, QuestionType
+from app.models.quiz import Quiz, QuizStatus
 from app.schemas import quiz as quiz_schema
-from app.services.quiz import QuizService
-from app.services.storage import MinIOService
+from app.core.config import settings
+from app.services.generation_jobs import QUIZ_GENERATION_JOB
+from app.services.jobs import JobRunner, enqueue_job
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
 
-async def _get_documents_content(
-    document_ids: List[int],
-    session_id: int,
-    db: AsyncSession,
-    storage_service: MinIOService
-) -> str:
-    """Helper to get combined content from multiple documents."""
-    from app.services.rag.converter import ConverterFactory
-    
-    # Get documents
-    result = await db.execute(
-        select(Document).filter(
-            Document.id.in_(document_ids),
-            Document.session_id == session_id
-        )
-    )
-    docs = result.scalars().all()
-    
-    if not docs:
-        raise HTTPException(status_code=404, detail="No documents found")
-    
-    all_content = []
-    
-    for doc in docs:
-        tmp_path = None
-        try:
-            suffix = Path(doc.filename).suffix
-            with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmp:
-                tmp_path = Path(tmp.name)
-            
-            storage_service.download_file(doc.file_path, tmp_path)
-            
-            converter = ConverterFactory.create("file")
-            extracted_docs = converter.convert(str(tmp_path))
-            content = "\n\n".join([d.page_content for d in extracted_docs])
-            
-            all_content.append(f"=== {doc.filename} ===\n{content}")
-            
-        except Exception as e:
-            logger.error(f"Failed to load content for doc {doc.id}: {e}")
-        finally:
-            if tmp_path and tmp_path.exists():
-                os.remove(tmp_path)
-    
-    return "\n\n".join(all_content)
-
-
-async def _generate_quiz_background(
-    quiz_id: int,
-    session_id: int,
-    document_ids: List[int],
-    quiz_type: QuizType,
-    num_questions: int,
-    db_session_factory,
-    storage_service: MinIOService,
-    quiz_service: QuizService
-):
-    """Background task to generate quiz questions."""
-    async with db_session_factory() as db:
-        try:
-            # Update status to generating
-            result = await db.execute(select(Quiz).filter(Quiz.id == quiz_id))
-            quiz = result.scalars().first()
-            if not quiz:
-                logger.error(f"Quiz {quiz_id} not found")
-                return
-            
-            quiz.status = QuizStatus.GENERATING
-            await db.commit()
-            
-            # Get document content
-            content = await _get_documents_content(
-                document_ids, session_id, db, storage_service
-            )
-            
-            if not content:
-                quiz.status = QuizStatus.FAILED
-                await db.commit()
-                return
-            
-            # Generate questions
-            questions = await quiz_service.generate_questions(
-                content=content,
-                quiz_type=quiz_type,
-                num_questions=num_questions
-            )
-            
-            # Save questions to database
-            for q in questions:
-                question = QuizQuestion(
-                    quiz_id=quiz_id,
-                    question_text=q["question_text"],
-                    question_type=q["question_type"],
-                    options=q["options"],
-                    correct_answers=q["correct_answers"],
-                    explanation=q.get("explanation", ""),
-                    order_index=q["order_index"]
-                )
-                db.add(question)
-            
-            # Update quiz status
-            quiz.status = QuizStatus.COMPLETED
-            quiz.num_questions = len(questions)
-            await db.commit()
-            
-            logger.info(f"Quiz {quiz_id} generated with {len(questions)} questions")
-            
-        except Exception as e:
-            logger.error(f"Failed to generate quiz {quiz_id}: {e}")
-            try:
-                result = await db.execute(select(Quiz).filter(Quiz.id == quiz_id))
-                quiz = result.scalars().first()
-                if quiz:
-                    quiz.status = QuizStatus.FAILED
-                    await db.commit()
-            except Exception:
-                pass
-
-
 @router.post("/{session_id}/quizzes", response_model=quiz_schema.QuizListItem)
 async def generate_quiz(
     session_id: int,
     request: quiz_schema.QuizGenerateRequest,
-    background_tasks: BackgroundTasks,
     db: AsyncSession = Depends(deps.get_db),
     current_user: User = Depends(deps.get_current_user),
-    storage_service: MinIOService = Depends(deps.get_storage_service),
-    quiz_service: QuizService = Depends(deps.get_quiz_service),
+    job_runner: Optional[JobRunner] = Depends(deps.get_job_runner),
 ) -> Any:
     """Generate a new quiz from selected documents."""
     # 1. Verify chat access
@@ -185,7 +62,7 @@ async def generate_quiz(
         if len(docs) > 2:
             title += f" và {len(docs) - 2} tài liệu khác"
     
-    # 4. Create quiz record
+    # 4. Create quiz record and its generation job in one transaction
     quiz = Quiz(
         session_id=session_id,
         title=title,
@@ -195,22 +72,25 @@ async def generate_quiz(
         num_questions=request.num_questions
     )
     db.add(quiz)
+    await db.flush()
+    enqueue_job(
+        db,
+        QUIZ_GENERATION_JOB,
+        {
+            "quiz_id": quiz.id,
+            "session_id": session_id,
+            "document_ids": request.document_ids,
+            "quiz_type": request.quiz_type.value,
+            "num_questions": request.num_questions,
+        },
+        max_attempts=settings.JOB_MAX_ATTEMPTS,
+    )
     await db.commit()
     await db.refresh(quiz)
     
-    # 5. Start background generation
-    from app.core.database import SessionLocal
-    background_tasks.add_task(
-        _generate_quiz_background,
-        quiz_id=quiz.id,
-        session_id=session_id,
-        document_ids=request.document_ids,
-        quiz_type=request.quiz_type,
-        num_questions=request.num_questions,
-        db_session_factory=SessionLocal,
-        storage_service=storage_service,
-        quiz_service=quiz_service
-    )
+    # 5. Wake up the local job runner (if any) instead of waiting for its next poll
+    if job_runner is not None:
+        job_runner.notify()
     
     return quiz
 
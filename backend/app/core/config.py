@@ -28,9 +28,97 @@ class Settings(BaseSettings):
     # Qdrant
     QDRANT_URL: str = "http://localhost:6333"
     QDRANT_API_KEY: Optional[str] = None
+    # gRPC nhanh hơn REST/JSON khi upsert batch lớn (Qdrant mở cổng gRPC mặc định 6334)
+    QDRANT_PREFER_GRPC: bool = False
+    QDRANT_GRPC_PORT: int = 6334
+    # "per_chat": 1 collection / chat; "shared": mọi chat dùng chung collection, lọc theo session_id
+    # Chuyển dữ liệu cũ sang shared: python -m app.migrate_collections
+    QDRANT_COLLECTION_MODE: str = "per_chat"
+    QDRANT_SHARED_COLLECTION: str = "chat_documents"
+    QDRANT_SHARED_SHARDS: int = 1
+    # Profile lưu vector khi tạo collection: float32 | float32_disk | int8 | binary
+    QDRANT_VECTOR_PROFILE: str = "float32"
+    # Hệ số over-fetch khi search trên vector quantized (để trống = mặc định của profile)
+    QDRANT_VECTOR_OVERSAMPLING: Optional[float] = None
+    # Chat có tối đa N chunk được search exact trong process (NumPy), 0 = luôn gọi Qdrant
+    LOCAL_VECTOR_INDEX_MAX_POINTS: int = 2000
+    # Nạp lại index trong process sau N giây (thấy thay đổi từ process khác)
+    LOCAL_VECTOR_INDEX_TTL_SECONDS: float = 60.0
+    # Tổng số point trong RAM của mọi local index (~4KB / point với vector 1024 chiều)
+    LOCAL_VECTOR_INDEX_BUDGET_POINTS: int = 20000
+    # Số session giữ storage (và local index) trong cache
+    RAG_STORAGE_CACHE_SIZE: int = 256
+    # Hybrid search: dense + sparse BM25 (gộp bằng RRF); chỉ áp dụng cho collection tạo mới
+    RAG_HYBRID_SEARCH: bool = True
+    # Số token trung bình của 1 chunk, dùng để chuẩn hóa độ dài trong BM25
+    RAG_BM25_AVG_LEN: float = 150.0
+    # Cache kết quả search trong process (LRU), 0 = tắt; tự bỏ khi notebook thay đổi
+    RAG_RETRIEVAL_CACHE_SIZE: int = 1024
+    RAG_RETRIEVAL_CACHE_TTL_SECONDS: float = 300.0
+    # Semantic cache câu trả lời: câu hỏi có cosine similarity >= threshold với câu đã trả lời
+    # (cùng notebook, tài liệu chưa đổi) dùng lại câu trả lời, không gọi LLM
+    RAG_ANSWER_CACHE_ENABLED: bool = False
+    RAG_ANSWER_CACHE_THRESHOLD: float = 0.95
+    RAG_ANSWER_CACHE_MAX_ENTRIES: int = 2048
+    RAG_ANSWER_CACHE_TTL_SECONDS: float = 3600.0
+    # Token budget (ước lượng) của context gửi LLM; chunk chồng nhau được gộp trước khi tính
+    RAG_CONTEXT_MAX_TOKENS: int = 3000
+    # Thêm tối đa N chunk lân cận mỗi phía của chunk được retrieve (nếu còn budget), 0 = tắt
+    RAG_CONTEXT_NEIGHBOR_CHUNKS: int = 0
+    # Adaptive top-k: lấy dư RAG_ADAPTIVE_MAX_K chunk, bỏ chunk có cosine < RAG_SCORE_THRESHOLD,
+    # cắt tại khoảng cách score lớn nhất (>= RAG_SCORE_MIN_GAP) nhưng giữ ít nhất RAG_ADAPTIVE_MIN_K.
+    # Không còn chunk nào thì trả lời không dùng prompt RAG. Tắt = luôn lấy 5 chunk
+    RAG_ADAPTIVE_K: bool = True
+    RAG_ADAPTIVE_MIN_K: int = 2
+    RAG_ADAPTIVE_MAX_K: int = 8
+    RAG_SCORE_THRESHOLD: float = 0.3
+    RAG_SCORE_MIN_GAP: float = 0.1
+
+    # Embedding (Ollama)
+    EMBEDDING_MODEL: str = "mxbai-embed-large"
+    OLLAMA_BASE_URL: Optional[str] = None
+    # Matryoshka: chỉ giữ N chiều đầu của embedding (vd: 512 cho mxbai-embed-large), để trống = đầy đủ
+    EMBEDDING_DIMENSIONS: Optional[int] = None
+    # Cache embedding trên disk (SQLite), để trống để tắt
+    EMBEDDING_CACHE_PATH: Optional[str] = "data/embedding_cache.sqlite3"
+    EMBEDDING_CACHE_MAX_MB: int = 512
+    # Micro-batching query embedding trước khi gửi đến Ollama
+    EMBEDDING_BATCH_WINDOW_MS: float = 5.0
+    EMBEDDING_MAX_BATCH_SIZE: int = 32
+    # Số request embedding tối đa gửi đến Ollama cùng lúc
+    EMBEDDING_MAX_CONCURRENCY: int = 4
+
+    # Số connection tối đa trong pool HTTP dùng chung cho Ollama và Qdrant
+    RAG_HTTP_POOL_SIZE: int = 20
+
+    # Ingestion worker (chạy qua bảng jobs, xem JOB_* bên dưới)
+    INGESTION_WORKERS: int = 2
+    # Số job ingest tối đa đang chờ/chạy, vượt quá thì upload trả về 503
+    INGESTION_QUEUE_SIZE: int = 100
+    INGESTION_MAX_ATTEMPTS: int = 2
+    # Pipeline ingest 1 tài liệu: parse -> split -> embed -> upsert
+    INGEST_PIPELINE_BATCH_SIZE: int = 64
+    INGEST_PIPELINE_QUEUE_SIZE: int = 4
+    INGEST_PIPELINE_EMBED_CONCURRENCY: int = 2
+    INGEST_PIPELINE_UPSERT_CONCURRENCY: int = 4
+    # Extract PDF song song theo trang (process pool); PDF ít trang hơn thì extract tuần tự
+    PDF_EXTRACT_WORKERS: int = 4
+    PDF_PARALLEL_MIN_PAGES: int = 32
+
+    # Job queue (quiz/flashcard generation)
+    # Tắt để chỉ chạy job trong process riêng: python -m app.worker
+    JOB_RUNNER_ENABLED: bool = True
+    JOB_POLL_INTERVAL: float = 1.0
+    JOB_LEASE_SECONDS: int = 300
+    JOB_MAX_ATTEMPTS: int = 3
+    JOB_RETRY_BACKOFF_SECONDS: int = 30
+    QUIZ_JOB_CONCURRENCY: int = 4
+    FLASHCARD_JOB_CONCURRENCY: int = 4
 
     # LLM
     GOOGLE_API_KEY: str
+    # Số request LLM tối đa chạy song song trên 1 worker
+    LLM_MAX_CONNECTIONS: int = 100
 
     BACKEND_CORS_ORIGINS: List[AnyHttpUrl] = [
         "http://localhost:3000",
@@ -3,15 +3,100 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
 from app.core.config import settings
-from app.core.database import engine, Base
+from app.core.database import engine, Base, SessionLocal
+from app.services.content_version import DatabaseContentVersions
+from app.services.ingestion import IngestionWorker
+from app.services.llm import LLMService
+from app.services.rag.converter import PDFLoader
+from app.services.rag.service import RagService
+from app.worker import create_job_runner
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup: Create tables
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
+    # Startup: Process pool extract PDF theo trang
+    PDFLoader.configure(
+        workers=settings.PDF_EXTRACT_WORKERS,
+        min_parallel_pages=settings.PDF_PARALLEL_MIN_PAGES,
+    )
+    # Startup: RagService dùng chung cho toàn process
+    app.state.rag_service = RagService(
+        embedding_model=settings.EMBEDDING_MODEL,
+        embedding_base_url=settings.OLLAMA_BASE_URL,
+        qdrant_url=settings.QDRANT_URL,
+        qdrant_api_key=settings.QDRANT_API_KEY,
+        qdrant_prefer_grpc=settings.QDRANT_PREFER_GRPC,
+        qdrant_grpc_port=settings.QDRANT_GRPC_PORT,
+        http_pool_size=settings.RAG_HTTP_POOL_SIZE,
+        embedding_cache_path=settings.EMBEDDING_CACHE_PATH,
+        embedding_cache_max_mb=settings.EMBEDDING_CACHE_MAX_MB,
+        embedding_batch_window_ms=settings.EMBEDDING_BATCH_WINDOW_MS,
+        embedding_max_batch_size=settings.EMBEDDING_MAX_BATCH_SIZE,
+        embedding_max_concurrency=settings.EMBEDDING_MAX_CONCURRENCY,
+        pipeline_batch_size=settings.INGEST_PIPELINE_BATCH_SIZE,
+        pipeline_queue_size=settings.INGEST_PIPELINE_QUEUE_SIZE,
+        pipeline_embed_concurrency=settings.INGEST_PIPELINE_EMBED_CONCURRENCY,
+        pipeline_upsert_concurrency=settings.INGEST_PIPELINE_UPSERT_CONCURRENCY,
+        collection_mode=settings.QDRANT_COLLECTION_MODE,
+        shared_collection=settings.QDRANT_SHARED_COLLECTION,
+        shared_collection_shards=settings.QDRANT_SHARED_SHARDS,
+        vector_profile=settings.QDRANT_VECTOR_PROFILE,
+        vector_oversampling=settings.QDRANT_VECTOR_OVERSAMPLING,
+        embedding_dimensions=settings.EMBEDDING_DIMENSIONS,
+        local_index_max_points=settings.LOCAL_VECTOR_INDEX_MAX_POINTS,
+        local_index_ttl_seconds=settings.LOCAL_VECTOR_INDEX_TTL_SECONDS,
+        local_index_budget_points=settings.LOCAL_VECTOR_INDEX_BUDGET_POINTS,
+        storage_cache_size=settings.RAG_STORAGE_CACHE_SIZE,
+        hybrid_search=settings.RAG_HYBRID_SEARCH,
+        bm25_avg_len=settings.RAG_BM25_AVG_LEN,
+        retrieval_cache_size=settings.RAG_RETRIEVAL_CACHE_SIZE,
+        retrieval_cache_ttl_seconds=settings.RAG_RETRIEVAL_CACHE_TTL_SECONDS,
+        content_versions=DatabaseContentVersions(SessionLocal),
+        answer_cache=settings.RAG_ANSWER_CACHE_ENABLED,
+        answer_cache_threshold=settings.RAG_ANSWER_CACHE_THRESHOLD,
+        answer_cache_max_entries=settings.RAG_ANSWER_CACHE_MAX_ENTRIES,
+        answer_cache_ttl_seconds=settings.RAG_ANSWER_CACHE_TTL_SECONDS,
+        context_max_tokens=settings.RAG_CONTEXT_MAX_TOKENS,
+        context_neighbor_chunks=settings.RAG_CONTEXT_NEIGHBOR_CHUNKS,
+        adaptive_k=settings.RAG_ADAPTIVE_K,
+        adaptive_min_k=settings.RAG_ADAPTIVE_MIN_K,
+        adaptive_max_k=settings.RAG_ADAPTIVE_MAX_K,
+        score_threshold=settings.RAG_SCORE_THRESHOLD,
+        score_min_gap=settings.RAG_SCORE_MIN_GAP,
+    )
+    app.state.rag_service.start()
+    # Startup: LLMService dùng chung (1 HTTP client async cho mọi request LLM)
+    app.state.llm_service = LLMService(
+        api_key=settings.GOOGLE_API_KEY,
+        max_connections=settings.LLM_MAX_CONNECTIONS,
+    )
+    # Startup: Worker index tài liệu ở background
+    app.state.ingestion_worker = IngestionWorker(
+        rag_service=app.state.rag_service,
+        session_factory=SessionLocal,
+        concurrency=settings.INGESTION_WORKERS,
+        max_queue_size=settings.INGESTION_QUEUE_SIZE,
+        max_attempts=settings.INGESTION_MAX_ATTEMPTS,
+        poll_interval=settings.JOB_POLL_INTERVAL,
+        lease_seconds=settings.JOB_LEASE_SECONDS,
+        retry_backoff_seconds=settings.JOB_RETRY_BACKOFF_SECONDS,
+    )
+    await app.state.ingestion_worker.start()
+    # Startup: Job runner cho quiz/flashcard (có thể chạy riêng bằng app.worker)
+    app.state.job_runner = None
+    if settings.JOB_RUNNER_ENABLED:
+        app.state.job_runner = create_job_runner(app.state.llm_service)
+        await app.state.job_runner.start()
     yield
-    # Shutdown: Close DB connection
+    # Shutdown: Stop workers, close RAG/LLM clients and DB connection
+    if app.state.job_runner is not None:
+        await app.state.job_runner.stop()
+    await app.state.ingestion_worker.stop()
+    await app.state.rag_service.aclose()
+    PDFLoader.shutdown()
+    await app.state.llm_service.aclose()
     await engine.dispose()
 
 app = FastAPI(
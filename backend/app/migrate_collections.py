@@ -0,0 +1,160 @@
+"""
+Move per-chat Qdrant collections (chat_{session_id}) into the shared
+multi-tenant collection(s): python -m app.migrate_collections
+
+Points keep their ids, so the command can be re-run safely after a failure.
+Source collections are only dropped with --delete-source, after the copied
+point count has been verified.
+"""
+
+import argparse
+import asyncio
+import logging
+import re
+from typing import Optional, Set
+
+from qdrant_client import AsyncQdrantClient
+from qdrant_client.models import FieldCondition, Filter, MatchValue, PointStruct
+
+from app.core.config import settings
+from app.services.rag.hybrid import SPARSE_VECTOR_NAME, BM25Encoder
+from app.services.rag.matryoshka import truncate_vector
+from app.services.rag.qdrant_storage.qdrant_storage import OWNER_KEY, TENANT_KEY, QdrantStorage
+from app.services.rag.qdrant_storage.vector_profiles import get_profile
+from app.services.rag.service import shared_collection_name
+
+logger = logging.getLogger(__name__)
+
+PER_CHAT_COLLECTION = re.compile(r"chat_(\d+)")
+
+
+async def _vector_size(client: AsyncQdrantClient, collection_name: str) -> int:
+    vectors = (await client.get_collection(collection_name)).config.params.vectors
+    return vectors.size if hasattr(vectors, "size") else next(iter(vectors.values())).size
+
+
+async def migrate_collection(
+    client: AsyncQdrantClient,
+    source: str,
+    session_id: str,
+    known_collections: Set[str],
+    batch_size: int,
+    delete_source: bool,
+    dry_run: bool,
+) -> int:
+    target = shared_collection_name(settings.QDRANT_SHARED_COLLECTION, settings.QDRANT_SHARED_SHARDS, session_id)
+    # Vector được cắt theo EMBEDDING_DIMENSIONS nếu có, để khớp với vector query
+    dimensions = settings.EMBEDDING_DIMENSIONS
+    # Sparse vector BM25 được tính lại từ page_content nếu bật hybrid search
+    sparse_encoder = BM25Encoder(avg_len=settings.RAG_BM25_AVG_LEN) if settings.RAG_HYBRID_SEARCH else None
+    if not dry_run:
+        # Tạo collection dùng chung (HNSW theo tenant + payload index) nếu chưa có
+        await QdrantStorage(
+            collection_name=target,
+            embedding=None,
+            client=client,
+            vector_size=dimensions or await _vector_size(client, source),
+            known_collections=known_collections,
+            tenant={TENANT_KEY: session_id},
+            profile=get_profile(settings.QDRANT_VECTOR_PROFILE, settings.QDRANT_VECTOR_OVERSAMPLING),
+            sparse_encoder=sparse_encoder,
+        ).create_collection()
+
+    moved = 0
+    offset: Optional[str] = None
+    while True:
+        points, offset = await client.scroll(
+            collection_name=source,
+            limit=batch_size,
+            offset=offset,
+            with_payload=True,
+            with_vectors=True,
+        )
+        if points and not dry_run:
+            batch = []
+            for point in points:
+                payload = dict(point.payload or {})
+                payload[TENANT_KEY] = session_id
+                owner = (payload.get("metadata") or {}).get("user_id")
+                if owner is not None:
+                    payload[OWNER_KEY] = str(owner)
+                vector = point.vector.get("") if isinstance(point.vector, dict) else point.vector
+                if dimensions:
+                    vector = truncate_vector(vector, dimensions)
+                if sparse_encoder is not None:
+                    vector = {
+                        "": vector,
+                        SPARSE_VECTOR_NAME: sparse_encoder.encode_document(payload.get("page_content", "")),
+                    }
+                batch.append(PointStruct(id=point.id, vector=vector, payload=payload))
+            await client.upsert(collection_name=target, points=batch, wait=True)
+        moved += len(points)
+        if offset is None:
+            break
+
+    if dry_run:
+        logger.info("[dry-run] %s -> %s: %d points", source, target, moved)
+        return moved
+
+    copied = (await client.count(
+        collection_name=target,
+        count_filter=Filter(must=[FieldCondition(key=TENANT_KEY, match=MatchValue(value=session_id))]),
+        exact=True,
+    )).count
+    logger.info("%s -> %s: %d points moved (%d in target for session %s)", source, target, moved, copied, session_id)
+
+    if delete_source:
+        if copied < moved:
+            logger.error("Not deleting %s: only %d of %d points found in %s", source, copied, moved, target)
+        else:
+            await client.delete_collection(collection_name=source)
+            logger.info("Deleted source collection %s", source)
+    return moved
+
+
+async def migrate(args: argparse.Namespace) -> None:
+    client = AsyncQdrantClient(
+        url=settings.QDRANT_URL,
+        api_key=settings.QDRANT_API_KEY,
+        prefer_grpc=settings.QDRANT_PREFER_GRPC,
+        grpc_port=settings.QDRANT_GRPC_PORT,
+    )
+    known_collections: Set[str] = set()
+    total = 0
+    try:
+        for description in (await client.get_collections()).collections:
+            match = PER_CHAT_COLLECTION.fullmatch(description.name)
+            if not match:
+                continue
+            session_id = match.group(1)
+            if args.session and session_id not in args.session:
+                continue
+            total += await migrate_collection(
+                client,
+                description.name,
+                session_id,
+                known_collections,
+                batch_size=args.batch_size,
+                delete_source=args.delete_source,
+                dry_run=args.dry_run,
+            )
+    finally:
+        await client.close()
+    logger.info("Done: %d points", total)
+    if settings.QDRANT_COLLECTION_MODE != "shared":
+        logger.info("Set QDRANT_COLLECTION_MODE=shared to serve chats from the shared collection")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Move per-chat Qdrant collections into the shared collection")
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument("--delete-source", action="store_true", help="Drop each per-chat collection after copying")
+    parser.add_argument("--dry-run", action="store_true", help="Only count points, do not write")
+    parser.add_argument("--session", action="append", help="Only migrate these session ids (repeatable)")
+    args = parser.parse_args()
+    asyncio.run(migrate(args))
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
@@ -1,6 +1,7 @@
 
 from app.models.user import User
-from app.models.chat import ChatSession, ChatMessage
-from app.models.document import Document
+from app.models.chat import ChatSession, ChatMessage, ChatContentVersion
+from app.models.document import Document, DocumentContent, DocumentIngestion
 from app.models.quiz import Quiz, QuizQuestion, QuizType, QuizStatus, QuestionType
 from app.models.flashcard import FlashcardSet, Flashcard, FlashcardStatus
+from app.models.job import Job, JobStatus
@@ -30,3 +30,11 @@ class ChatMessage(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
     session = relationship("ChatSession", back_populates="messages")
+
+class ChatContentVersion(Base):
+    """Version nội dung vector store của chat, tăng khi tài liệu thay đổi (dùng chung giữa các process)"""
+    __tablename__ = "chat_content_versions"
+
+    session_id = Column(String(64), primary_key=True)  # session_id của RagService
+    version = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
@@ -1,5 +1,6 @@
 
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Enum
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Enum, JSON, LargeBinary
+from sqlalchemy.dialects.mysql import LONGBLOB
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.core.database import Base
@@ -21,3 +22,32 @@ class Document(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
     session = relationship("ChatSession", back_populates="documents")
+    stored_content = relationship("DocumentContent", back_populates="document", uselist=False, cascade="all, delete-orphan")
+    ingestion = relationship("DocumentIngestion", back_populates="document", uselist=False, cascade="all, delete-orphan")
+
+class DocumentContent(Base):
+    """Extracted text of a document, stored at ingest so readers never re-parse the file"""
+    __tablename__ = "document_contents"
+
+    document_id = Column(Integer, ForeignKey("documents.id", ondelete="CASCADE"), primary_key=True)
+    content_hash = Column(String(64), nullable=False, index=True) # SHA-256 of the UTF-8 text
+    data = Column(LargeBinary().with_variant(LONGBLOB, "mysql"), nullable=False) # zlib-compressed UTF-8 text
+    content_length = Column(Integer, nullable=False) # Number of characters
+    page_offsets = Column(JSON, nullable=True) # Start char of each page/section in the text
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    document = relationship("Document", back_populates="stored_content")
+
+class DocumentIngestion(Base):
+    """Compact result of the last successful ingest of a document (counts and timings)"""
+    __tablename__ = "document_ingestions"
+
+    document_id = Column(Integer, ForeignKey("documents.id", ondelete="CASCADE"), primary_key=True)
+    collection_name = Column(String(255), nullable=False)
+    chunk_count = Column(Integer, nullable=False)
+    page_count = Column(Integer, nullable=False)
+    content_length = Column(Integer, nullable=False)
+    timings = Column(JSON, nullable=True) # Seconds per pipeline stage (parse/embed/upsert/total)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    document = relationship("Document", back_populates="ingestion")
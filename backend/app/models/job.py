@@ -0,0 +1,37 @@
+"""
+Job model for the durable background job queue.
+"""
+
+from sqlalchemy import Column, Integer, String, Text, DateTime, JSON, Enum, Index
+from sqlalchemy.sql import func
+from app.core.database import Base
+import enum
+
+
+class JobStatus(str, enum.Enum):
+    """Trạng thái job"""
+    QUEUED = "queued"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+
+
+class Job(Base):
+    """Bảng hàng đợi job chạy nền (quiz, flashcard, ...)"""
+    __tablename__ = "jobs"
+    __table_args__ = (
+        Index("ix_jobs_type_status_run_after", "job_type", "status", "run_after"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    job_type = Column(String(100), nullable=False)
+    payload = Column(JSON, nullable=False)
+    status = Column(Enum(JobStatus), default=JobStatus.QUEUED, nullable=False)
+    attempts = Column(Integer, default=0, nullable=False)
+    max_attempts = Column(Integer, default=3, nullable=False)
+    run_after = Column(DateTime, nullable=False)  # UTC, thời điểm sớm nhất được chạy (retry backoff)
+    locked_by = Column(String(255), nullable=True)  # Worker đang giữ lease
+    lease_expires_at = Column(DateTime, nullable=True)  # UTC, hết hạn thì worker khác được nhận lại
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
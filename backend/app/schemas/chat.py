@@ -1,7 +1,7 @@
 
 from typing import List, Optional, Any, Dict
 from datetime import datetime
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
 
 class ChatMessageBase(BaseModel):
@@ -16,6 +16,8 @@ class ChatMessage(ChatMessageBase):
     id: int
     session_id: int
     created_at: datetime
+    # Số chunk RAG được chọn (adaptive top-k), chỉ có trong response vừa trả lời, không lưu DB
+    retrieved_k: Optional[int] = None
 
     class Config:
         from_attributes = True
@@ -48,6 +50,8 @@ class ChatRequest(BaseModel):
     question: str
     session_id: Optional[int] = None
     use_rag: bool = True
+    # Chỉ tìm trong các document này (None = toàn bộ document của chat)
+    document_ids: Optional[List[int]] = Field(default=None, description="Giới hạn RAG trong các document đã chọn")
 
 class PaginatedChatSessionSummary(BaseModel):
     items: List[ChatSessionSummary]
@@ -1,5 +1,5 @@
 from datetime import datetime
-from typing import Optional
+from typing import Dict, List, Optional
 from pydantic import BaseModel
 from app.models.document import DocumentStatus
 
@@ -22,3 +22,58 @@ class Document(DocumentBase):
 class DocumentWithContent(Document):
     content: str
 
+
+class DocumentMetadata(Document):
+    """Document without its text; content is fetched per document"""
+    content_length: Optional[int] = None
+    page_count: Optional[int] = None
+
+class UploadResponse(BaseModel):
+    """Returned by the upload endpoint; indexing continues in the background"""
+    message: str
+    document_id: int
+    status: DocumentStatus
+
+class IngestionResult(BaseModel):
+    """Compact result of indexing a document"""
+    document_id: int
+    collection_name: str
+    chunk_count: int
+    page_count: int
+    content_length: int
+    timings: Dict[str, float] = {}  # Seconds per pipeline stage
+    created_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
+class DocumentStatusResponse(Document):
+    ingestion: Optional[IngestionResult] = None
+
+class DocumentChunkInfo(BaseModel):
+    chunk_index: int
+    start_char: Optional[int] = None
+    end_char: Optional[int] = None
+    page_index: Optional[int] = None
+    page_start_char: Optional[int] = None
+    page_end_char: Optional[int] = None
+    content: Optional[str] = None  # Only with include_content=true
+
+class DocumentChunkList(BaseModel):
+    document_id: int
+    offset: int
+    limit: int
+    total: Optional[int] = None  # Chunk count from the last ingest, if known
+    chunks: List[DocumentChunkInfo]
+
+class DocumentContentChunk(BaseModel):
+    """A character or page range of a document's extracted text"""
+    document_id: int
+    content: str
+    start_char: int
+    end_char: int
+    total_length: int
+    page_start: Optional[int] = None  # 1-based, inclusive
+    page_end: Optional[int] = None    # 1-based, inclusive
+    total_pages: int
+    page_offsets: List[int]           # Start char of each page in the full text
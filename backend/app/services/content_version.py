@@ -0,0 +1,55 @@
+"""
+Version nội dung vector store của từng chat, lưu trong database.
+
+Dùng chung giữa các process (nhiều worker uvicorn): ingest/xóa tài liệu ở một
+process làm mới retrieval cache và answer cache của mọi process.
+"""
+from __future__ import annotations
+
+import logging
+from typing import Any, Callable
+
+from sqlalchemy import select, update
+from sqlalchemy.exc import IntegrityError
+
+from app.models.chat import ChatContentVersion
+from app.services.rag.content_version import ContentVersions
+
+logger = logging.getLogger(__name__)
+
+
+class DatabaseContentVersions(ContentVersions):
+    """Version theo session trong bảng chat_content_versions"""
+
+    def __init__(self, session_factory: Callable[[], Any]) -> None:
+        super().__init__()
+        self.session_factory = session_factory
+
+    async def get(self, session_id: str) -> int:
+        async with self.session_factory() as db:
+            result = await db.execute(
+                select(ChatContentVersion.version)
+                .where(ChatContentVersion.session_id == str(session_id))
+            )
+            return result.scalar() or 0
+
+    async def bump(self, session_id: str) -> int:
+        session_id = str(session_id)
+        for _ in range(2):
+            async with self.session_factory() as db:
+                result = await db.execute(
+                    update(ChatContentVersion)
+                    .where(ChatContentVersion.session_id == session_id)
+                    .values(version=ChatContentVersion.version + 1)
+                    .execution_options(synchronize_session=False)
+                )
+                if result.rowcount == 0:
+                    db.add(ChatContentVersion(session_id=session_id, version=1))
+                try:
+                    await db.commit()
+                except IntegrityError:
+                    # Process khác vừa tạo hàng cho session này: update lại
+                    await db.rollback()
+                    continue
+                return await self.get(session_id)
+        raise RuntimeError(f"Could not bump content version of session {session_id}")
@@ -0,0 +1,260 @@
+"""
+Helpers to store and load the extracted text of uploaded documents.
+
+Text is extracted once at ingest and stored zlib-compressed in
+`document_contents`. Documents ingested before that table existed are
+re-parsed from MinIO once and backfilled.
+"""
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import logging
+import os
+import tempfile
+import zlib
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from app.core.database import SessionLocal
+from app.models.document import Document, DocumentContent, DocumentStatus
+from app.services.rag.converter import ConverterFactory
+from app.services.storage import MinIOService
+
+logger = logging.getLogger(__name__)
+
+COMPRESSION_LEVEL = 6
+
+
+@dataclass
+class StoredContent:
+    """Extracted text của 1 document đã giải nén"""
+    document_id: int
+    content: str
+    content_hash: str
+    page_offsets: List[int]
+
+
+@dataclass
+class ContentInfo:
+    """Metadata của text đã lưu, không cần giải nén"""
+    document_id: int
+    content_hash: str
+    content_length: int
+    page_offsets: List[int]
+
+
+def hash_content(content: str) -> str:
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+def _decode(row: DocumentContent) -> StoredContent:
+    return StoredContent(
+        document_id=row.document_id,
+        content=zlib.decompress(row.data).decode("utf-8"),
+        content_hash=row.content_hash,
+        page_offsets=list(row.page_offsets or [0]),
+    )
+
+
+class DocumentContentWriter:
+    """
+    Nén và hash text theo từng phần khi ingest, để không phải giữ
+    toàn bộ text chưa nén trong bộ nhớ. Dùng làm content_sink của RagService.ingest_file.
+    """
+
+    def __init__(self) -> None:
+        self._compressor = zlib.compressobj(COMPRESSION_LEVEL)
+        self._hasher = hashlib.sha256()
+        self._parts: List[bytes] = []
+        self.content_length = 0
+
+    def write(self, text: str) -> None:
+        data = text.encode("utf-8")
+        self._hasher.update(data)
+        compressed = self._compressor.compress(data)
+        if compressed:
+            self._parts.append(compressed)
+        self.content_length += len(text)
+
+    def build(self, document_id: int, page_offsets: Optional[List[int]] = None) -> DocumentContent:
+        """Tạo row DocumentContent (chưa add vào session). Chỉ gọi 1 lần."""
+        self._parts.append(self._compressor.flush())
+        data = b"".join(self._parts)
+        self._parts = []
+        return DocumentContent(
+            document_id=document_id,
+            content_hash=self._hasher.hexdigest(),
+            data=data,
+            content_length=self.content_length,
+            page_offsets=page_offsets or [0],
+        )
+
+
+def build_document_content(
+    document_id: int,
+    content: str,
+    page_offsets: Optional[List[int]] = None,
+) -> DocumentContent:
+    """Tạo row DocumentContent (chưa add vào session)"""
+    writer = DocumentContentWriter()
+    writer.write(content)
+    return writer.build(document_id, page_offsets)
+
+
+async def save_document_content(
+    db: AsyncSession,
+    document_id: int,
+    content: str | DocumentContentWriter,
+    page_offsets: Optional[List[int]] = None,
+) -> None:
+    """Lưu (hoặc thay thế) text của document, từ str hoặc writer đã ghi xong. Caller commit."""
+    if isinstance(content, DocumentContentWriter):
+        row = content.build(document_id, page_offsets)
+    else:
+        row = build_document_content(document_id, content, page_offsets)
+    await db.merge(row)
+
+
+async def load_stored_contents(db: AsyncSession, document_ids: List[int]) -> Dict[int, StoredContent]:
+    """Load text đã lưu của nhiều document trong 1 query"""
+    if not document_ids:
+        return {}
+    result = await db.execute(
+        select(DocumentContent).filter(DocumentContent.document_id.in_(document_ids))
+    )
+    rows = result.scalars().all()
+    # Giải nén ngoài event loop, text có thể lớn
+    decoded = await asyncio.to_thread(lambda: [_decode(row) for row in rows])
+    return {item.document_id: item for item in decoded}
+
+
+async def load_content_infos(db: AsyncSession, document_ids: List[int]) -> Dict[int, ContentInfo]:
+    """Load metadata (hash, độ dài, vị trí trang) mà không đọc blob text"""
+    if not document_ids:
+        return {}
+    result = await db.execute(
+        select(
+            DocumentContent.document_id,
+            DocumentContent.content_hash,
+            DocumentContent.content_length,
+            DocumentContent.page_offsets,
+        ).filter(DocumentContent.document_id.in_(document_ids))
+    )
+    return {
+        row.document_id: ContentInfo(
+            document_id=row.document_id,
+            content_hash=row.content_hash,
+            content_length=row.content_length,
+            page_offsets=list(row.page_offsets or [0]),
+        )
+        for row in result.all()
+    }
+
+
+def _extract_content(storage_service: MinIOService, doc: Document) -> List[str]:
+    tmp_path = None
+    try:
+        suffix = Path(doc.filename).suffix
+        with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmp:
+            tmp_path = Path(tmp.name)
+
+        storage_service.download_file(doc.file_path, tmp_path)
+
+        converter = ConverterFactory.create("file")
+        extracted_docs = converter.convert(str(tmp_path))
+        return [d.page_content for d in extracted_docs]
+    finally:
+        if tmp_path and tmp_path.exists():
+            os.remove(tmp_path)
+
+
+async def _backfill_content(storage_service: MinIOService, doc: Document) -> StoredContent:
+    """Parse lại file từ MinIO cho document chưa có text lưu sẵn, rồi lưu lại"""
+    logger.info("No stored content for doc %s, extracting from MinIO", doc.id)
+    pages = await asyncio.to_thread(_extract_content, storage_service, doc)
+
+    content = "\n\n".join(pages)
+    page_offsets = []
+    offset = 0
+    for page in pages:
+        page_offsets.append(offset)
+        offset += len(page) + 2
+
+    row = build_document_content(doc.id, content, page_offsets)
+    # Session riêng để commit không làm expire object của caller
+    async with SessionLocal() as db:
+        await db.merge(row)
+        await db.commit()
+    return StoredContent(
+        document_id=doc.id,
+        content=content,
+        content_hash=row.content_hash,
+        page_offsets=page_offsets or [0],
+    )
+
+
+async def get_stored_contents(
+    docs: List[Document],
+    db: AsyncSession,
+    storage_service: Optional[MinIOService] = None,
+) -> Dict[int, StoredContent]:
+    """
+    Text của các document, key theo document id.
+    Document chưa có text lưu sẵn được backfill từ MinIO nếu có storage_service.
+    """
+    contents = await load_stored_contents(db, [doc.id for doc in docs])
+    if storage_service is None:
+        return contents
+
+    for doc in docs:
+        # Document PENDING sẽ được lưu text khi ingestion worker xử lý xong
+        if doc.id in contents or doc.status == DocumentStatus.PENDING:
+            continue
+        try:
+            contents[doc.id] = await _backfill_content(storage_service, doc)
+        except Exception as e:
+            logger.error(f"Failed to load content for doc {doc.id}: {e}")
+    return contents
+
+
+async def get_document_content(
+    doc: Document,
+    db: AsyncSession,
+    storage_service: Optional[MinIOService] = None,
+) -> StoredContent:
+    contents = await get_stored_contents([doc], db, storage_service)
+    if doc.id not in contents:
+        raise ValueError(f"Content of document {doc.id} is not available")
+    return contents[doc.id]
+
+
+async def get_documents_content(
+    document_ids: List[int],
+    session_id: int,
+    db: AsyncSession,
+    storage_service: Optional[MinIOService] = None,
+) -> str:
+    """Get combined content from multiple documents of a chat session."""
+    result = await db.execute(
+        select(Document).filter(
+            Document.id.in_(document_ids),
+            Document.session_id == session_id
+        )
+    )
+    docs = result.scalars().all()
+
+    if not docs:
+        raise ValueError("No documents found")
+
+    contents = await get_stored_contents(docs, db, storage_service)
+
+    return "\n\n".join(
+        f"=== {doc.filename} ===\n{contents[doc.id].content}"
+        for doc in docs
+        if doc.id in contents
+    )
@@ -119,7 +119,7 @@ NỘI DUNG TÀI LIỆU:
         logger.info(f"Generating {num_cards} flashcards")
         
         # Generate with LLM
-        response = self.llm_service.generate(prompt, temperature=0.7)
+        response = await self.llm_service.agenerate(prompt, temperature=0.7)
         
         # Parse response
         try:
@@ -0,0 +1,161 @@
+"""
+Job handlers for quiz and flashcard generation.
+"""
+from __future__ import annotations
+
+import logging
+from typing import Any, Dict
+
+from sqlalchemy import delete
+from sqlalchemy.future import select
+
+from app.core.config import settings
+from app.models.flashcard import Flashcard, FlashcardSet, FlashcardStatus
+from app.models.quiz import Quiz, QuizQuestion, QuizStatus
+from app.schemas.quiz import QuizType
+from app.services.document_content import get_documents_content
+from app.services.flashcard import FlashcardService
+from app.services.jobs import JobContext, JobRunner
+from app.services.quiz import QuizService
+
+logger = logging.getLogger(__name__)
+
+QUIZ_GENERATION_JOB = "quiz.generate"
+FLASHCARD_GENERATION_JOB = "flashcard.generate"
+
+
+async def generate_quiz(payload: Dict[str, Any], ctx: JobContext) -> None:
+    """Generate quiz questions. Raises to let the job runner retry."""
+    quiz_id = payload["quiz_id"]
+    async with ctx.session_factory() as db:
+        # Update status to generating
+        result = await db.execute(select(Quiz).filter(Quiz.id == quiz_id))
+        quiz = result.scalars().first()
+        if not quiz:
+            logger.error(f"Quiz {quiz_id} not found")
+            return
+
+        quiz.status = QuizStatus.GENERATING
+        await db.commit()
+
+        # Get document content
+        content = await get_documents_content(
+            payload["document_ids"], payload["session_id"], db, ctx.storage_factory()
+        )
+
+        if not content:
+            quiz.status = QuizStatus.FAILED
+            await db.commit()
+            return
+
+        # Generate questions
+        quiz_service = QuizService(llm_service=ctx.llm_service)
+        questions = await quiz_service.generate_questions(
+            content=content,
+            quiz_type=QuizType(payload["quiz_type"]),
+            num_questions=payload["num_questions"]
+        )
+
+        # Save questions to database (replace anything left by a previous attempt)
+        await db.execute(delete(QuizQuestion).where(QuizQuestion.quiz_id == quiz_id))
+        for q in questions:
+            question = QuizQuestion(
+                quiz_id=quiz_id,
+                question_text=q["question_text"],
+                question_type=q["question_type"],
+                options=q["options"],
+                correct_answers=q["correct_answers"],
+                explanation=q.get("explanation", ""),
+                order_index=q["order_index"]
+            )
+            db.add(question)
+
+        # Update quiz status
+        quiz.status = QuizStatus.COMPLETED
+        quiz.num_questions = len(questions)
+        await db.commit()
+
+        logger.info(f"Quiz {quiz_id} generated with {len(questions)} questions")
+
+
+async def mark_quiz_failed(payload: Dict[str, Any], ctx: JobContext, error: str) -> None:
+    async with ctx.session_factory() as db:
+        result = await db.execute(select(Quiz).filter(Quiz.id == payload["quiz_id"]))
+        quiz = result.scalars().first()
+        if quiz:
+            quiz.status = QuizStatus.FAILED
+            await db.commit()
+
+
+async def generate_flashcards(payload: Dict[str, Any], ctx: JobContext) -> None:
+    """Generate flashcards. Raises to let the job runner retry."""
+    flashcard_set_id = payload["flashcard_set_id"]
+    async with ctx.session_factory() as db:
+        # Update status to generating
+        result = await db.execute(select(FlashcardSet).filter(FlashcardSet.id == flashcard_set_id))
+        flashcard_set = result.scalars().first()
+        if not flashcard_set:
+            logger.error(f"FlashcardSet {flashcard_set_id} not found")
+            return
+
+        flashcard_set.status = FlashcardStatus.GENERATING
+        await db.commit()
+
+        # Get document content
+        content = await get_documents_content(
+            payload["document_ids"], payload["session_id"], db, ctx.storage_factory()
+        )
+
+        if not content:
+            flashcard_set.status = FlashcardStatus.FAILED
+            await db.commit()
+            return
+
+        # Generate flashcards
+        flashcard_service = FlashcardService(llm_service=ctx.llm_service)
+        cards = await flashcard_service.generate_flashcards(
+            content=content,
+            num_cards=payload["num_cards"]
+        )
+
+        # Save cards to database (replace anything left by a previous attempt)
+        await db.execute(delete(Flashcard).where(Flashcard.flashcard_set_id == flashcard_set_id))
+        for card in cards:
+            flashcard = Flashcard(
+                flashcard_set_id=flashcard_set_id,
+                front_text=card["front_text"],
+                back_text=card["back_text"],
+                order_index=card["order_index"]
+            )
+            db.add(flashcard)
+
+        # Update flashcard set status
+        flashcard_set.status = FlashcardStatus.COMPLETED
+        flashcard_set.num_cards = len(cards)
+        await db.commit()
+
+        logger.info(f"FlashcardSet {flashcard_set_id} generated with {len(cards)} cards")
+
+
+async def mark_flashcards_failed(payload: Dict[str, Any], ctx: JobContext, error: str) -> None:
+    async with ctx.session_factory() as db:
+        result = await db.execute(select(FlashcardSet).filter(FlashcardSet.id == payload["flashcard_set_id"]))
+        flashcard_set = result.scalars().first()
+        if flashcard_set:
+            flashcard_set.status = FlashcardStatus.FAILED
+            await db.commit()
+
+
+def register_generation_jobs(runner: JobRunner) -> None:
+    runner.register(
+        QUIZ_GENERATION_JOB,
+        generate_quiz,
+        on_failure=mark_quiz_failed,
+        concurrency=settings.QUIZ_JOB_CONCURRENCY,
+    )
+    runner.register(
+        FLASHCARD_GENERATION_JOB,
+        generate_flashcards,
+        on_failure=mark_flashcards_failed,
+        concurrency=settings.FLASHCARD_JOB_CONCURRENCY,
+    )
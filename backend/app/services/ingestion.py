@@ -0,0 +1,350 @@
+"""
+Ingestion worker: index uploaded documents outside of the HTTP request.
+
+Job được lưu trong bảng jobs (xem app/services/jobs.py) cùng transaction với
+Document, nên tài liệu PENDING không bị mất khi process restart.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import tempfile
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional
+
+from sqlalchemy import func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.chat import ChatSession
+from app.models.document import Document, DocumentIngestion, DocumentStatus
+from app.models.job import Job, JobStatus
+from app.services.document_content import DocumentContentWriter, save_document_content
+from app.services.jobs import JobContext, JobRunner, enqueue_job
+from app.services.rag.service import IngestionSummary, RagService
+from app.services.storage import MinIOService
+
+logger = logging.getLogger(__name__)
+
+INGESTION_JOB = "document.ingest"
+_ACTIVE_JOB_STATUSES = (JobStatus.QUEUED, JobStatus.RUNNING)
+
+
+@dataclass
+class IngestionJob:
+    """Một tài liệu cần được index vào vector store"""
+    document_id: int
+    session_id: int
+    user_id: int
+    filename: str
+    object_name: str  # MinIO path
+    metadata: Dict[str, Any] = field(default_factory=dict)
+
+    def to_payload(self) -> Dict[str, Any]:
+        return {
+            "document_id": self.document_id,
+            "session_id": self.session_id,
+            "user_id": self.user_id,
+            "filename": self.filename,
+            "object_name": self.object_name,
+            "metadata": self.metadata,
+        }
+
+    @classmethod
+    def from_payload(cls, payload: Dict[str, Any]) -> "IngestionJob":
+        return cls(
+            document_id=payload["document_id"],
+            session_id=payload["session_id"],
+            user_id=payload["user_id"],
+            filename=payload["filename"],
+            object_name=payload["object_name"],
+            metadata=dict(payload.get("metadata") or {}),
+        )
+
+    @classmethod
+    def for_document(cls, document: Document, user_id: int) -> "IngestionJob":
+        return cls(
+            document_id=document.id,
+            session_id=document.session_id,
+            user_id=user_id,
+            filename=document.filename,
+            object_name=document.file_path,
+            metadata={
+                # We store the SQL document ID as 'document_id' in metadata
+                "document_id": str(document.id),
+                "db_document_id": document.id,
+                "session_id": document.session_id,
+                "file_name": document.filename,
+            },
+        )
+
+
+class IngestionQueueFullError(Exception):
+    """Raised when the ingestion queue is full"""
+    pass
+
+
+class IngestionWorker:
+    """
+    Index tài liệu ở background qua bảng jobs (job type "document.ingest").
+    Document đi từ PENDING sang INDEXED hoặc FAILED (sau khi hết số lần retry);
+    các client đang chờ được báo qua wait_for_update().
+
+    Job ingest chỉ được chạy bởi các process API (cần RagService), không phải app.worker.
+    Process nhận job có thể khác process nhận upload nên file luôn được tải từ MinIO.
+    """
+
+    def __init__(
+        self,
+        rag_service: RagService,
+        session_factory: Callable[[], Any],
+        storage_factory: Callable[[], MinIOService] = MinIOService,
+        concurrency: int = 2,
+        max_queue_size: int = 100,
+        max_attempts: int = 2,
+        poll_interval: float = 1.0,
+        lease_seconds: int = 300,
+        retry_backoff_seconds: int = 30,
+    ) -> None:
+        self.rag_service = rag_service
+        self.session_factory = session_factory
+        self.storage_factory = storage_factory
+        self.concurrency = concurrency
+        self.max_queue_size = max_queue_size
+        self.max_attempts = max_attempts
+
+        self.runner = JobRunner(
+            context=JobContext(session_factory=session_factory, storage_factory=storage_factory),
+            poll_interval=poll_interval,
+            lease_seconds=lease_seconds,
+            retry_backoff_seconds=retry_backoff_seconds,
+        )
+        self.runner.register(
+            INGESTION_JOB,
+            self._handle,
+            on_failure=self._on_failure,
+            concurrency=concurrency,
+        )
+        self._storage: Optional[MinIOService] = None
+        # Event cho client đang chờ trạng thái của từng document, và số client đang chờ
+        self._waiters: Dict[int, asyncio.Event] = {}
+        self._waiter_counts: Dict[int, int] = {}
+
+    @property
+    def storage(self) -> MinIOService:
+        if self._storage is None:
+            self._storage = self.storage_factory()
+        return self._storage
+
+    async def start(self) -> None:
+        try:
+            await self.recover_pending()
+        except Exception:
+            logger.exception("Failed to requeue pending documents")
+        await self.runner.start()
+        logger.info("Ingestion worker started (concurrency=%d)", self.concurrency)
+
+    async def stop(self) -> None:
+        # Job đang chạy dở được trả lại hàng đợi (xem JobRunner.stop)
+        await self.runner.stop()
+        logger.info("Ingestion worker stopped")
+
+    def notify(self) -> None:
+        """Gọi sau khi commit transaction chứa job để xử lý ngay"""
+        self.runner.notify()
+
+    async def enqueue(self, db: AsyncSession, job: IngestionJob) -> Job:
+        """
+        Thêm job ingest vào session db; caller commit cùng transaction với Document
+        rồi gọi notify(). Raise IngestionQueueFullError khi có quá nhiều job đang chờ.
+        """
+        result = await db.execute(
+            select(func.count(Job.id))
+            .where(Job.job_type == INGESTION_JOB, Job.status.in_(_ACTIVE_JOB_STATUSES))
+        )
+        if result.scalar() >= self.max_queue_size:
+            raise IngestionQueueFullError("Hàng đợi xử lý tài liệu đang đầy. Vui lòng thử lại sau.")
+
+        record = enqueue_job(db, INGESTION_JOB, job.to_payload(), max_attempts=self.max_attempts)
+        logger.info("Queued document_id=%s for ingestion", job.document_id)
+        return record
+
+    async def recover_pending(self) -> int:
+        """
+        Tạo lại job cho các document PENDING không có job đang chờ/chạy
+        (vd: upload trước khi ingest chạy qua bảng jobs).
+        """
+        async with self.session_factory() as db:
+            result = await db.execute(
+                select(Job.payload)
+                .where(Job.job_type == INGESTION_JOB, Job.status.in_(_ACTIVE_JOB_STATUSES))
+            )
+            queued_ids = {payload.get("document_id") for payload in result.scalars().all()}
+
+            result = await db.execute(
+                select(Document, ChatSession.user_id)
+                .join(ChatSession, ChatSession.id == Document.session_id)
+                .where(Document.status == DocumentStatus.PENDING)
+                .order_by(Document.id)
+            )
+            orphaned = [(doc, user_id) for doc, user_id in result.all() if doc.id not in queued_ids]
+            for doc, user_id in orphaned:
+                enqueue_job(
+                    db,
+                    INGESTION_JOB,
+                    IngestionJob.for_document(doc, user_id).to_payload(),
+                    max_attempts=self.max_attempts,
+                )
+            await db.commit()
+
+        if orphaned:
+            logger.info("Requeued %d pending documents for ingestion", len(orphaned))
+        return len(orphaned)
+
+    async def wait_for_update(self, document_id: int, timeout: float) -> bool:
+        """Chờ trạng thái của document thay đổi trong process này, trả về False nếu timeout"""
+        event = self._waiters.setdefault(document_id, asyncio.Event())
+        self._waiter_counts[document_id] = self._waiter_counts.get(document_id, 0) + 1
+        try:
+            await asyncio.wait_for(event.wait(), timeout=timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            remaining = self._waiter_counts[document_id] - 1
+            if remaining:
+                self._waiter_counts[document_id] = remaining
+            else:
+                # Không còn ai chờ: bỏ Event (nếu _notify chưa lấy đi)
+                del self._waiter_counts[document_id]
+                if self._waiters.get(document_id) is event:
+                    del self._waiters[document_id]
+
+    def _notify(self, document_id: int) -> None:
+        event = self._waiters.pop(document_id, None)
+        if event is not None:
+            event.set()
+
+    async def _handle(self, payload: Dict[str, Any], context: JobContext) -> None:
+        await self._process(IngestionJob.from_payload(payload))
+
+    async def _on_failure(self, payload: Dict[str, Any], context: JobContext, error: str) -> None:
+        document_id = payload["document_id"]
+        logger.error("Ingestion of document_id=%s failed permanently: %s", document_id, error)
+        await self._set_status(document_id, DocumentStatus.FAILED)
+
+    async def _set_status(self, document_id: int, status: DocumentStatus) -> None:
+        async with self.session_factory() as db:
+            await db.execute(
+                update(Document)
+                .where(Document.id == document_id)
+                .values(status=status)
+            )
+            await db.commit()
+        self._notify(document_id)
+
+    async def _document_exists(self, document_id: int) -> bool:
+        async with self.session_factory() as db:
+            result = await db.execute(select(Document.id).where(Document.id == document_id))
+            return result.scalar() is not None
+
+    async def _discard_chunks(self, job: IngestionJob) -> None:
+        """Xóa chunk của document vừa ingest (delete_document cũng làm mới cache retrieval/answer)"""
+        try:
+            await self.rag_service.delete_document(str(job.session_id), str(job.document_id))
+        except Exception:
+            logger.exception("Failed to remove chunks of document_id=%s", job.document_id)
+
+    async def _save_result(
+        self,
+        job: IngestionJob,
+        summary: IngestionSummary,
+        content_writer: DocumentContentWriter,
+    ) -> bool:
+        """Lưu text đã extract cùng lúc với chuyển trạng thái INDEXED, False nếu document đã bị xóa"""
+        async with self.session_factory() as db:
+            result = await db.execute(
+                update(Document)
+                .where(Document.id == job.document_id)
+                .values(status=DocumentStatus.INDEXED)
+            )
+            if result.rowcount == 0:
+                await db.rollback()
+                return False
+            await save_document_content(
+                db,
+                job.document_id,
+                content_writer,
+                summary.document_info.page_offsets,
+            )
+            await db.merge(DocumentIngestion(
+                document_id=job.document_id,
+                collection_name=summary.collection_name,
+                chunk_count=summary.chunk_count,
+                page_count=summary.page_count,
+                content_length=summary.document_info.content_length,
+                timings=summary.timings,
+            ))
+            await db.commit()
+        return True
+
+    async def _process(self, job: IngestionJob) -> None:
+        """Index 1 document; raise khi lỗi để JobRunner retry"""
+        tmp_path = None
+        try:
+            # Document có thể đã bị xóa (hoặc đã được index) trong lúc chờ trong hàng đợi
+            async with self.session_factory() as db:
+                result = await db.execute(select(Document.status).where(Document.id == job.document_id))
+                current = result.scalar()
+            if current is None:
+                logger.info("Document_id=%s was deleted before ingestion, skipping", job.document_id)
+                return
+            if current != DocumentStatus.PENDING:
+                logger.info("Document_id=%s is already %s, skipping", job.document_id, current)
+                return
+
+            # Lần chạy trước (worker chết giữa chừng) có thể đã upsert một phần chunk
+            try:
+                await self.rag_service.delete_document(str(job.session_id), str(job.document_id))
+            except Exception as e:
+                # Collection của session chưa tồn tại: không có gì để xóa
+                logger.debug("No previous chunks removed for document_id=%s: %s", job.document_id, e)
+
+            suffix = Path(job.filename).suffix
+            with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmp:
+                tmp_path = Path(tmp.name)
+            await asyncio.to_thread(self.storage.download_file, job.object_name, tmp_path)
+
+            # Text được nén dần trong lúc ingest thay vì giữ nguyên trong bộ nhớ
+            content_writer = DocumentContentWriter()
+            summary = await self.rag_service.ingest_file(
+                user_id=str(job.user_id),
+                session_id=str(job.session_id),
+                file_path=tmp_path,
+                metadata=job.metadata,
+                content_sink=content_writer.write,
+            )
+
+            # Chunk đã nằm trong vector store: lỗi từ đây trở đi phải xóa chúng đi
+            try:
+                indexed = await self._save_result(job, summary, content_writer)
+            except Exception:
+                await self._discard_chunks(job)
+                if not await self._document_exists(job.document_id):
+                    logger.info("Document_id=%s was deleted during ingestion, chunks removed", job.document_id)
+                    return
+                raise
+            if not indexed:
+                await self._discard_chunks(job)
+                logger.info("Document_id=%s was deleted during ingestion, chunks removed", job.document_id)
+                return
+            self._notify(job.document_id)
+            logger.info("Indexed document_id=%s (%d chunks, %s)", job.document_id, summary.chunk_count, summary.timings)
+
+        except Exception as e:
+            logger.warning("Ingestion attempt failed for document_id=%s: %s", job.document_id, e)
+            raise
+        finally:
+            if tmp_path and tmp_path.exists():
+                os.remove(tmp_path)
@@ -0,0 +1,315 @@
+"""
+Durable DB-backed job queue with leasing, retries and per-type concurrency caps.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import socket
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set
+
+from sqlalchemy import and_, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.job import Job, JobStatus
+from app.services.llm import LLMService
+from app.services.storage import MinIOService
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class JobContext:
+    """Dependencies dùng chung cho các job handler"""
+    session_factory: Callable[[], Any]
+    llm_service: Optional[LLMService] = None  # None với runner không chạy job cần LLM (vd: ingest)
+    storage_factory: Callable[[], MinIOService] = MinIOService
+
+
+JobHandler = Callable[[Dict[str, Any], JobContext], Awaitable[None]]
+JobFailureHandler = Callable[[Dict[str, Any], JobContext, str], Awaitable[None]]
+
+
+@dataclass
+class _JobType:
+    handler: JobHandler
+    on_failure: Optional[JobFailureHandler]
+    concurrency: int
+    running: Set[asyncio.Task] = field(default_factory=set)
+
+
+def _utcnow() -> datetime:
+    return datetime.utcnow()
+
+
+def enqueue_job(
+    db: AsyncSession,
+    job_type: str,
+    payload: Dict[str, Any],
+    max_attempts: int = 3,
+) -> Job:
+    """
+    Thêm job vào session hiện tại. Caller commit cùng transaction với record
+    liên quan (vd: Quiz) để job và record luôn được tạo cùng nhau.
+    """
+    job = Job(
+        job_type=job_type,
+        payload=payload,
+        status=JobStatus.QUEUED,
+        attempts=0,
+        max_attempts=max_attempts,
+        run_after=_utcnow(),
+    )
+    db.add(job)
+    return job
+
+
+class JobRunner:
+    """
+    Poll bảng jobs và chạy handler tương ứng.
+
+    - Leasing: job được nhận bằng UPDATE có điều kiện, nên nhiều worker
+      (nhiều process) có thể chạy song song mà không nhận trùng job.
+    - Lease được gia hạn định kỳ khi job đang chạy; worker chết thì lease hết
+      hạn và job được worker khác nhận lại.
+    - Job lỗi được retry với backoff tăng dần đến max_attempts, sau đó
+      on_failure của job type được gọi.
+    """
+
+    def __init__(
+        self,
+        context: JobContext,
+        worker_id: Optional[str] = None,
+        poll_interval: float = 1.0,
+        lease_seconds: int = 300,
+        retry_backoff_seconds: int = 30,
+    ) -> None:
+        self.context = context
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.poll_interval = poll_interval
+        self.lease_seconds = lease_seconds
+        self.retry_backoff_seconds = retry_backoff_seconds
+
+        self._job_types: Dict[str, _JobType] = {}
+        self._poll_task: Optional[asyncio.Task] = None
+        self._wakeup = asyncio.Event()
+
+    def register(
+        self,
+        job_type: str,
+        handler: JobHandler,
+        on_failure: Optional[JobFailureHandler] = None,
+        concurrency: int = 1,
+    ) -> None:
+        if concurrency < 1:
+            raise ValueError("concurrency must be >= 1")
+        self._job_types[job_type] = _JobType(handler=handler, on_failure=on_failure, concurrency=concurrency)
+
+    def notify(self) -> None:
+        """Đánh thức vòng poll ngay (vd: sau khi enqueue job trong cùng process)"""
+        self._wakeup.set()
+
+    # -------------------------------------------------------------------------
+    # Lifecycle
+    # -------------------------------------------------------------------------
+    async def start(self) -> None:
+        self._poll_task = asyncio.create_task(self._poll_loop(), name="job-runner")
+        logger.info("Job runner %s started (types=%s)", self.worker_id, list(self._job_types))
+
+    async def stop(self) -> None:
+        if self._poll_task is not None:
+            self._poll_task.cancel()
+            await asyncio.gather(self._poll_task, return_exceptions=True)
+            self._poll_task = None
+
+        running = [task for job_type in self._job_types.values() for task in job_type.running]
+        for task in running:
+            task.cancel()
+        await asyncio.gather(*running, return_exceptions=True)
+
+        await self._release_leases()
+        logger.info("Job runner %s stopped", self.worker_id)
+
+    async def run_forever(self) -> None:
+        await self.start()
+        try:
+            await asyncio.Event().wait()
+        finally:
+            await self.stop()
+
+    # -------------------------------------------------------------------------
+    # Polling & claiming
+    # -------------------------------------------------------------------------
+    async def _poll_loop(self) -> None:
+        while True:
+            try:
+                await self._dispatch()
+            except Exception:
+                logger.exception("Job runner poll failed")
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _dispatch(self) -> None:
+        for job_type, spec in self._job_types.items():
+            free_slots = spec.concurrency - len(spec.running)
+            if free_slots <= 0:
+                continue
+            for job in await self._claim(job_type, free_slots):
+                task = asyncio.create_task(self._execute(spec, job))
+                spec.running.add(task)
+                task.add_done_callback(spec.running.discard)
+                # Có slot trống trở lại thì poll ngay
+                task.add_done_callback(lambda _: self._wakeup.set())
+
+    def _claimable(self, now: datetime):
+        return or_(
+            and_(Job.status == JobStatus.QUEUED, Job.run_after <= now),
+            and_(Job.status == JobStatus.RUNNING, Job.lease_expires_at < now),
+        )
+
+    async def _claim(self, job_type: str, limit: int) -> List[Job]:
+        now = _utcnow()
+        async with self.context.session_factory() as db:
+            result = await db.execute(
+                select(Job.id)
+                .where(Job.job_type == job_type, self._claimable(now))
+                .order_by(Job.id)
+                .limit(limit)
+            )
+            candidate_ids = result.scalars().all()
+
+            claimed_ids = []
+            for job_id in candidate_ids:
+                # Chỉ 1 worker cập nhật được hàng này nhờ điều kiện trong WHERE
+                result = await db.execute(
+                    update(Job)
+                    .where(Job.id == job_id, self._claimable(now))
+                    .values(
+                        status=JobStatus.RUNNING,
+                        locked_by=self.worker_id,
+                        lease_expires_at=now + timedelta(seconds=self.lease_seconds),
+                        attempts=Job.attempts + 1,
+                    )
+                    .execution_options(synchronize_session=False)
+                )
+                if result.rowcount == 1:
+                    claimed_ids.append(job_id)
+            await db.commit()
+
+            if not claimed_ids:
+                return []
+            result = await db.execute(select(Job).where(Job.id.in_(claimed_ids)).order_by(Job.id))
+            return list(result.scalars().all())
+
+    # -------------------------------------------------------------------------
+    # Execution
+    # -------------------------------------------------------------------------
+    async def _execute(self, spec: _JobType, job: Job) -> None:
+        logger.info("Running job %s (%s), attempt %d/%d", job.id, job.job_type, job.attempts, job.max_attempts)
+
+        if job.attempts > job.max_attempts:
+            # Job bị nhận lại sau khi worker chết quá nhiều lần
+            await self._finish_failed(spec, job, "Lease expired too many times")
+            return
+
+        handler = asyncio.create_task(spec.handler(job.payload, self.context))
+        heartbeat = asyncio.create_task(self._heartbeat(job.id))
+        try:
+            await asyncio.wait({handler, heartbeat}, return_when=asyncio.FIRST_COMPLETED)
+            if not handler.done():
+                # Mất lease: worker khác đã nhận lại job, không để 2 handler cùng ghi kết quả
+                logger.warning("Lost lease of job %s (%s), cancelling its handler", job.id, job.job_type)
+                return
+            handler.result()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error("Job %s (%s) failed: %s", job.id, job.job_type, e, exc_info=True)
+            if job.attempts < job.max_attempts:
+                await self._schedule_retry(job, str(e))
+            else:
+                await self._finish_failed(spec, job, str(e))
+        else:
+            await self._update_own(job.id, status=JobStatus.SUCCEEDED, last_error=None)
+            logger.info("Job %s (%s) succeeded", job.id, job.job_type)
+        finally:
+            heartbeat.cancel()
+            if not handler.done():
+                handler.cancel()
+                await asyncio.gather(handler, return_exceptions=True)
+
+    async def _heartbeat(self, job_id: int) -> None:
+        """Gia hạn lease định kỳ, return khi lease đã mất (job không còn do worker này giữ)"""
+        interval = max(self.lease_seconds / 3, 1)
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                async with self.context.session_factory() as db:
+                    result = await db.execute(
+                        update(Job)
+                        .where(Job.id == job_id, Job.locked_by == self.worker_id, Job.status == JobStatus.RUNNING)
+                        .values(lease_expires_at=_utcnow() + timedelta(seconds=self.lease_seconds))
+                        .execution_options(synchronize_session=False)
+                    )
+                    await db.commit()
+            except Exception:
+                # Lỗi tạm thời (vd: mất kết nối DB): thử lại ở lần sau, lease vẫn còn đến khi hết hạn
+                logger.exception("Failed to renew lease of job %s", job_id)
+                continue
+            if result.rowcount == 0:
+                return
+
+    async def _schedule_retry(self, job: Job, error: str) -> None:
+        delay = self.retry_backoff_seconds * (2 ** (job.attempts - 1))
+        await self._update_own(
+            job.id,
+            status=JobStatus.QUEUED,
+            run_after=_utcnow() + timedelta(seconds=delay),
+            last_error=error,
+        )
+        logger.info("Job %s scheduled for retry in %ds", job.id, delay)
+
+    async def _finish_failed(self, spec: _JobType, job: Job, error: str) -> None:
+        await self._update_own(job.id, status=JobStatus.FAILED, last_error=error)
+        if spec.on_failure is not None:
+            try:
+                await spec.on_failure(job.payload, self.context, error)
+            except Exception:
+                logger.exception("on_failure handler of job %s failed", job.id)
+
+    async def _update_own(self, job_id: int, **values: Any) -> None:
+        """Cập nhật job đang giữ lease và trả lease"""
+        async with self.context.session_factory() as db:
+            await db.execute(
+                update(Job)
+                .where(Job.id == job_id, Job.locked_by == self.worker_id)
+                .values(locked_by=None, lease_expires_at=None, **values)
+                .execution_options(synchronize_session=False)
+            )
+            await db.commit()
+
+    async def _release_leases(self) -> None:
+        """Trả các job đang chạy dở về hàng đợi khi shutdown, không tính lần chạy này"""
+        try:
+            async with self.context.session_factory() as db:
+                await db.execute(
+                    update(Job)
+                    .where(Job.locked_by == self.worker_id, Job.status == JobStatus.RUNNING)
+                    .values(
+                        status=JobStatus.QUEUED,
+                        attempts=Job.attempts - 1,
+                        locked_by=None,
+                        lease_expires_at=None,
+                    )
+                    .execution_options(synchronize_session=False)
+                )
+                await db.commit()
+        except Exception:
+            logger.exception("Failed to release job leases for worker %s", self.worker_id)
@@ -3,8 +3,9 @@ from __future__ import annotations
 
 import logging
 import os
-from typing import List, Dict, Any, Optional
+from typing import AsyncIterator, List, Dict, Any, Optional
 from dataclasses import dataclass
+import httpx
 import openai
 from app.services.exceptions import LLMRateLimitError
 from app.core.config import settings
@@ -12,6 +13,7 @@ from app.core.config import settings
 from langchain_openai import ChatOpenAI
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser
+from langchain_core.runnables import Runnable
 
 logger = logging.getLogger(__name__)
 
@@ -63,6 +65,7 @@ Instructions:
         temperature: float = 0.1,
         timeout: int = 120,
         max_tokens: Optional[int] = None,
+        max_connections: int = 100,
     ) -> None:
         self.model = model
         self.base_url = base_url or os.getenv("GEMINI_BASE_URL", "https://generativelanguage.googleapis.com/v1beta/openai")
@@ -80,12 +83,22 @@ Instructions:
         if max_tokens is not None:
             model_kwargs["max_tokens"] = max_tokens
 
+        # HTTP client async dùng chung, giữ keep-alive để nhiều request LLM chạy song song
+        self._http_async_client = httpx.AsyncClient(
+            timeout=self.timeout,
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_connections,
+            ),
+        )
+
         self._llm = ChatOpenAI(
             model=self.model,
             base_url=self.base_url,
             api_key=self.api_key,
             temperature=self.temperature,
             timeout=self.timeout,
+            http_async_client=self._http_async_client,
             **model_kwargs,
         )
 
@@ -95,21 +108,41 @@ Instructions:
             ("human", self.RAG_PROMPT_TEMPLATE),
         ])
 
-        # Init chain
-        self._rag_chain = self._rag_prompt | self._llm | StrOutputParser()
-
         logger.info(
             f"LLMService initialized with model={self.model}, "
             f"base_url={self.base_url}, temperature={self.temperature}"
         )
 
-    def answer_with_context(
+    async def aclose(self) -> None:
+        """Đóng HTTP client async khi app shutdown"""
+        await self._http_async_client.aclose()
+
+    def _bind_llm(
         self,
-        question: str,
-        context: str,
         temperature: Optional[float] = None,
         max_tokens: Optional[int] = None,
-    ) -> LLMResponse:
+    ) -> Runnable:
+        """
+        Trả về LLM với tham số riêng cho từng lần gọi.
+        Không sửa self._llm nên an toàn khi nhiều request chạy đồng thời.
+        """
+        call_kwargs: Dict[str, Any] = {}
+        if temperature is not None:
+            call_kwargs["temperature"] = temperature
+        if max_tokens is not None:
+            call_kwargs["max_tokens"] = max_tokens
+        if not call_kwargs:
+            return self._llm
+        return self._llm.bind(**call_kwargs)
+
+    def _rag_chain(
+        self,
+        temperature: Optional[float] = None,
+        max_tokens: Optional[int] = None,
+    ) -> Runnable:
+        return self._rag_prompt | self._bind_llm(temperature, max_tokens) | StrOutputParser()
+
+    def _prepare_rag_inputs(self, question: str, context: str) -> Dict[str, str]:
         if not question or not question.strip():
             raise ValueError("Question must not be empty")
 
@@ -117,27 +150,67 @@ Instructions:
             logger.warning("Empty context provided, answering without context")
             context = "Không có thông tin liên quan được tìm thấy trong tài liệu."
 
+        return {"context": context, "question": question}
+
+    def _build_sources_context(self, sources: List[Dict[str, Any]]) -> str:
+        if not sources:
+            return "Không tìm thấy thông tin liên quan trong tài liệu."
+
+        context_parts = []
+        for idx, source in enumerate(sources, 1):
+            file_name = source.get("file_name", "Unknown")
+            content = source.get("content", "")
+            score = source.get("score", 0.0)
+            
+            context_parts.append(
+                f"[Source S{idx} - {file_name} (score: {score:.2f})]\n{content}"
+            )
+        
+        return "\n\n---\n\n".join(context_parts)
+
+    def answer_with_context(
+        self,
+        question: str,
+        context: str,
+        temperature: Optional[float] = None,
+        max_tokens: Optional[int] = None,
+    ) -> LLMResponse:
+        inputs = self._prepare_rag_inputs(question, context)
+
         try:
-            # Override temperature if provided
-            if temperature is not None:
-                self._llm.temperature = temperature
+            logger.info(f"Generating answer for question: '{question[:100]}...'")
+
+            answer = self._rag_chain(temperature, max_tokens).invoke(inputs)
+
+            logger.info("Answer generated successfully")
+
+            return LLMResponse(
+                answer=answer.strip(),
+                model=self.model,
+            )
 
+        except openai.RateLimitError as e:
+            logger.error(f"LLM Rate Limit exceeded: {str(e)}")
+            raise LLMRateLimitError("Hệ thống đang quá tải (Rate Limit Exceeded). Vui lòng thử lại sau giây lát.")
+        except Exception as e:
+            logger.error(f"Failed to generate answer: {str(e)}", exc_info=True)
+            raise
+
+    async def aanswer_with_context(
+        self,
+        question: str,
+        context: str,
+        temperature: Optional[float] = None,
+        max_tokens: Optional[int] = None,
+    ) -> LLMResponse:
+        inputs = self._prepare_rag_inputs(question, context)
+
+        try:
             logger.info(f"Generating answer for question: '{question[:100]}...'")
 
-            # Invoke chain
-            answer = self._rag_chain.invoke({
-                "context": context,
-                "question": question,
-            })
+            answer = await self._rag_chain(temperature, max_tokens).ainvoke(inputs)
 
             logger.info("Answer generated successfully")
-            
-            # Reset temperature acts weird on instances, ideally we create new chain or clone, 
-            # but for this simple service we just set it back if we change it globally.
-            # In concurrent env, this is bad practice to change self._llm.temperature on the fly.
-            # But adapting strictly from template logic for now.
-            if temperature is not None:
-                self._llm.temperature = self.temperature
 
             return LLMResponse(
                 answer=answer.strip(),
@@ -151,6 +224,31 @@ Instructions:
             logger.error(f"Failed to generate answer: {str(e)}", exc_info=True)
             raise
 
+    async def astream_answer_with_context(
+        self,
+        question: str,
+        context: str,
+        temperature: Optional[float] = None,
+        max_tokens: Optional[int] = None,
+    ) -> AsyncIterator[str]:
+        inputs = self._prepare_rag_inputs(question, context)
+
+        try:
+            logger.info(f"Streaming answer for question: '{question[:100]}...'")
+
+            async for delta in self._rag_chain(temperature, max_tokens).astream(inputs):
+                if delta:
+                    yield delta
+
+            logger.info("Answer streamed successfully")
+
+        except openai.RateLimitError as e:
+            logger.error(f"LLM Rate Limit exceeded: {str(e)}")
+            raise LLMRateLimitError("Hệ thống đang quá tải (Rate Limit Exceeded). Vui lòng thử lại sau giây lát.")
+        except Exception as e:
+            logger.error(f"Failed to stream answer: {str(e)}", exc_info=True)
+            raise
+
     def answer_with_sources(
         self,
         question: str,
@@ -158,24 +256,23 @@ Instructions:
         temperature: Optional[float] = None,
         max_tokens: Optional[int] = None,
     ) -> LLMResponse:
-        if not sources:
-            context = "Không tìm thấy thông tin liên quan trong tài liệu."
-        else:
-            context_parts = []
-            for idx, source in enumerate(sources, 1):
-                file_name = source.get("file_name", "Unknown")
-                content = source.get("content", "")
-                score = source.get("score", 0.0)
-                
-                context_parts.append(
-                    f"[Source S{idx} - {file_name} (score: {score:.2f})]\n{content}"
-                )
-            
-            context = "\n\n---\n\n".join(context_parts)
-
         return self.answer_with_context(
             question=question,
-            context=context,
+            context=self._build_sources_context(sources),
+            temperature=temperature,
+            max_tokens=max_tokens,
+        )
+
+    async def aanswer_with_sources(
+        self,
+        question: str,
+        sources: List[Dict[str, Any]],
+        temperature: Optional[float] = None,
+        max_tokens: Optional[int] = None,
+    ) -> LLMResponse:
+        return await self.aanswer_with_context(
+            question=question,
+            context=self._build_sources_context(sources),
             temperature=temperature,
             max_tokens=max_tokens,
         )
@@ -187,14 +284,24 @@ Instructions:
         max_tokens: Optional[int] = None,
     ) -> str:
         try:
-            if temperature is not None:
-                self._llm.temperature = temperature
+            response = self._bind_llm(temperature, max_tokens).invoke(prompt)
+            return response.content.strip()
 
-            response = self._llm.invoke(prompt)
-            
-            if temperature is not None:
-                self._llm.temperature = self.temperature
+        except openai.RateLimitError as e:
+            logger.error(f"LLM Rate Limit exceeded: {str(e)}")
+            raise LLMRateLimitError("Hệ thống đang quá tải (Rate Limit Exceeded). Vui lòng thử lại sau giây lát.")
+        except Exception as e:
+            logger.error(f"Failed to generate text: {str(e)}", exc_info=True)
+            raise
 
+    async def agenerate(
+        self,
+        prompt: str,
+        temperature: Optional[float] = None,
+        max_tokens: Optional[int] = None,
+    ) -> str:
+        try:
+            response = await self._bind_llm(temperature, max_tokens).ainvoke(prompt)
             return response.content.strip()
 
         except openai.RateLimitError as e:
@@ -204,6 +311,24 @@ Instructions:
             logger.error(f"Failed to generate text: {str(e)}", exc_info=True)
             raise
 
+    async def astream_generate(
+        self,
+        prompt: str,
+        temperature: Optional[float] = None,
+        max_tokens: Optional[int] = None,
+    ) -> AsyncIterator[str]:
+        try:
+            async for chunk in self._bind_llm(temperature, max_tokens).astream(prompt):
+                if chunk.content:
+                    yield chunk.content
+
+        except openai.RateLimitError as e:
+            logger.error(f"LLM Rate Limit exceeded: {str(e)}")
+            raise LLMRateLimitError("Hệ thống đang quá tải (Rate Limit Exceeded). Vui lòng thử lại sau giây lát.")
+        except Exception as e:
+            logger.error(f"Failed to stream text: {str(e)}", exc_info=True)
+            raise
+
     def build_answer_payload(self, answer_text: str, sources: List[Dict[str, Any]]) -> Dict[str, Any]:
         references: List[Dict[str, Any]] = []
 
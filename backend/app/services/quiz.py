@@ -233,7 +233,7 @@ NỘI DUNG TÀI LIỆU:
         logger.info(f"Generating {num_questions} {quiz_type.value} questions")
         
         # Generate with LLM
-        response = self.llm_service.generate(prompt, temperature=0.7)
+        response = await self.llm_service.agenerate(prompt, temperature=0.7)
         
         # Parse response
         try:
@@ -0,0 +1,71 @@
+"""
+Adaptive top-k: số chunk gửi LLM thay đổi theo score thay vì cố định k=5.
+
+Lấy dư max_k ứng viên, bỏ các chunk có cosine dưới score_threshold, rồi cắt
+tại khoảng cách lớn nhất giữa 2 score liên tiếp (nếu khoảng cách >= min_gap),
+nhưng không cắt xuống dưới min_k. Không còn chunk nào = câu hỏi không liên quan
+đến tài liệu, bỏ qua prompt RAG.
+
+Relevance của chunk là cosine similarity: score khi search dense-only,
+metadata["dense_score"] khi search hybrid (kết quả xếp theo điểm RRF).
+Chunk chỉ được tìm thấy bởi BM25 (khớp từ khóa, vd mã học phần) luôn được giữ.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Optional, Sequence, Tuple
+
+from langchain_core.documents import Document
+
+from app.services.rag.retrieval_cache import SearchResults
+
+
+def relevance(doc: Document, score: float) -> Optional[float]:
+    """Cosine similarity của chunk, None nếu chunk chỉ khớp qua sparse (BM25)"""
+    metadata = doc.metadata or {}
+    if "dense_score" in metadata:
+        return float(metadata["dense_score"])
+    if "sparse_score" in metadata:
+        return None
+    return float(score)
+
+
+@dataclass(frozen=True)
+class AdaptiveK:
+    min_k: int = 2
+    max_k: int = 8
+    score_threshold: float = 0.3
+    min_gap: float = 0.1
+
+    def select(self, results: Sequence[Tuple[Document, float]]) -> SearchResults:
+        """Chọn các chunk liên quan trong results (đã sắp theo score), giữ nguyên thứ tự"""
+        candidates = [
+            (doc, score, relevance(doc, score))
+            for doc, score in results[:self.max_k]
+        ]
+        passing = [
+            item for item in candidates
+            if item[2] is None or item[2] >= self.score_threshold
+        ]
+
+        cutoff = self._gap_cutoff(passing)
+        if cutoff is not None:
+            passing = [item for item in passing if item[2] is None or item[2] >= cutoff]
+        return [(doc, score) for doc, score, _ in passing]
+
+    def _gap_cutoff(self, items: Sequence[Tuple[Document, float, Optional[float]]]) -> Optional[float]:
+        """Score thấp nhất được giữ nếu có khoảng cách đủ lớn, None = không cắt"""
+        if self.min_gap <= 0:
+            return None
+        lexical = sum(1 for _, _, value in items if value is None)
+        values = sorted((value for _, _, value in items if value is not None), reverse=True)
+        best_gap, keep = 0.0, len(values)
+        for position in range(1, len(values)):
+            gap = values[position - 1] - values[position]
+            if gap > best_gap:
+                best_gap, keep = gap, position
+        if best_gap < self.min_gap:
+            return None
+        # Khoảng cách lớn nhất nằm trước min_k: vẫn giữ đủ min_k chunk
+        keep = min(len(values), max(keep, self.min_k - lexical, 1))
+        return values[keep - 1]
@@ -0,0 +1,180 @@
+"""
+Semantic cache câu trả lời RAG.
+
+Câu hỏi cùng nghĩa trên cùng notebook (tài liệu chưa đổi) được trả lời bằng
+answer payload đã có thay vì gọi lại LLM. Mỗi entry giữ embedding của câu hỏi;
+lookup so cosine similarity với các câu đã trả lời của cùng session, cùng
+version và cùng tham số (k, filter, temperature, max_tokens).
+
+Version của session tăng khi tài liệu thay đổi (xem content_version.py) và
+được đọc từ database dùng chung giữa các process: entry của version cũ bị bỏ
+ngay khi process thấy version mới.
+"""
+from __future__ import annotations
+
+import copy
+import json
+import logging
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.services.rag.retrieval_cache import canonicalize
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class _Entry:
+    session_id: str
+    version: int
+    scope: str
+    vector: np.ndarray  # đã chuẩn hóa
+    value: Any
+    created_at: float
+
+
+class SemanticAnswerCache:
+    """
+    Entry được trả về khi similarity >= threshold.
+    Giới hạn max_entries (LRU, toàn process) và max_entries_per_session;
+    entry hết hạn sau ttl giây (None = không hết hạn).
+    """
+
+    def __init__(
+        self,
+        threshold: float = 0.95,
+        max_entries: int = 2048,
+        max_entries_per_session: int = 128,
+        ttl: Optional[float] = 3600.0,
+    ) -> None:
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.max_entries_per_session = max_entries_per_session
+        self.ttl = ttl
+        self._entries: "OrderedDict[int, _Entry]" = OrderedDict()
+        self._by_session: Dict[str, "OrderedDict[int, None]"] = {}
+        # Version mới nhất đã thấy của mỗi session
+        self._latest: Dict[str, int] = {}
+        self._next_id = 0
+
+        self.hits = 0
+        self.misses = 0
+
+    def observe(self, session_id: str, version: int) -> None:
+        """Ghi nhận version hiện tại của session, bỏ câu trả lời của version cũ hơn"""
+        session_id = str(session_id)
+        if version <= self._latest.get(session_id, -1):
+            return
+        self._latest[session_id] = version
+        stale = [
+            entry_id for entry_id in self._by_session.get(session_id, ())
+            if self._entries[entry_id].version < version
+        ]
+        for entry_id in stale:
+            self._remove(entry_id)
+
+    def discard(self, session_id: str) -> None:
+        """Bỏ mọi câu trả lời của session (khi không cập nhật được version)"""
+        for entry_id in list(self._by_session.get(str(session_id), ())):
+            self._remove(entry_id)
+
+    @staticmethod
+    def make_scope(**params: Any) -> str:
+        """Tham số phải khớp chính xác (k, filter, ...) để dùng lại câu trả lời"""
+        return json.dumps(canonicalize(params), sort_keys=True, default=str)
+
+    @staticmethod
+    def _normalize(vector: Sequence[float]) -> np.ndarray:
+        array = np.asarray(vector, dtype=np.float32)
+        norm = float(np.linalg.norm(array))
+        return array / norm if norm > 0 else array
+
+    def _remove(self, entry_id: int) -> None:
+        entry = self._entries.pop(entry_id)
+        bucket = self._by_session.get(entry.session_id)
+        if bucket is not None:
+            bucket.pop(entry_id, None)
+            if not bucket:
+                del self._by_session[entry.session_id]
+
+    def get(
+        self,
+        session_id: str,
+        version: int,
+        scope: str,
+        vector: Sequence[float],
+    ) -> Optional[Tuple[Any, float]]:
+        """(value, similarity) của câu hỏi gần nhất nếu vượt threshold"""
+        session_id = str(session_id)
+        self.observe(session_id, version)
+        now = time.monotonic()
+        candidates = []
+        for entry_id in list(self._by_session.get(session_id, ())):
+            entry = self._entries[entry_id]
+            if self.ttl is not None and now - entry.created_at > self.ttl:
+                self._remove(entry_id)
+            elif entry.version == version and entry.scope == scope:
+                candidates.append(entry_id)
+
+        if candidates:
+            query = self._normalize(vector)
+            matrix = np.stack([self._entries[entry_id].vector for entry_id in candidates])
+            if matrix.shape[1] == query.shape[0]:
+                similarities = matrix @ query
+                best = int(np.argmax(similarities))
+                similarity = float(similarities[best])
+                if similarity >= self.threshold:
+                    entry_id = candidates[best]
+                    self._entries.move_to_end(entry_id)
+                    self._by_session[session_id].move_to_end(entry_id)
+                    self.hits += 1
+                    return copy.deepcopy(self._entries[entry_id].value), similarity
+
+        self.misses += 1
+        return None
+
+    def put(
+        self,
+        session_id: str,
+        version: int,
+        scope: str,
+        vector: Sequence[float],
+        value: Any,
+    ) -> None:
+        session_id = str(session_id)
+        if version < self._latest.get(session_id, 0):
+            # Tài liệu đã thay đổi trong lúc LLM trả lời
+            return
+        entry_id = self._next_id
+        self._next_id += 1
+        self._entries[entry_id] = _Entry(
+            session_id=session_id,
+            version=version,
+            scope=scope,
+            vector=self._normalize(vector),
+            value=copy.deepcopy(value),
+            created_at=time.monotonic(),
+        )
+        bucket = self._by_session.setdefault(session_id, OrderedDict())
+        bucket[entry_id] = None
+        while len(bucket) > self.max_entries_per_session:
+            self._remove(next(iter(bucket)))
+        while len(self._entries) > self.max_entries:
+            self._remove(next(iter(self._entries)))
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._by_session.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
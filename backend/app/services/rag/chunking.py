@@ -0,0 +1,32 @@
+"""
+Chunk offsets taken from the text splitter itself.
+
+The splitter is created with ``add_start_index=True`` so each chunk carries the
+position where the splitter found it. Offsets are validated in O(len(chunk))
+and only fall back to a forward search when the splitter could not place a
+chunk, so the whole pass stays linear in the size of the text.
+"""
+from __future__ import annotations
+
+from typing import Iterator, Sequence, Tuple
+
+from langchain_core.documents import Document
+
+START_INDEX_KEY = "start_index"
+
+
+def iter_chunk_spans(text: str, chunks: Sequence[Document]) -> Iterator[Tuple[Document, int, int]]:
+    """
+    Trả về (chunk, start, end) với vị trí của chunk trong `text`.
+    `start_index` của splitter bị xoá khỏi metadata của chunk.
+    """
+    hint = 0
+    for chunk in chunks:
+        content = chunk.page_content
+        start = chunk.metadata.pop(START_INDEX_KEY, -1)
+        if start < 0 or not text.startswith(content, start):
+            # Splitter không định vị được chunk: tìm tiếp từ chunk trước
+            found = text.find(content, hint)
+            start = found if found != -1 else hint
+        hint = start
+        yield chunk, start, start + len(content)
@@ -0,0 +1,30 @@
+"""
+Version nội dung vector store của từng session (chat).
+
+Retrieval cache và answer cache gắn entry với version này: version tăng mỗi khi
+tài liệu của session thay đổi (ingest, xóa document, xóa chat), entry của version
+cũ không bao giờ được trả về nữa.
+
+ContentVersions mặc định chỉ nằm trong process. Khi chạy nhiều worker, dùng
+bản lưu trong database (app.services.content_version) để thay đổi ở process này
+được các process khác thấy ngay.
+"""
+from __future__ import annotations
+
+from typing import Dict
+
+
+class ContentVersions:
+    """Version theo session, lưu trong process"""
+
+    def __init__(self) -> None:
+        self._versions: Dict[str, int] = {}
+
+    async def get(self, session_id: str) -> int:
+        return self._versions.get(str(session_id), 0)
+
+    async def bump(self, session_id: str) -> int:
+        """Tăng version của session, trả về version mới"""
+        session_id = str(session_id)
+        self._versions[session_id] = self._versions.get(session_id, 0) + 1
+        return self._versions[session_id]
@@ -0,0 +1,235 @@
+"""
+Ghép context cho prompt RAG trong giới hạn token.
+
+Chunk được cắt với overlap (mặc định 200 ký tự) nên các chunk liền nhau được
+retrieve cùng lúc sẽ lặp lại text. Các chunk của cùng document chồng lên nhau
+(theo start_char/end_char) hoặc liên tiếp (theo chunk_index) được gộp thành 1 span,
+phần overlap chỉ giữ 1 lần. Span được chọn theo score cho đến khi hết token budget,
+budget còn lại (nếu có) dùng để mở rộng span sang chunk lân cận.
+"""
+from __future__ import annotations
+
+import math
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Sequence, Tuple
+
+from langchain_core.documents import Document
+
+# Không có tokenizer của Gemini ở local: ước lượng bảo thủ cho tiếng Việt (~3 ký tự / token)
+CHARS_PER_TOKEN = 3.0
+# Token cho dòng tiêu đề "[Source Sx - file (score: ...)]" và dấu phân cách giữa các source
+SOURCE_OVERHEAD_TOKENS = 24
+# Nối 2 chunk liên tiếp không có offset chồng nhau
+_GAP_SEPARATOR = "\n\n"
+
+
+def estimate_tokens(text: str) -> int:
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+@dataclass
+class ContextSpan:
+    """Đoạn liên tục của 1 document, gộp từ 1 hoặc nhiều chunk"""
+    document_id: str
+    content: str
+    start_char: int
+    end_char: int
+    chunk_indexes: List[int]
+    score: float
+    rank: int  # Thứ hạng tốt nhất của các chunk được retrieve trong span
+    metadata: Dict[str, Any] = field(default_factory=dict)
+
+    @property
+    def tokens(self) -> int:
+        return estimate_tokens(self.content) + SOURCE_OVERHEAD_TOKENS
+
+    @property
+    def has_offsets(self) -> bool:
+        return self.end_char > self.start_char
+
+
+def _span_from_chunk(doc: Document, score: float, rank: int) -> ContextSpan:
+    metadata = doc.metadata or {}
+    return ContextSpan(
+        document_id=str(metadata.get("document_id", "unknown")),
+        content=doc.page_content,
+        start_char=int(metadata.get("start_char") or 0),
+        end_char=int(metadata.get("end_char") or 0),
+        chunk_indexes=[int(metadata.get("chunk_index") or 0)],
+        score=score,
+        rank=rank,
+        metadata=dict(metadata),
+    )
+
+
+def _touches(left: ContextSpan, right: ContextSpan) -> bool:
+    """right (bắt đầu sau left) chồng lên hoặc nối tiếp left"""
+    if left.document_id != right.document_id:
+        return False
+    if left.has_offsets and right.has_offsets and right.start_char <= left.end_char:
+        return True
+    return right.chunk_indexes[0] <= left.chunk_indexes[-1] + 1
+
+
+def _join(left: ContextSpan, right: ContextSpan) -> ContextSpan:
+    """Gộp right vào left, phần text chồng nhau chỉ giữ 1 lần"""
+    if left.has_offsets and right.has_offsets:
+        if right.end_char <= left.end_char:
+            content = left.content
+        elif right.start_char <= left.end_char:
+            content = left.content + right.content[left.end_char - right.start_char:]
+        else:
+            content = left.content + _GAP_SEPARATOR + right.content
+        start_char, end_char = left.start_char, max(left.end_char, right.end_char)
+    elif right.chunk_indexes[-1] <= left.chunk_indexes[-1]:
+        content, start_char, end_char = left.content, left.start_char, left.end_char
+    else:
+        content = left.content + _GAP_SEPARATOR + right.content
+        start_char, end_char = left.start_char, max(left.end_char, right.end_char)
+    best = left if left.rank <= right.rank else right
+    return ContextSpan(
+        document_id=left.document_id,
+        content=content,
+        start_char=start_char,
+        end_char=end_char,
+        chunk_indexes=sorted(set(left.chunk_indexes) | set(right.chunk_indexes)),
+        score=max(left.score, right.score),
+        rank=best.rank,
+        metadata=best.metadata,
+    )
+
+
+def _sort_key(span: ContextSpan) -> Tuple[str, int, int]:
+    return span.document_id, span.chunk_indexes[0], span.start_char
+
+
+def merge_spans(spans: Iterable[ContextSpan]) -> List[ContextSpan]:
+    """Gộp các span chồng nhau / liên tiếp của cùng document, sắp theo rank"""
+    merged: List[ContextSpan] = []
+    for span in sorted(spans, key=_sort_key):
+        if merged and _touches(merged[-1], span):
+            merged[-1] = _join(merged[-1], span)
+        else:
+            merged.append(span)
+    return sorted(merged, key=lambda span: span.rank)
+
+
+def _truncate(span: ContextSpan, max_tokens: int) -> ContextSpan:
+    """Cắt span quá dài (chỉ khi span tốt nhất không vừa budget)"""
+    max_chars = max(0, int((max_tokens - SOURCE_OVERHEAD_TOKENS) * CHARS_PER_TOKEN))
+    content = span.content[:max_chars]
+    return ContextSpan(
+        document_id=span.document_id,
+        content=content,
+        start_char=span.start_char,
+        end_char=span.start_char + len(content) if span.has_offsets else span.end_char,
+        chunk_indexes=span.chunk_indexes,
+        score=span.score,
+        rank=span.rank,
+        metadata=span.metadata,
+    )
+
+
+def _expand(
+    spans: List[ContextSpan],
+    neighbors: Sequence[Document],
+    budget: int,
+    rounds: int,
+) -> List[ContextSpan]:
+    """Thêm lần lượt chunk trước/sau của các span (span tốt nhất trước) khi còn budget"""
+    by_position: Dict[Tuple[str, int], Document] = {}
+    for doc in neighbors:
+        metadata = doc.metadata or {}
+        by_position[(str(metadata.get("document_id")), int(metadata.get("chunk_index") or 0))] = doc
+
+    used = sum(span.tokens for span in spans)
+    for _ in range(rounds):
+        for position, span in enumerate(spans):
+            for index in (span.chunk_indexes[0] - 1, span.chunk_indexes[-1] + 1):
+                doc = by_position.get((span.document_id, index))
+                if doc is None:
+                    continue
+                neighbor = _span_from_chunk(doc, span.score, span.rank)
+                if index < span.chunk_indexes[0]:
+                    expanded = _join(neighbor, span)
+                    expanded.metadata = span.metadata
+                else:
+                    expanded = _join(span, neighbor)
+                added = expanded.tokens - span.tokens
+                if used + added > budget:
+                    continue
+                used += added
+                span = expanded
+            spans[position] = span
+    # Span mở rộng có thể chạm nhau
+    return merge_spans(spans)
+
+
+def assemble_context(
+    results: Sequence[Tuple[Document, float]],
+    max_tokens: int,
+    neighbors: Sequence[Document] = (),
+    neighbor_rounds: int = 1,
+) -> List[ContextSpan]:
+    """
+    Gộp chunk được retrieve thành span rồi chọn span (score cao trước)
+    sao cho tổng token ước lượng <= max_tokens.
+    neighbors: chunk lân cận (đã fetch sẵn) dùng để mở rộng span nếu còn budget.
+    """
+    seen = set()
+    spans = []
+    for rank, (doc, score) in enumerate(results):
+        span = _span_from_chunk(doc, float(score), rank)
+        key = (span.document_id, span.chunk_indexes[0])
+        if key not in seen:
+            seen.add(key)
+            spans.append(span)
+
+    selected: List[ContextSpan] = []
+    used = 0
+    for span in merge_spans(spans):
+        if used + span.tokens <= max_tokens:
+            selected.append(span)
+            used += span.tokens
+        elif not selected:
+            selected.append(_truncate(span, max_tokens))
+            used = max_tokens
+
+    if neighbors and neighbor_rounds > 0 and used < max_tokens:
+        selected = _expand(selected, neighbors, max_tokens, neighbor_rounds)
+    return selected
+
+
+def neighbor_indexes(
+    results: Sequence[Tuple[Document, float]],
+    rounds: int,
+) -> Dict[str, List[int]]:
+    """chunk_index lân cận (trong khoảng rounds) cần fetch, theo document_id"""
+    hits: Dict[str, set] = {}
+    for doc, _ in results:
+        metadata = doc.metadata or {}
+        if metadata.get("chunk_index") is None or metadata.get("document_id") is None:
+            continue
+        hits.setdefault(str(metadata["document_id"]), set()).add(int(metadata["chunk_index"]))
+
+    wanted: Dict[str, List[int]] = {}
+    for document_id, indexes in hits.items():
+        around = {
+            index + offset
+            for index in indexes
+            for offset in range(-rounds, rounds + 1)
+            if index + offset >= 0
+        }
+        missing = sorted(around - indexes)
+        if missing:
+            wanted[document_id] = missing
+    return wanted
+
+
+def format_context(spans: Sequence[ContextSpan]) -> str:
+    """Context cho prompt, mỗi span là 1 source [Source Sx - file (score: ...)]"""
+    parts = []
+    for idx, span in enumerate(spans, 1):
+        file_name = span.metadata.get("file_name", "unknown")
+        parts.append(f"[Source S{idx} - {file_name} (score: {span.score:.2f})]\n{span.content}")
+    return "\n\n---\n\n".join(parts)
@@ -1,5 +1,5 @@
 from abc import ABC, abstractmethod
-from typing import List, Dict, Any
+from typing import Iterator, List, Dict, Any
 from langchain_core.documents import Document
 
 
@@ -7,3 +7,7 @@ class BaseConverter(ABC):
     @abstractmethod
     def convert(self, source: str, metadata: Dict[str, Any] = None) -> List[Document]:
         pass
+
+    def lazy_convert(self, source: str, metadata: Dict[str, Any] = None) -> Iterator[Document]:
+        """Như convert() nhưng trả về từng document ngay khi có"""
+        yield from self.convert(source, metadata=metadata)
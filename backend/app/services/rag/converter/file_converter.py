@@ -1,5 +1,5 @@
 import os
-from typing import List, Dict, Any, Type
+from typing import Iterator, List, Dict, Any, Type
 from langchain_core.documents import Document
 from .base import BaseConverter
 from .loaders.base_loader import BaseFileLoader
@@ -12,7 +12,7 @@ class FileConverter(BaseConverter):
     def register_loader(cls, loader_class: Type[BaseFileLoader]):
         cls._loaders.append(loader_class())
 
-    def convert(self, source: str, metadata: Dict[str, Any] = None) -> List[Document]:
+    def _get_loader(self, source: str) -> BaseFileLoader:
         if not os.path.exists(source):
             raise FileNotFoundError(f"File không tồn tại: {source}")
 
@@ -20,10 +20,19 @@ class FileConverter(BaseConverter):
 
         for loader in self._loaders:
             if loader.can_handle(ext):
-                docs = loader.load(source)
-                if metadata:
-                    for doc in docs:
-                        doc.metadata.update(metadata)
-                return docs
+                return loader
 
         raise ValueError(f"Không có loader phù hợp cho định dạng: {ext}")
+
+    def convert(self, source: str, metadata: Dict[str, Any] = None) -> List[Document]:
+        docs = self._get_loader(source).load(source)
+        if metadata:
+            for doc in docs:
+                doc.metadata.update(metadata)
+        return docs
+
+    def lazy_convert(self, source: str, metadata: Dict[str, Any] = None) -> Iterator[Document]:
+        for doc in self._get_loader(source).lazy_load(source):
+            if metadata:
+                doc.metadata.update(metadata)
+            yield doc
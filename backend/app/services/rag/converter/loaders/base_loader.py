@@ -1,5 +1,5 @@
 from abc import ABC, abstractmethod
-from typing import List
+from typing import Iterator, List
 from langchain_core.documents import Document
 
 class BaseFileLoader(ABC):
@@ -10,3 +10,7 @@ class BaseFileLoader(ABC):
     @abstractmethod
     def load(self, path: str) -> List[Document]:
         pass
+
+    def lazy_load(self, path: str) -> Iterator[Document]:
+        """Trả về từng trang/phần của tài liệu, mặc định là load() toàn bộ"""
+        yield from self.load(path)
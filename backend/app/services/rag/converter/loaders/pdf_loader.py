@@ -1,11 +1,106 @@
+import logging
+import multiprocessing
+import os
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Deque, Iterator, List, Optional, Tuple
+
 from langchain_community.document_loaders import PyPDFLoader
 from langchain_core.documents import Document
+from pypdf import PdfReader
 from .base_loader import BaseFileLoader
 
+logger = logging.getLogger(__name__)
+
+
+def _extract_page_range(path: str, start: int, end: int) -> List[Tuple[str, str]]:
+    """Chạy trong process con: extract text + page label của các trang [start, end)"""
+    reader = PdfReader(path)
+    labels = reader.page_labels
+    return [(reader.pages[idx].extract_text(), labels[idx]) for idx in range(start, end)]
+
 
 class PDFLoader(BaseFileLoader):
+    """
+    PDF nhỏ được extract tuần tự bằng PyPDFLoader.
+    PDF từ min_parallel_pages trang trở lên được chia thành các khoảng trang,
+    extract song song trong process pool rồi ghép lại đúng thứ tự.
+    """
+
+    workers: int = max(1, min(4, os.cpu_count() or 1))
+    min_parallel_pages: int = 32
+    pages_per_task: int = 16
+
+    _executor: Optional[ProcessPoolExecutor] = None
+
+    @classmethod
+    def configure(cls, workers: int, min_parallel_pages: int, pages_per_task: int = 16) -> None:
+        cls.shutdown()
+        cls.workers = max(1, workers)
+        cls.min_parallel_pages = min_parallel_pages
+        cls.pages_per_task = max(1, pages_per_task)
+
+    @classmethod
+    def _get_executor(cls) -> ProcessPoolExecutor:
+        if cls._executor is None:
+            # Không fork: process API có nhiều thread (event loop, thread pool, client HTTP),
+            # fork có thể copy lock đang bị giữ sang process con
+            cls._executor = ProcessPoolExecutor(
+                max_workers=cls.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return cls._executor
+
+    @classmethod
+    def shutdown(cls) -> None:
+        if cls._executor is not None:
+            cls._executor.shutdown(wait=False, cancel_futures=True)
+            cls._executor = None
+
     def can_handle(self, ext: str) -> bool:
         return ext == ".pdf"
 
     def load(self, path: str) -> list[Document]:
-        return PyPDFLoader(path).load()
+        return list(self.lazy_load(path))
+
+    def lazy_load(self, path: str) -> Iterator[Document]:
+        total_pages = len(PdfReader(path).pages)
+        if self.workers <= 1 or total_pages < self.min_parallel_pages:
+            return PyPDFLoader(path).lazy_load()
+        return self._parallel_load(path, total_pages)
+
+    def _parallel_load(self, path: str, total_pages: int) -> Iterator[Document]:
+        logger.info("Extracting %d pages of %s with %d processes", total_pages, path, self.workers)
+        executor = self._get_executor()
+        ranges = iter(range(0, total_pages, self.pages_per_task))
+        # Chỉ giữ ~2 khoảng / worker đang chạy hoặc chờ được đọc: khoảng tiếp theo chỉ được submit
+        # khi 1 khoảng được trả về, nên text không dồn lại khi các bước sau (split, embed) chậm hơn
+        in_flight: Deque[Tuple[int, Future]] = deque()
+
+        def submit_next() -> None:
+            start = next(ranges, None)
+            if start is not None:
+                end = min(start + self.pages_per_task, total_pages)
+                in_flight.append((start, executor.submit(_extract_page_range, path, start, end)))
+
+        for _ in range(self.workers * 2):
+            submit_next()
+        try:
+            # Trả về theo thứ tự trang, khoảng sau vẫn được extract trong lúc khoảng trước được xử lý
+            while in_flight:
+                start, future = in_flight.popleft()
+                pages = future.result()
+                submit_next()
+                for offset, (text, label) in enumerate(pages):
+                    yield Document(
+                        page_content=text,
+                        metadata={
+                            "source": path,
+                            "total_pages": total_pages,
+                            "page": start + offset,
+                            "page_label": label,
+                        },
+                    )
+        finally:
+            for _, future in in_flight:
+                future.cancel()
@@ -0,0 +1,186 @@
+"""
+Micro-batching in front of the embedding server (Ollama).
+
+Single-query embeddings arriving within a short window are sent as one
+batched request, the number of in-flight requests is capped, and query
+batches always get the next free slot before ingestion batches.
+"""
+from __future__ import annotations
+
+import asyncio
+import heapq
+import itertools
+import logging
+from dataclasses import dataclass
+from typing import List, Optional, Set, Tuple
+
+from langchain_core.embeddings import Embeddings
+
+logger = logging.getLogger(__name__)
+
+QUERY_PRIORITY = 0
+DOCUMENT_PRIORITY = 1
+
+
+class _PrioritySlots:
+    """Semaphore trả slot trống cho waiter có priority nhỏ nhất trước (FIFO trong cùng priority)"""
+
+    def __init__(self, size: int) -> None:
+        self._free = size
+        self._waiters: List[Tuple[int, int, asyncio.Future]] = []
+        self._counter = itertools.count()
+
+    async def acquire(self, priority: int) -> None:
+        if self._free > 0 and not self._waiters:
+            self._free -= 1
+            return
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._counter), future))
+        try:
+            await future
+        except asyncio.CancelledError:
+            # Slot đã được giao nhưng task bị cancel: trả lại cho waiter khác
+            if future.done() and not future.cancelled():
+                self.release()
+            raise
+
+    def release(self) -> None:
+        while self._waiters:
+            _, _, future = heapq.heappop(self._waiters)
+            if not future.done():
+                future.set_result(None)
+                return
+        self._free += 1
+
+
+@dataclass
+class _PendingQuery:
+    text: str
+    future: asyncio.Future
+
+
+class BatchingEmbeddings(Embeddings):
+    """
+    Bọc một Embeddings có async API (vd: OllamaEmbeddings).
+
+    - Query: gom trong batch_window giây (tối đa max_batch_size) rồi gửi 1 request.
+    - Document: cắt thành batch max_batch_size, chạy với priority thấp hơn query.
+    - Tối đa max_concurrency request đến model cùng lúc.
+
+    Mọi caller trong app (RagService, QdrantStorage, LocalVectorStorage) dùng async API.
+    embed_query / embed_documents (sync) chỉ để đủ interface Embeddings: gọi thẳng model,
+    không qua batching và giới hạn concurrency.
+    """
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        batch_window: float = 0.005,
+        max_batch_size: int = 32,
+        max_concurrency: int = 4,
+    ) -> None:
+        if max_batch_size < 1 or max_concurrency < 1:
+            raise ValueError("max_batch_size and max_concurrency must be >= 1")
+        self.embeddings = embeddings
+        self.batch_window = batch_window
+        self.max_batch_size = max_batch_size
+        self.max_concurrency = max_concurrency
+
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._slots: Optional[_PrioritySlots] = None
+        self._queries: Optional[asyncio.Queue[_PendingQuery]] = None
+        self._dispatcher: Optional[asyncio.Task] = None
+        self._tasks: Set[asyncio.Task] = set()
+
+    # -------------------------------------------------------------------------
+    # Lifecycle
+    # -------------------------------------------------------------------------
+    def start(self) -> None:
+        """Gắn batcher vào event loop đang chạy (gọi trong lifespan của app)"""
+        self._ensure_started()
+
+    def _ensure_started(self) -> None:
+        if self._dispatcher is not None and not self._dispatcher.done():
+            return
+        self._loop = asyncio.get_running_loop()
+        self._slots = _PrioritySlots(self.max_concurrency)
+        self._queries = asyncio.Queue()
+        self._dispatcher = self._loop.create_task(self._dispatch_queries(), name="embedding-batcher")
+
+    def close(self) -> None:
+        if self._dispatcher is not None:
+            self._dispatcher.cancel()
+            self._dispatcher = None
+        for task in self._tasks:
+            task.cancel()
+        self._tasks.clear()
+        self._loop = None
+
+    # -------------------------------------------------------------------------
+    # Embeddings interface
+    # -------------------------------------------------------------------------
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.embeddings.embed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embeddings.embed_query(text)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        self._ensure_started()
+        future = asyncio.get_running_loop().create_future()
+        self._queries.put_nowait(_PendingQuery(text=text, future=future))
+        return await future
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        self._ensure_started()
+        batches = [
+            texts[start:start + self.max_batch_size]
+            for start in range(0, len(texts), self.max_batch_size)
+        ]
+        results = await asyncio.gather(
+            *(self._embed_batch(batch, DOCUMENT_PRIORITY) for batch in batches)
+        )
+        return [vector for batch_vectors in results for vector in batch_vectors]
+
+    # -------------------------------------------------------------------------
+    # Batching
+    # -------------------------------------------------------------------------
+    async def _embed_batch(self, texts: List[str], priority: int) -> List[List[float]]:
+        await self._slots.acquire(priority)
+        try:
+            return await self.embeddings.aembed_documents(texts)
+        finally:
+            self._slots.release()
+
+    async def _dispatch_queries(self) -> None:
+        while True:
+            batch = [await self._queries.get()]
+            # Chờ thêm query trong cửa sổ ngắn rồi gửi chung 1 request
+            if self.batch_window > 0:
+                await asyncio.sleep(self.batch_window)
+            while len(batch) < self.max_batch_size and not self._queries.empty():
+                batch.append(self._queries.get_nowait())
+
+            # Không chờ batch trước xong, để batch tiếp theo được gom trong lúc đó
+            task = asyncio.create_task(self._run_query_batch(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run_query_batch(self, batch: List[_PendingQuery]) -> None:
+        pending = [item for item in batch if not item.future.done()]
+        if not pending:
+            return
+        try:
+            vectors = await self._embed_batch([item.text for item in pending], QUERY_PRIORITY)
+        except Exception as exc:
+            logger.error("Query embedding batch of %d failed: %s", len(pending), exc)
+            for item in pending:
+                if not item.future.done():
+                    item.future.set_exception(exc)
+            return
+        logger.debug("Embedded query batch of %d", len(pending))
+        for item, vector in zip(pending, vectors):
+            if not item.future.done():
+                item.future.set_result(vector)
@@ -0,0 +1,219 @@
+"""
+Cache embedding lưu trên disk, key theo nội dung.
+
+Vector được lưu theo (model embedding, SHA-256 của text đã chuẩn hóa) dưới dạng
+blob float32 trong file SQLite, nên ingest lại cùng tài liệu (hoặc cùng slide
+ở notebook khác) không phải gọi Ollama nữa.
+
+Chỉ cache chunk của tài liệu: câu hỏi hầu như không lặp lại nguyên văn, cache
+chúng chỉ làm file phình ra và đẩy vector của chunk ra khỏi cache.
+"""
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import logging
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from array import array
+from pathlib import Path
+from typing import Dict, List, Sequence, Tuple
+
+from langchain_core.embeddings import Embeddings
+
+logger = logging.getLogger(__name__)
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def normalize_text(text: str) -> str:
+    """Chuẩn hoá text trước khi hash: NFC + gộp khoảng trắng"""
+    return _WHITESPACE_RE.sub(" ", unicodedata.normalize("NFC", text)).strip()
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+
+
+def _pack(vector: Sequence[float]) -> bytes:
+    return array("f", vector).tobytes()
+
+
+def _unpack(blob: bytes) -> List[float]:
+    vector = array("f")
+    vector.frombytes(blob)
+    return vector.tolist()
+
+
+class EmbeddingCache:
+    """
+    SQLite store cho vector float32, giới hạn theo dung lượng.
+    Khi vượt max_bytes, các vector ít được dùng gần đây nhất bị xoá
+    cho đến khi còn khoảng 90% giới hạn.
+
+    Dung lượng được đọc từ chính file SQLite (số trang đang dùng) mỗi lần ghi,
+    vì nhiều process (worker uvicorn) có thể dùng chung 1 file.
+    """
+
+    def __init__(self, path: str | Path, max_bytes: int = 512 * 1024 * 1024) -> None:
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS embeddings (
+                model TEXT NOT NULL,
+                text_hash TEXT NOT NULL,
+                vector BLOB NOT NULL,
+                last_used REAL NOT NULL,
+                PRIMARY KEY (model, text_hash)
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS ix_embeddings_last_used ON embeddings (last_used)")
+        self._conn.commit()
+
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def size_bytes(self) -> int:
+        with self._lock:
+            return self._used_bytes()
+
+    def _used_bytes(self) -> int:
+        """Dung lượng các trang đang dùng của database (gồm dữ liệu do process khác ghi). Gọi khi đang giữ lock."""
+        page_size = self._conn.execute("PRAGMA page_size").fetchone()[0]
+        page_count = self._conn.execute("PRAGMA page_count").fetchone()[0]
+        free_pages = self._conn.execute("PRAGMA freelist_count").fetchone()[0]
+        return (page_count - free_pages) * page_size
+
+    def get_many(self, model: str, hashes: Sequence[str]) -> Dict[str, List[float]]:
+        """Lấy các vector đã cache, key theo text hash"""
+        unique = list(dict.fromkeys(hashes))
+        if not unique:
+            return {}
+
+        found: Dict[str, List[float]] = {}
+        with self._lock:
+            # SQLite giới hạn số tham số trong 1 câu lệnh
+            for start in range(0, len(unique), 500):
+                batch = unique[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT text_hash, vector FROM embeddings WHERE model = ? AND text_hash IN ({placeholders})",
+                    (model, *batch),
+                ).fetchall()
+                for row_hash, blob in rows:
+                    found[row_hash] = _unpack(blob)
+
+            if found:
+                now = time.time()
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE model = ? AND text_hash = ?",
+                    [(now, model, row_hash) for row_hash in found],
+                )
+                self._conn.commit()
+
+        self.hits += len(found)
+        self.misses += len(unique) - len(found)
+        return found
+
+    def put_many(self, model: str, items: Dict[str, Sequence[float]]) -> None:
+        if not items:
+            return
+        now = time.time()
+        rows = [(model, row_hash, _pack(vector), now) for row_hash, vector in items.items()]
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (model, text_hash, vector, last_used) VALUES (?, ?, ?, ?)",
+                rows,
+            )
+            if self._used_bytes() > self.max_bytes:
+                self._evict()
+            self._conn.commit()
+
+    def _evict(self) -> None:
+        """Xoá vector LRU đến khi còn ~90% max_bytes. Gọi khi đang giữ lock."""
+        target = int(self.max_bytes * 0.9)
+        evicted = 0
+        size = self._used_bytes()
+        while size > target:
+            rows = self._conn.execute(
+                "SELECT model, text_hash FROM embeddings ORDER BY last_used LIMIT 200"
+            ).fetchall()
+            if not rows:
+                break
+            self._conn.executemany("DELETE FROM embeddings WHERE model = ? AND text_hash = ?", rows)
+            evicted += len(rows)
+            size = self._used_bytes()
+        logger.info("Embedding cache evicted %d vectors (size=%d bytes)", evicted, size)
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Bọc một Embeddings (vd: OllamaEmbeddings): chỉ gửi text chưa có trong cache
+    đến model, các text trùng nhau trong cùng batch chỉ được embed 1 lần.
+    Query không đi qua cache (xem docstring của module).
+    """
+
+    def __init__(self, embeddings: Embeddings, cache: EmbeddingCache, model: str) -> None:
+        self.embeddings = embeddings
+        self.cache = cache
+        self.model = model
+
+    def _lookup(self, texts: List[str]) -> Tuple[List[str], Dict[str, List[float]], List[Tuple[str, str]]]:
+        hashes = [text_hash(text) for text in texts]
+        cached = self.cache.get_many(self.model, hashes)
+        # Text cần embed, mỗi hash 1 lần
+        missing: Dict[str, str] = {}
+        for row_hash, text in zip(hashes, texts):
+            if row_hash not in cached and row_hash not in missing:
+                missing[row_hash] = text
+        return hashes, cached, list(missing.items())
+
+    def _merge(
+        self,
+        hashes: List[str],
+        cached: Dict[str, List[float]],
+        missing: List[Tuple[str, str]],
+        vectors: List[List[float]],
+    ) -> List[List[float]]:
+        computed = {row_hash: vector for (row_hash, _), vector in zip(missing, vectors)}
+        self.cache.put_many(self.model, computed)
+        cached.update(computed)
+        return [cached[row_hash] for row_hash in hashes]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        hashes, cached, missing = self._lookup(texts)
+        vectors = self.embeddings.embed_documents([text for _, text in missing]) if missing else []
+        if missing:
+            logger.debug("Embedding cache: %d hit, %d miss", len(texts) - len(missing), len(missing))
+        return self._merge(hashes, cached, missing, vectors)
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embeddings.embed_query(text)
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        # SQLite là I/O đồng bộ, chạy ngoài event loop
+        hashes, cached, missing = await asyncio.to_thread(self._lookup, texts)
+        vectors = await self.embeddings.aembed_documents([text for _, text in missing]) if missing else []
+        if missing:
+            logger.debug("Embedding cache: %d hit, %d miss", len(texts) - len(missing), len(missing))
+        return await asyncio.to_thread(self._merge, hashes, cached, missing, vectors)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        # Đi qua aembed_query của model bên trong để giữ priority của query (xem BatchingEmbeddings)
+        return await self.embeddings.aembed_query(text)
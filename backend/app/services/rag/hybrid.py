@@ -0,0 +1,102 @@
+"""
+Sparse (BM25) vector cho tiếng Việt và reciprocal rank fusion.
+
+Dense embedding hay bỏ lỡ mã học phần (IT3011), tên công thức và từ tiếng Việt
+gõ không dấu. Mỗi chunk có thêm 1 sparse vector BM25:
+- token = chuỗi chữ/số liên tiếp (lowercase, NFC), nên "IT3011" giữ nguyên 1 token
+- từ có dấu sinh thêm dạng bỏ dấu ("toán" -> "toán", "toan"), nên query không dấu vẫn khớp,
+  còn query có dấu khớp cả 2 dạng và được ưu tiên
+- term id = crc32(token), không cần từ điển; IDF do Qdrant tính (Modifier.IDF)
+"""
+from __future__ import annotations
+
+import math
+import re
+import unicodedata
+import zlib
+from collections import Counter
+from typing import Dict, Hashable, List, Sequence, Tuple, TypeVar
+
+from qdrant_client.models import SparseVector
+
+SPARSE_VECTOR_NAME = "bm25"
+RRF_K = 60
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+T = TypeVar("T")
+
+
+def fold_diacritics(text: str) -> str:
+    """Bỏ dấu tiếng Việt: "Đường đi ngắn nhất" -> "Duong di ngan nhat" """
+    decomposed = unicodedata.normalize("NFD", text)
+    stripped = "".join(ch for ch in decomposed if unicodedata.category(ch) != "Mn")
+    return stripped.replace("đ", "d").replace("Đ", "D")
+
+
+def tokenize(text: str) -> List[str]:
+    return _TOKEN_RE.findall(unicodedata.normalize("NFC", text).lower())
+
+
+def _term_id(token: str) -> int:
+    return zlib.crc32(token.encode("utf-8")) & 0x7FFFFFFF
+
+
+def _expand(tokens: Sequence[str]) -> Counter:
+    """Đếm token, từ có dấu được đếm thêm ở dạng bỏ dấu"""
+    counts: Counter = Counter()
+    for token in tokens:
+        counts[token] += 1
+        folded = fold_diacritics(token)
+        if folded != token:
+            counts[folded] += 1
+    return counts
+
+
+class BM25Encoder:
+    """
+    Trọng số BM25 phía document (tf bão hòa + chuẩn hóa độ dài theo avg_len);
+    query chỉ đánh dấu term (trọng số 1), IDF được nhân khi search.
+    """
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75, avg_len: float = 150.0) -> None:
+        self.k1 = k1
+        self.b = b
+        self.avg_len = avg_len
+
+    def encode_document(self, text: str) -> SparseVector:
+        tokens = tokenize(text)
+        norm = self.k1 * (1 - self.b + self.b * len(tokens) / self.avg_len)
+        weights: Dict[int, float] = {}
+        for token, tf in _expand(tokens).items():
+            term = _term_id(token)
+            weights[term] = weights.get(term, 0.0) + tf * (self.k1 + 1) / (tf + norm)
+        return SparseVector(indices=list(weights), values=list(weights.values()))
+
+    def encode_query(self, text: str) -> SparseVector:
+        terms = sorted({_term_id(token) for token in _expand(tokenize(text))})
+        return SparseVector(indices=terms, values=[1.0] * len(terms))
+
+
+def idf(document_count: int, document_frequency: int) -> float:
+    """Cùng công thức IDF với Qdrant (Modifier.IDF)"""
+    return math.log(1 + (document_count - document_frequency + 0.5) / (document_frequency + 0.5))
+
+
+def reciprocal_rank_fusion(
+    rankings: Sequence[Sequence[Tuple[Hashable, T]]],
+    limit: int,
+    k: int = RRF_K,
+) -> List[Tuple[Hashable, T, float]]:
+    """
+    Gộp nhiều danh sách (key, item) đã xếp hạng: score = sum(1 / (k + rank)).
+    Item được lấy từ danh sách đầu tiên chứa key.
+    """
+    scores: Dict[Hashable, float] = {}
+    items: Dict[Hashable, T] = {}
+    for ranking in rankings:
+        for rank, (key, item) in enumerate(ranking, 1):
+            scores[key] = scores.get(key, 0.0) + 1.0 / (k + rank)
+            items.setdefault(key, item)
+    ordered = sorted(scores.items(), key=lambda entry: entry[1], reverse=True)[:limit]
+    return [(key, items[key], score) for key, score in ordered]
@@ -0,0 +1,533 @@
+"""
+In-process vector index cho notebook nhỏ.
+
+Notebook có vài trăm chunk thì tìm exact cosine top-k bằng NumPy trong process
+nhanh hơn 1 round trip đến Qdrant. Qdrant vẫn là nơi lưu chính: mọi ghi/xóa đi
+qua Qdrant rồi mới áp vào index trong RAM. Khi collection vượt max_points, index
+được giải phóng và search chuyển hẳn sang Qdrant.
+
+Không có backing storage thì index chỉ nằm trong RAM (dùng cho test/benchmark
+không cần Qdrant server).
+
+Tổng số point trong RAM của mọi index được giới hạn bởi LocalIndexBudget dùng chung:
+vượt budget thì index ít được search gần đây nhất bị bỏ (search lại qua Qdrant
+và nạp lại khi cần).
+
+Với sparse_encoder, index giữ thêm posting list BM25 để search hybrid giống Qdrant
+(IDF tính trên các chunk của index).
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+from qdrant_client.models import FieldCondition, Filter, MatchAny, MatchValue, SparseVector
+
+from app.services.rag.hybrid import BM25Encoder, idf
+from app.services.rag.qdrant_storage.qdrant_storage import CONTENT_KEY, METADATA_KEY, QdrantStorage
+from app.services.rag.vector_storage import ScoredPoint, VectorStorage
+
+logger = logging.getLogger(__name__)
+
+
+def _payload_value(payload: Dict[str, Any], key: str) -> Any:
+    value: Any = payload
+    for part in key.split("."):
+        if not isinstance(value, dict):
+            return None
+        value = value.get(part)
+    return value
+
+
+def _condition_matches(payload: Dict[str, Any], condition: Any) -> bool:
+    if isinstance(condition, Filter):
+        return payload_matches(payload, condition)
+    if not isinstance(condition, FieldCondition):
+        raise NotImplementedError(f"Unsupported filter condition: {type(condition).__name__}")
+    value = _payload_value(payload, condition.key)
+    if condition.match is not None:
+        if isinstance(condition.match, MatchValue):
+            return value == condition.match.value
+        if isinstance(condition.match, MatchAny):
+            return value in condition.match.any
+        raise NotImplementedError(f"Unsupported match: {type(condition.match).__name__}")
+    if condition.range is not None:
+        if not isinstance(value, (int, float)) or isinstance(value, bool):
+            return False
+        bounds = condition.range
+        return (
+            (bounds.gt is None or value > bounds.gt)
+            and (bounds.gte is None or value >= bounds.gte)
+            and (bounds.lt is None or value < bounds.lt)
+            and (bounds.lte is None or value <= bounds.lte)
+        )
+    raise NotImplementedError("FieldCondition without match or range")
+
+
+def payload_matches(payload: Dict[str, Any], filter: Optional[Filter]) -> bool:
+    """Đánh giá Qdrant Filter (must/should/must_not, match value/any, range) trên 1 payload"""
+    if filter is None:
+        return True
+    if filter.must and not all(_condition_matches(payload, c) for c in filter.must):
+        return False
+    if filter.should and not any(_condition_matches(payload, c) for c in filter.should):
+        return False
+    if filter.must_not and any(_condition_matches(payload, c) for c in filter.must_not):
+        return False
+    return True
+
+
+class _Index:
+    """Ma trận vector đã chuẩn hóa (float32) + payload (+ sparse vector) theo cùng thứ tự dòng"""
+
+    def __init__(self, dim: int) -> None:
+        self.matrix = np.empty((0, dim), dtype=np.float32)
+        self.ids: List[str] = []
+        self.payloads: List[Dict[str, Any]] = []
+        self.sparse: List[Optional[SparseVector]] = []
+        # Giá trị payload theo từng key (cache), để lọc bằng phép toán trên mảng
+        self._columns: Dict[str, np.ndarray] = {}
+        # term id -> (dòng, trọng số), dựng lại khi index thay đổi
+        self._postings: Optional[Dict[int, Tuple[np.ndarray, np.ndarray]]] = None
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def add(
+        self,
+        ids: Sequence[str],
+        vectors: Sequence[Sequence[float]],
+        payloads: Sequence[Dict[str, Any]],
+        sparse: Optional[Sequence[SparseVector]] = None,
+    ) -> None:
+        known = set(self.ids)
+        rows = [i for i, point_id in enumerate(ids) if point_id not in known]
+        if not rows:
+            return
+        block = np.asarray([vectors[i] for i in rows], dtype=np.float32)
+        norms = np.linalg.norm(block, axis=1, keepdims=True)
+        block /= np.where(norms == 0, 1, norms)
+        self.matrix = np.vstack([self.matrix, block])
+        self.ids.extend(ids[i] for i in rows)
+        self.payloads.extend(payloads[i] for i in rows)
+        self.sparse.extend(sparse[i] if sparse is not None else None for i in rows)
+        self._columns.clear()
+        self._postings = None
+
+    def _column(self, key: str) -> np.ndarray:
+        column = self._columns.get(key)
+        if column is None:
+            column = np.empty(len(self), dtype=object)
+            column[:] = [_payload_value(p, key) for p in self.payloads]
+            self._columns[key] = column
+        return column
+
+    def _numeric_column(self, key: str) -> np.ndarray:
+        cache_key = f"{key}#numeric"
+        column = self._columns.get(cache_key)
+        if column is None:
+            column = np.fromiter(
+                (
+                    value if isinstance(value, (int, float)) and not isinstance(value, bool) else np.nan
+                    for value in self._column(key)
+                ),
+                dtype=np.float64,
+                count=len(self),
+            )
+            self._columns[cache_key] = column
+        return column
+
+    def _condition_mask(self, condition: Any) -> np.ndarray:
+        if isinstance(condition, Filter):
+            return self._filter_mask(condition)
+        if not isinstance(condition, FieldCondition):
+            raise NotImplementedError(f"Unsupported filter condition: {type(condition).__name__}")
+        if condition.match is not None:
+            column = self._column(condition.key)
+            if isinstance(condition.match, MatchValue):
+                return column == condition.match.value
+            if isinstance(condition.match, MatchAny):
+                wanted = set(condition.match.any)
+                return np.fromiter((value in wanted for value in column), dtype=bool, count=len(self))
+            raise NotImplementedError(f"Unsupported match: {type(condition.match).__name__}")
+        if condition.range is not None:
+            column = self._numeric_column(condition.key)
+            bounds = condition.range
+            mask = ~np.isnan(column)
+            if bounds.gt is not None:
+                mask &= column > bounds.gt
+            if bounds.gte is not None:
+                mask &= column >= bounds.gte
+            if bounds.lt is not None:
+                mask &= column < bounds.lt
+            if bounds.lte is not None:
+                mask &= column <= bounds.lte
+            return mask
+        raise NotImplementedError("FieldCondition without match or range")
+
+    def _filter_mask(self, filter: Filter) -> np.ndarray:
+        mask = np.ones(len(self), dtype=bool)
+        for condition in filter.must or []:
+            mask &= self._condition_mask(condition)
+        if filter.should:
+            any_mask = np.zeros(len(self), dtype=bool)
+            for condition in filter.should:
+                any_mask |= self._condition_mask(condition)
+            mask &= any_mask
+        for condition in filter.must_not or []:
+            mask &= ~self._condition_mask(condition)
+        return mask
+
+    def mask(self, filter: Optional[Filter]) -> Optional[np.ndarray]:
+        if filter is None:
+            return None
+        return self._filter_mask(filter)
+
+    def remove(self, filter: Filter) -> int:
+        return self._keep(~self.mask(filter))
+
+    def remove_ids(self, ids: Iterable[str]) -> int:
+        ids = set(ids)
+        if not ids:
+            return 0
+        return self._keep(np.fromiter((point_id not in ids for point_id in self.ids), dtype=bool, count=len(self)))
+
+    def _keep(self, keep: np.ndarray) -> int:
+        removed = len(self) - int(keep.sum())
+        if removed:
+            self.matrix = self.matrix[keep]
+            self.ids = [point_id for point_id, kept in zip(self.ids, keep) if kept]
+            self.payloads = [payload for payload, kept in zip(self.payloads, keep) if kept]
+            self.sparse = [vector for vector, kept in zip(self.sparse, keep) if kept]
+            self._columns.clear()
+            self._postings = None
+        return removed
+
+    def top_k(self, query: Sequence[float], k: int, filter: Optional[Filter]) -> List[Tuple[int, float]]:
+        if not len(self) or k <= 0:
+            return []
+        vector = np.asarray(query, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        scores = self.matrix @ (vector / norm if norm else vector)
+        mask = self.mask(filter)
+        if mask is not None:
+            candidates = np.flatnonzero(mask)
+            scores = scores[candidates]
+        else:
+            candidates = np.arange(len(self))
+        return self._best(candidates, scores, k)
+
+    def _get_postings(self) -> Dict[int, Tuple[np.ndarray, np.ndarray]]:
+        if self._postings is None:
+            collected: Dict[int, Tuple[List[int], List[float]]] = {}
+            for row, vector in enumerate(self.sparse):
+                if vector is None:
+                    continue
+                for term, weight in zip(vector.indices, vector.values):
+                    rows, weights = collected.setdefault(term, ([], []))
+                    rows.append(row)
+                    weights.append(weight)
+            self._postings = {
+                term: (np.asarray(rows, dtype=np.int64), np.asarray(weights, dtype=np.float32))
+                for term, (rows, weights) in collected.items()
+            }
+        return self._postings
+
+    def sparse_top_k(self, query: SparseVector, k: int, filter: Optional[Filter]) -> List[Tuple[int, float]]:
+        """BM25: sum(query weight * idf * document weight), chỉ trên chunk có ít nhất 1 term"""
+        if not len(self) or k <= 0:
+            return []
+        postings = self._get_postings()
+        total = sum(1 for vector in self.sparse if vector is not None)
+        scores = np.zeros(len(self), dtype=np.float32)
+        for term, weight in zip(query.indices, query.values):
+            entry = postings.get(term)
+            if entry is None:
+                continue
+            rows, weights = entry
+            scores[rows] += weight * idf(total, len(rows)) * weights
+        matched = scores > 0
+        mask = self.mask(filter)
+        if mask is not None:
+            matched &= mask
+        candidates = np.flatnonzero(matched)
+        return self._best(candidates, scores[candidates], k)
+
+    @staticmethod
+    def _best(candidates: np.ndarray, scores: np.ndarray, k: int) -> List[Tuple[int, float]]:
+        k = min(k, len(candidates))
+        if k == 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(int(candidates[i]), float(scores[i])) for i in top]
+
+
+def _to_document(payload: Dict[str, Any]) -> Document:
+    # Copy metadata để kết quả search không sửa vào payload trong index
+    return Document(page_content=payload.get(CONTENT_KEY, ""), metadata=dict(payload.get(METADATA_KEY) or {}))
+
+
+class LocalIndexBudget:
+    """
+    Giới hạn tổng số point nằm trong RAM của các LocalVectorStorage dùng chung budget.
+    Index được search gần nhất nằm cuối; vượt max_points thì bỏ index ở đầu (LRU).
+    """
+
+    def __init__(self, max_points: int) -> None:
+        self.max_points = max_points
+        self._sizes: "OrderedDict[int, Tuple[LocalVectorStorage, int]]" = OrderedDict()
+        self.evictions = 0
+
+    @property
+    def used(self) -> int:
+        return sum(size for _, size in self._sizes.values())
+
+    def fits(self, points: int) -> bool:
+        return points <= self.max_points
+
+    def touch(self, storage: "LocalVectorStorage") -> None:
+        key = id(storage)
+        if key in self._sizes:
+            self._sizes.move_to_end(key)
+
+    def reserve(self, storage: "LocalVectorStorage", points: int) -> None:
+        """Ghi nhận kích thước index của storage, bỏ index khác (LRU) nếu vượt budget"""
+        self._sizes[id(storage)] = (storage, points)
+        self._sizes.move_to_end(id(storage))
+        used = self.used
+        while used > self.max_points and len(self._sizes) > 1:
+            _, (victim, size) = next(iter(self._sizes.items()))
+            if victim is storage:
+                break
+            victim.evict()
+            used -= size
+            self.evictions += 1
+
+    def release(self, storage: "LocalVectorStorage") -> None:
+        self._sizes.pop(id(storage), None)
+
+
+class LocalVectorStorage(VectorStorage):
+    """
+    Exact cosine top-k trong process, ghi xuyên (write-through) xuống `backing`.
+
+    - Index được nạp lazy ở lần search đầu tiên nếu collection có <= max_points point.
+    - Sau ttl giây index được đồng bộ lại để thấy thay đổi từ process khác:
+      chỉ so danh sách id, tải vector của point mới và bỏ point đã bị xóa.
+    - observe_version(): version nội dung (dùng chung giữa các process) mới hơn
+      version lúc đồng bộ thì index được đồng bộ lại ngay ở lần search sau,
+      không chờ hết ttl.
+    - Vượt max_points: bỏ index, mọi search đi thẳng đến backing.
+    - budget (nếu có): giới hạn tổng số point trong RAM dùng chung giữa các storage.
+    """
+
+    def __init__(
+        self,
+        collection_name: str,
+        embedding: Any,
+        vector_size: int,
+        backing: Optional[QdrantStorage] = None,
+        max_points: int = 2000,
+        ttl: Optional[float] = 60.0,
+        sparse_encoder: Optional[BM25Encoder] = None,
+        budget: Optional[LocalIndexBudget] = None,
+    ) -> None:
+        self.collection_name = collection_name
+        self.embeddings = embedding
+        self.vector_size = vector_size
+        self.backing = backing
+        self.max_points = max_points
+        self.ttl = ttl
+        self.sparse_encoder = sparse_encoder
+        self.budget = budget
+
+        self._index: Optional[_Index] = _Index(vector_size) if backing is None else None
+        self._loaded_at = 0.0
+        # Version nội dung mới nhất đã thấy / version tại lần đồng bộ gần nhất
+        self._seen_version = 0
+        self._loaded_version = 0
+        self._lock = asyncio.Lock()
+
+    # -------------------------------------------------------------------------
+    # Index lifecycle
+    # -------------------------------------------------------------------------
+    def observe_version(self, version: int) -> None:
+        """Ghi nhận version nội dung của session, gọi trước khi search"""
+        self._seen_version = max(self._seen_version, version)
+
+    def _stale(self) -> bool:
+        if self.backing is None:
+            return False
+        if self._seen_version > self._loaded_version:
+            return True
+        return self.ttl is not None and time.monotonic() - self._loaded_at > self.ttl
+
+    async def _local_index(self) -> Optional[_Index]:
+        """Index trong RAM, hoặc None nếu collection quá lớn (search qua backing)"""
+        if self.backing is None:
+            return self._index
+        if self._loaded_at and not self._stale():
+            if self._index is not None and self.budget is not None:
+                self.budget.touch(self)
+            return self._index
+        async with self._lock:
+            if self._loaded_at and not self._stale():
+                return self._index
+            self._loaded_at = time.monotonic()
+            # Đọc từ backing sau khi version được ghi nhận: index ít nhất mới bằng version này
+            self._loaded_version = self._seen_version
+            total = await self.backing.count()
+            if total > self.max_points or (self.budget is not None and not self.budget.fits(total)):
+                logger.debug("Collection %s has %d points, searching in Qdrant", self.collection_name, total)
+                self._drop_index()
+                return None
+
+            index = self._index if self._index is not None else _Index(self.vector_size)
+            current = await self.backing.point_ids()
+            known = set(index.ids)
+            removed = index.remove_ids(known - set(current))
+            new_ids = [point_id for point_id in current if point_id not in known]
+            if new_ids:
+                ids, vectors, payloads = [], [], []
+                for point_id, vector, payload in await self.backing.get_points(new_ids):
+                    ids.append(point_id)
+                    vectors.append(vector)
+                    payloads.append(payload)
+                index.add(ids, vectors, payloads, self._encode([payload.get(CONTENT_KEY, "") for payload in payloads]))
+            self._index = index
+            if self.budget is not None:
+                self.budget.reserve(self, len(index))
+            if new_ids or removed:
+                logger.info(
+                    "Synced local index of %s: %d points (+%d, -%d)",
+                    self.collection_name, len(index), len(new_ids), removed,
+                )
+            return index
+
+    def _drop_index(self) -> None:
+        self._index = None
+        if self.budget is not None:
+            self.budget.release(self)
+
+    def evict(self) -> None:
+        """Bỏ index trong RAM (gọi bởi budget), lần search sau nạp lại từ backing"""
+        if self.backing is None:
+            return
+        self._drop_index()
+        self._loaded_at = 0.0
+
+    def _drop_if_too_large(self) -> None:
+        if self.backing is None or self._index is None:
+            return
+        if len(self._index) > self.max_points or (self.budget is not None and not self.budget.fits(len(self._index))):
+            logger.info("Local index of %s exceeded %d points, falling back to Qdrant", self.collection_name, self.max_points)
+            self._drop_index()
+        elif self.budget is not None:
+            self.budget.reserve(self, len(self._index))
+
+    async def create_collection(self, force_recreate: bool = False) -> None:
+        if self.backing is not None:
+            await self.backing.create_collection(force_recreate=force_recreate)
+        if force_recreate:
+            await self._reset()
+
+    async def delete_collection(self) -> None:
+        if self.backing is not None:
+            await self.backing.delete_collection()
+        await self._reset()
+
+    async def _reset(self) -> None:
+        async with self._lock:
+            self._drop_index()
+            if self.backing is None:
+                self._index = _Index(self.vector_size)
+            self._loaded_at = 0.0
+
+    # -------------------------------------------------------------------------
+    # Points
+    # -------------------------------------------------------------------------
+    async def add_embeddings(
+        self,
+        documents: Sequence[Document],
+        vectors: Sequence[Sequence[float]],
+        extra_payload: Optional[Dict[str, Any]] = None,
+    ) -> None:
+        if len(documents) != len(vectors):
+            raise ValueError("documents and vectors must have the same length")
+        if not documents:
+            return
+        # Cùng định dạng id Qdrant trả về, để index nạp lại không bị trùng point
+        ids = [str(uuid.uuid4()) for _ in documents]
+        if self.backing is not None:
+            await self.backing.add_embeddings(documents, vectors, extra_payload, ids=ids)
+        payloads = [
+            {**(extra_payload or {}), CONTENT_KEY: doc.page_content, METADATA_KEY: doc.metadata}
+            for doc in documents
+        ]
+        async with self._lock:
+            if self._index is not None:
+                self._index.add(ids, vectors, payloads, self._encode([doc.page_content for doc in documents]))
+                self._drop_if_too_large()
+
+    async def search_with_score(
+        self,
+        query: str,
+        k: int = 5,
+        filter: Optional[Filter] = None,
+        query_vector: Optional[Sequence[float]] = None,
+    ) -> List[Tuple[Document, float]]:
+        if not query:
+            raise ValueError("Query must not be empty.")
+        if await self._local_index() is None:
+            return await self.backing.search_with_score(query, k=k, filter=filter, query_vector=query_vector)
+        return await super().search_with_score(query, k=k, filter=filter, query_vector=query_vector)
+
+    async def dense_search(self, vector: Sequence[float], k: int, filter: Optional[Filter]) -> List[ScoredPoint]:
+        index = self._index
+        if index is None:
+            # Index vừa bị bỏ do vượt max_points
+            return await self.backing.dense_search(vector, k, filter)
+        return [(index.ids[row], _to_document(index.payloads[row]), score) for row, score in index.top_k(vector, k, filter)]
+
+    async def sparse_search(self, vector: SparseVector, k: int, filter: Optional[Filter]) -> List[ScoredPoint]:
+        index = self._index
+        if index is None:
+            if not await self.backing.supports_sparse():
+                return []
+            return await self.backing.sparse_search(vector, k, filter)
+        return [
+            (index.ids[row], _to_document(index.payloads[row]), score)
+            for row, score in index.sparse_top_k(vector, k, filter)
+        ]
+
+    def _encode(self, texts: Sequence[str]) -> Optional[List[SparseVector]]:
+        if self.sparse_encoder is None:
+            return None
+        return [self.sparse_encoder.encode_document(text) for text in texts]
+
+    async def scroll(self, filter: Optional[Filter], limit: int) -> List[Document]:
+        if self.backing is not None:
+            return await self.backing.scroll(filter, limit)
+        return [_to_document(p) for p in self._index.payloads if payload_matches(p, filter)][:limit]
+
+    async def count(self, filter: Optional[Filter] = None) -> int:
+        if self.backing is not None:
+            return await self.backing.count(filter)
+        mask = self._index.mask(filter)
+        return len(self._index) if mask is None else int(mask.sum())
+
+    async def delete_documents(self, filter: Filter) -> None:
+        if self.backing is not None:
+            await self.backing.delete_documents(filter)
+        async with self._lock:
+            if self._index is not None:
+                self._index.remove(filter)
+                if self.budget is not None and self.backing is not None:
+                    self.budget.reserve(self, len(self._index))
@@ -1,27 +1,114 @@
 from __future__ import annotations
 
 import logging
-from typing import Any, Dict, List, Optional, Sequence, Tuple
+import uuid
+from typing import Any, AsyncIterator, Dict, List, Optional, Sequence, Set, Tuple
 
 from langchain_core.documents import Document
 from langchain_qdrant import QdrantVectorStore
-from qdrant_client import QdrantClient
+from qdrant_client import AsyncQdrantClient
 from qdrant_client.http.exceptions import UnexpectedResponse
-from qdrant_client.models import Distance, VectorParams, Filter as QdrantFilter
+from qdrant_client.models import (
+    Distance,
+    FieldCondition,
+    Filter as QdrantFilter,
+    HnswConfigDiff,
+    IntegerIndexParams,
+    IntegerIndexType,
+    KeywordIndexParams,
+    KeywordIndexType,
+    MatchAny,
+    MatchValue,
+    Modifier,
+    PointStruct,
+    Range,
+    SparseVector,
+    SparseVectorParams,
+)
+
+from app.services.rag.hybrid import SPARSE_VECTOR_NAME, BM25Encoder
+from app.services.rag.vector_storage import ScoredPoint, VectorStorage
+
+from .vector_profiles import DEFAULT_PROFILE, VectorProfile
 
 logger = logging.getLogger(__name__)
 
 
-class QdrantStorage:
-    """Wrapper around Qdrant that exposes a minimal async interface for LangChain."""
+# Payload top-level dùng để tách dữ liệu các tenant trong collection dùng chung
+TENANT_KEY = "session_id"
+OWNER_KEY = "user_id"
+
+# Cùng key payload với langchain_qdrant để đọc được các point đã ghi trước đây
+CONTENT_KEY = QdrantVectorStore.CONTENT_KEY
+METADATA_KEY = QdrantVectorStore.METADATA_KEY
+
+METADATA_PREFIX = f"{METADATA_KEY}."
+RANGE_OPERATORS = ("gt", "gte", "lt", "lte")
+
+# Payload index trên metadata dùng cho lọc/xóa theo document và đọc chunk theo thứ tự.
+# chunk_index là số nguyên nên dùng integer index (hỗ trợ cả match và range).
+METADATA_INDEXES: Dict[str, Any] = {
+    "metadata.document_id": KeywordIndexParams(type=KeywordIndexType.KEYWORD),
+    "metadata.file_name": KeywordIndexParams(type=KeywordIndexType.KEYWORD),
+    "metadata.chunk_index": IntegerIndexParams(type=IntegerIndexType.INTEGER, lookup=True, range=True),
+}
+
+
+def build_metadata_filter(conditions: Dict[str, Any]) -> Optional[QdrantFilter]:
+    """
+    Chuyển dict metadata thành Qdrant Filter (các điều kiện AND với nhau):
+    - {"document_id": "12"}                 -> match value
+    - {"document_id": ["12", "13"]}         -> match any
+    - {"chunk_index": {"gte": 0, "lt": 50}} -> range
+    Key không có tiền tố "metadata." được hiểu là field trong metadata của chunk.
+    """
+    must: List[FieldCondition] = []
+    for key, value in conditions.items():
+        if value is None:
+            continue
+        field = key if key.startswith(METADATA_PREFIX) else METADATA_PREFIX + key
+        if isinstance(value, dict):
+            unknown = set(value) - set(RANGE_OPERATORS)
+            if unknown:
+                raise ValueError(f"Unsupported operators for '{key}': {sorted(unknown)}")
+            must.append(FieldCondition(key=field, range=Range(**value)))
+        elif isinstance(value, (list, tuple, set)):
+            must.append(FieldCondition(key=field, match=MatchAny(any=list(value))))
+        else:
+            must.append(FieldCondition(key=field, match=MatchValue(value=value)))
+    return QdrantFilter(must=must) if must else None
+
+
+class VectorSizeMismatchError(ValueError):
+    """Collection có sẵn được tạo với số chiều khác số chiều embedding hiện tại"""
+
+
+class QdrantStorage(VectorStorage):
+    """
+    Async wrapper around a Qdrant collection (AsyncQdrantClient, REST hoặc gRPC).
+
+    Embedding và search được gọi trực tiếp qua client async nên không có lời gọi
+    nào chặn event loop. Payload giữ định dạng của LangChain (page_content + metadata).
+
+    Nếu có `tenant` (vd: {"session_id": "12"}), storage là 1 phần của collection
+    dùng chung: mọi point được gắn payload tenant, mọi search/scroll/delete đều
+    được lọc theo tenant, và delete_collection() chỉ xóa dữ liệu của tenant đó.
+
+    Với sparse_encoder, collection mới có thêm sparse vector "bm25" (IDF do Qdrant tính)
+    bên cạnh dense vector. Collection cũ không có sparse vector thì chỉ search dense.
+    """
 
     def __init__(
         self,
         collection_name: str,
         embedding: Any,
-        client: QdrantClient,
+        client: AsyncQdrantClient,
         vector_size: int,
         distance_metric: Distance = Distance.COSINE,
+        known_collections: Optional[Set[str]] = None,
+        tenant: Optional[Dict[str, str]] = None,
+        profile: VectorProfile = DEFAULT_PROFILE,
+        sparse_encoder: Optional[BM25Encoder] = None,
     ) -> None:
         if not collection_name:
             raise ValueError("Collection name must be provided.")
@@ -31,31 +118,60 @@ class QdrantStorage:
         self.client = client
         self.vector_size = vector_size
         self.distance_metric = distance_metric
+        self.tenant = dict(tenant) if tenant else None
+        self.profile = profile
+        self.sparse_encoder = sparse_encoder
+        # None = chưa kiểm tra collection có sparse vector hay không
+        self._has_sparse: Optional[bool] = None
+
+        # Cache tên các collection đã biết là tồn tại (có thể dùng chung giữa nhiều storage)
+        self._known_collections = known_collections if known_collections is not None else set()
 
         logger.debug("Initialized QdrantStorage for collection=%s", self.collection_name)
 
     # -------------------------------------------------------------------------
     # Collection lifecycle
     # -------------------------------------------------------------------------
-    def collection_exists(self) -> bool:
+    async def collection_exists(self, refresh: bool = False) -> bool:
+        if not refresh and self.collection_name in self._known_collections:
+            return True
         try:
-            collections = self.client.get_collections().collections
+            exists = await self.client.collection_exists(self.collection_name)
         except Exception as exc:
-            logger.error("Failed to list Qdrant collections: %s", exc)
+            logger.error("Failed to check Qdrant collection '%s': %s", self.collection_name, exc)
             return False
-        return any(col.name == self.collection_name for col in collections)
+        if exists:
+            self._known_collections.add(self.collection_name)
+        else:
+            self._invalidate()
+        return exists
+
+    def _invalidate(self) -> None:
+        """Xóa collection khỏi cache sau khi bị xóa hoặc không còn tồn tại"""
+        self._known_collections.discard(self.collection_name)
+        self._has_sparse = None
 
-    def _create_collection(self) -> None:
+    async def _create_collection(self) -> None:
         logger.info(
-            "Creating Qdrant collection '%s' (size=%d, distance=%s)",
+            "Creating Qdrant collection '%s' (size=%d, distance=%s, profile=%s)",
             self.collection_name,
             self.vector_size,
             self.distance_metric.name,
+            self.profile.name,
         )
         try:
-            self.client.create_collection(
+            await self.client.create_collection(
                 collection_name=self.collection_name,
-                vectors_config=VectorParams(size=self.vector_size, distance=self.distance_metric),
+                vectors_config=self.profile.vectors_config(self.vector_size, self.distance_metric),
+                quantization_config=self.profile.quantization_config(),
+                sparse_vectors_config=(
+                    {SPARSE_VECTOR_NAME: SparseVectorParams(modifier=Modifier.IDF)}
+                    if self.sparse_encoder is not None
+                    else None
+                ),
+                # Collection dùng chung: không dựng HNSW toàn cục (m=0),
+                # mỗi tenant có graph riêng theo payload index (payload_m)
+                hnsw_config=HnswConfigDiff(payload_m=16, m=0) if self.tenant else None,
             )
         except UnexpectedResponse as exc:
             if "already exists" in str(exc).lower():
@@ -65,68 +181,312 @@ class QdrantStorage:
         except Exception as exc:
             logger.exception("Unable to create collection '%s'", self.collection_name)
             raise
+        await self._create_metadata_indexes()
+        if self.tenant:
+            await self._create_tenant_indexes()
+        self._known_collections.add(self.collection_name)
+        self._has_sparse = None
 
-    def create_collection(self, force_recreate: bool = False) -> None:
-        if force_recreate and self.collection_exists():
-            self.delete_collection()
-        if not self.collection_exists():
-            self._create_collection()
-
+    async def _create_metadata_indexes(self) -> None:
+        for field_name, field_schema in METADATA_INDEXES.items():
+            try:
+                await self.client.create_payload_index(
+                    collection_name=self.collection_name,
+                    field_name=field_name,
+                    field_schema=field_schema,
+                )
+            except Exception as exc:
+                # Search/delete vẫn chạy được khi thiếu index, chỉ chậm hơn
+                logger.warning("Failed to index '%s' on '%s': %s", field_name, self.collection_name, exc)
 
+    async def _create_tenant_indexes(self) -> None:
+        await self.client.create_payload_index(
+            collection_name=self.collection_name,
+            field_name=TENANT_KEY,
+            field_schema=KeywordIndexParams(type=KeywordIndexType.KEYWORD, is_tenant=True),
+        )
+        await self.client.create_payload_index(
+            collection_name=self.collection_name,
+            field_name=OWNER_KEY,
+            field_schema=KeywordIndexParams(type=KeywordIndexType.KEYWORD),
+        )
 
     # -------------------------------------------------------------------------
-    # Vector store helpers
+    # Tenant filtering
     # -------------------------------------------------------------------------
-    def _load_vectorstore(self) -> QdrantVectorStore:
-        if not self.collection_exists():
+    def _tenant_filter(self) -> Optional[QdrantFilter]:
+        if not self.tenant:
+            return None
+        return QdrantFilter(
+            must=[
+                FieldCondition(key=key, match=MatchValue(value=value))
+                for key, value in self.tenant.items()
+            ]
+        )
+
+    def _scoped(self, filter: Optional[QdrantFilter]) -> Optional[QdrantFilter]:
+        """Thêm điều kiện tenant vào filter (nếu storage thuộc collection dùng chung)"""
+        tenant_filter = self._tenant_filter()
+        if tenant_filter is None:
+            return filter
+        if filter is None:
+            return tenant_filter
+        return QdrantFilter(must=[*tenant_filter.must, filter])
+
+    async def create_collection(self, force_recreate: bool = False) -> None:
+        if force_recreate and await self.collection_exists(refresh=True):
+            await self.delete_collection()
+        if self.collection_name in self._known_collections:
+            return
+        if await self.collection_exists(refresh=True):
+            await self._check_vector_size()
+            # Collection tạo trước khi có payload index: bổ sung (idempotent)
+            await self._create_metadata_indexes()
+        else:
+            await self._create_collection()
+
+    async def _check_vector_size(self) -> None:
+        """
+        Số chiều của collection có sẵn phải khớp vector_size (model embedding +
+        EMBEDDING_DIMENSIONS), nếu không mọi upsert/search đều lỗi "wrong vector dimension".
+        """
+        info = await self.client.get_collection(self.collection_name)
+        vectors = info.config.params.vectors
+        if isinstance(vectors, dict):
+            # Collection có sparse vector: dense vector không tên nằm ở key ""
+            vectors = vectors.get("")
+        size = getattr(vectors, "size", None)
+        if size is None or size == self.vector_size:
+            return
+        self._invalidate()
+        message = (
+            f"Collection '{self.collection_name}' stores {size}-dimensional vectors but the embedding "
+            f"model produces {self.vector_size} (check EMBEDDING_DIMENSIONS). Existing vectors cannot "
+            f"be searched with the new size: restore the previous setting, or point "
+            f"QDRANT_SHARED_COLLECTION to a new collection and re-index (per-chat collections can be "
+            f"copied with `python -m app.migrate_collections`, which truncates vectors to EMBEDDING_DIMENSIONS)."
+        )
+        logger.error(message)
+        raise VectorSizeMismatchError(message)
+
+    async def delete_collection(self) -> None:
+        if self.tenant:
+            # Collection dùng chung: chỉ xóa dữ liệu của tenant
+            logger.info("Deleting tenant %s from Qdrant collection '%s'", self.tenant, self.collection_name)
+            if await self.collection_exists():
+                await self.client.delete(collection_name=self.collection_name, points_selector=self._tenant_filter())
+            return
+        logger.info("Deleting Qdrant collection '%s'", self.collection_name)
+        try:
+            await self.client.delete_collection(collection_name=self.collection_name)
+        finally:
+            self._invalidate()
+
+    async def supports_sparse(self) -> bool:
+        if self.sparse_encoder is None:
+            return False
+        if self._has_sparse is None:
+            try:
+                info = await self.client.get_collection(self.collection_name)
+            except Exception as exc:
+                logger.warning("Failed to read config of '%s': %s", self.collection_name, exc)
+                return False
+            self._has_sparse = SPARSE_VECTOR_NAME in (info.config.params.sparse_vectors or {})
+            if not self._has_sparse:
+                logger.info("Collection '%s' has no sparse vector, using dense search only", self.collection_name)
+        return self._has_sparse
+
+    async def _ensure_exists(self) -> None:
+        if not await self.collection_exists():
             raise ValueError(
                 f"Collection '{self.collection_name}' does not exist. Call create_collection() first."
             )
-        return QdrantVectorStore(
-            client=self.client,
-            collection_name=self.collection_name,
-            embedding=self.embeddings,
-        )
 
+    # -------------------------------------------------------------------------
+    # Points
+    # -------------------------------------------------------------------------
     async def add_documents(self, documents: Sequence[Document]) -> None:
         if not documents:
             logger.warning("Empty document list received. Skip ingestion.")
             return
-        vectorstore = self._load_vectorstore()
-        await vectorstore.aadd_documents(list(documents))
+        vectors = await self.embeddings.aembed_documents([doc.page_content for doc in documents])
+        await self.add_embeddings(documents, vectors)
         logger.info("Persisted %d documents into collection '%s'", len(documents), self.collection_name)
 
+    async def add_embeddings(
+        self,
+        documents: Sequence[Document],
+        vectors: Sequence[Sequence[float]],
+        extra_payload: Optional[Dict[str, Any]] = None,
+        ids: Optional[Sequence[str]] = None,
+    ) -> None:
+        """
+        Upsert documents với vector đã embed sẵn.
+        Payload gồm page_content + metadata, cộng thêm extra_payload và payload tenant ở top-level.
+        """
+        if len(documents) != len(vectors):
+            raise ValueError("documents and vectors must have the same length")
+        if not documents:
+            return
+        if ids is None:
+            ids = [uuid.uuid4().hex for _ in documents]
+        top_level = {**(extra_payload or {}), **(self.tenant or {})}
+        with_sparse = await self.supports_sparse()
+        points = [
+            PointStruct(
+                id=point_id,
+                vector=(
+                    {"": list(vector), SPARSE_VECTOR_NAME: self.sparse_encoder.encode_document(doc.page_content)}
+                    if with_sparse
+                    else list(vector)
+                ),
+                payload={
+                    **top_level,
+                    CONTENT_KEY: doc.page_content,
+                    METADATA_KEY: doc.metadata,
+                },
+            )
+            for point_id, doc, vector in zip(ids, documents, vectors)
+        ]
+        await self.client.upsert(
+            collection_name=self.collection_name,
+            points=points,
+            wait=True,
+        )
+        logger.debug("Upserted %d points into collection '%s'", len(points), self.collection_name)
 
+    @staticmethod
+    def _to_document(payload: Optional[Dict[str, Any]]) -> Document:
+        payload = payload or {}
+        return Document(
+            page_content=payload.get(CONTENT_KEY, ""),
+            metadata=payload.get(METADATA_KEY) or {},
+        )
 
     async def search_with_score(
         self,
         query: str,
         k: int = 5,
         filter: Optional[QdrantFilter] = None,
+        query_vector: Optional[Sequence[float]] = None,
     ) -> List[Tuple[Document, float]]:
-        if not query:
-            raise ValueError("Query must not be empty.")
-
-        vectorstore = self._load_vectorstore()
-        if filter:
-            results = await vectorstore.asimilarity_search_with_score(query, k=k, filter=filter)
-        else:
-            results = await vectorstore.asimilarity_search_with_score(query, k=k)
+        await self._ensure_exists()
+        results = await super().search_with_score(query, k=k, filter=filter, query_vector=query_vector)
         logger.debug("Search with score returned %d results for query='%s'", len(results), query)
         return results
 
+    async def dense_search(
+        self, vector: Sequence[float], k: int, filter: Optional[QdrantFilter]
+    ) -> List[ScoredPoint]:
+        response = await self.client.query_points(
+            collection_name=self.collection_name,
+            query=list(vector),
+            query_filter=self._scoped(filter),
+            search_params=self.profile.search_params(),
+            limit=k,
+            with_payload=True,
+        )
+        return [(str(point.id), self._to_document(point.payload), point.score) for point in response.points]
+
+    async def sparse_search(
+        self, vector: SparseVector, k: int, filter: Optional[QdrantFilter]
+    ) -> List[ScoredPoint]:
+        response = await self.client.query_points(
+            collection_name=self.collection_name,
+            query=vector,
+            using=SPARSE_VECTOR_NAME,
+            query_filter=self._scoped(filter),
+            limit=k,
+            with_payload=True,
+        )
+        return [(str(point.id), self._to_document(point.payload), point.score) for point in response.points]
+
+    async def scroll(self, filter: QdrantFilter, limit: int) -> List[Document]:
+        """Đọc payload của các point khớp filter (không kèm vector)"""
+        points, _ = await self.client.scroll(
+            collection_name=self.collection_name,
+            scroll_filter=self._scoped(filter),
+            limit=limit,
+            with_payload=True,
+            with_vectors=False,
+        )
+        return [self._to_document(point.payload) for point in points]
+
+    async def count(self, filter: Optional[QdrantFilter] = None) -> int:
+        result = await self.client.count(
+            collection_name=self.collection_name,
+            count_filter=self._scoped(filter),
+            exact=True,
+        )
+        return result.count
+
+    @staticmethod
+    def _dense_vector(point: Any) -> List[float]:
+        vector = point.vector
+        if isinstance(vector, dict):
+            # Collection có sparse vector: dense vector không tên nằm ở key ""
+            vector = vector.get("")
+        return vector
+
+    async def iter_points(
+        self, batch_size: int = 256
+    ) -> AsyncIterator[Tuple[str, List[float], Dict[str, Any]]]:
+        """Đọc toàn bộ point (id, vector, payload) của collection/tenant theo từng trang"""
+        offset = None
+        while True:
+            points, offset = await self.client.scroll(
+                collection_name=self.collection_name,
+                scroll_filter=self._tenant_filter(),
+                limit=batch_size,
+                offset=offset,
+                with_payload=True,
+                with_vectors=True,
+            )
+            for point in points:
+                yield str(point.id), self._dense_vector(point), point.payload or {}
+            if offset is None:
+                return
+
+    async def point_ids(self, batch_size: int = 1024) -> List[str]:
+        """Id của mọi point trong collection/tenant, không tải vector/payload"""
+        ids: List[str] = []
+        offset = None
+        while True:
+            points, offset = await self.client.scroll(
+                collection_name=self.collection_name,
+                scroll_filter=self._tenant_filter(),
+                limit=batch_size,
+                offset=offset,
+                with_payload=False,
+                with_vectors=False,
+            )
+            ids.extend(str(point.id) for point in points)
+            if offset is None:
+                return ids
+
+    async def get_points(
+        self, ids: Sequence[str], batch_size: int = 256
+    ) -> List[Tuple[str, List[float], Dict[str, Any]]]:
+        """Đọc (id, vector, payload) của các point theo id"""
+        result = []
+        for start in range(0, len(ids), batch_size):
+            points = await self.client.retrieve(
+                collection_name=self.collection_name,
+                ids=list(ids[start:start + batch_size]),
+                with_payload=True,
+                with_vectors=True,
+            )
+            result.extend((str(point.id), self._dense_vector(point), point.payload or {}) for point in points)
+        return result
+
     async def delete_documents(self, filter: QdrantFilter) -> None:
         """Delete documents matching the filter"""
         try:
-            self.client.delete(
+            await self.client.delete(
                 collection_name=self.collection_name,
-                points_selector=filter
+                points_selector=self._scoped(filter),
             )
             logger.info("Deleted documents from collection '%s' matching filter", self.collection_name)
         except Exception as e:
             logger.error("Failed to delete documents: %s", e)
             raise
-
-
-
-
@@ -0,0 +1,101 @@
+"""
+Collection profiles: cách Qdrant lưu và tìm vector của 1 collection.
+
+- float32: vector gốc trong RAM (mặc định, như trước đây)
+- float32_disk: vector gốc trên disk (mmap), RAM chỉ còn HNSW + page cache
+- int8: scalar quantization (1 byte / chiều) trong RAM, vector gốc trên disk để rescore
+- binary: binary quantization (1 bit / chiều) trong RAM, over-fetch `oversampling` lần
+  rồi rescore bằng vector gốc trên disk
+
+Profile chỉ áp dụng khi collection được tạo; collection cũ giữ cấu hình cũ
+(tạo lại hoặc migrate sang collection mới để đổi profile).
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+from qdrant_client.models import (
+    BinaryQuantization,
+    BinaryQuantizationConfig,
+    Distance,
+    QuantizationConfig,
+    QuantizationSearchParams,
+    ScalarQuantization,
+    ScalarQuantizationConfig,
+    ScalarType,
+    SearchParams,
+    VectorParams,
+)
+
+QUANTIZATION_INT8 = "int8"
+QUANTIZATION_BINARY = "binary"
+
+
+@dataclass(frozen=True)
+class VectorProfile:
+    name: str
+    quantization: Optional[str] = None
+    on_disk: bool = False
+    oversampling: float = 1.0
+    rescore: bool = True
+
+    def vectors_config(self, size: int, distance: Distance) -> VectorParams:
+        return VectorParams(size=size, distance=distance, on_disk=self.on_disk)
+
+    def quantization_config(self) -> Optional[QuantizationConfig]:
+        if self.quantization == QUANTIZATION_INT8:
+            return ScalarQuantization(
+                scalar=ScalarQuantizationConfig(type=ScalarType.INT8, quantile=0.99, always_ram=True)
+            )
+        if self.quantization == QUANTIZATION_BINARY:
+            return BinaryQuantization(binary=BinaryQuantizationConfig(always_ram=True))
+        return None
+
+    def search_params(self) -> Optional[SearchParams]:
+        if self.quantization is None:
+            return None
+        return SearchParams(
+            quantization=QuantizationSearchParams(
+                rescore=self.rescore,
+                oversampling=self.oversampling if self.oversampling > 1 else None,
+            )
+        )
+
+    def ram_bytes_per_vector(self, size: int) -> int:
+        """Ước lượng RAM cho vector (không tính HNSW graph và payload)"""
+        ram = 0 if self.on_disk else size * 4
+        if self.quantization == QUANTIZATION_INT8:
+            ram += size
+        elif self.quantization == QUANTIZATION_BINARY:
+            ram += (size + 7) // 8
+        return ram
+
+
+PROFILES: Dict[str, VectorProfile] = {
+    profile.name: profile
+    for profile in (
+        VectorProfile("float32"),
+        VectorProfile("float32_disk", on_disk=True),
+        VectorProfile("int8", quantization=QUANTIZATION_INT8, on_disk=True),
+        VectorProfile("binary", quantization=QUANTIZATION_BINARY, on_disk=True, oversampling=3.0),
+    )
+}
+
+DEFAULT_PROFILE = PROFILES["float32"]
+
+
+def get_profile(name: str, oversampling: Optional[float] = None) -> VectorProfile:
+    try:
+        profile = PROFILES[name]
+    except KeyError:
+        raise ValueError(f"Unknown vector profile '{name}', expected one of {sorted(PROFILES)}") from None
+    if oversampling is not None and profile.quantization is not None:
+        profile = VectorProfile(
+            name=profile.name,
+            quantization=profile.quantization,
+            on_disk=profile.on_disk,
+            oversampling=oversampling,
+            rescore=profile.rescore,
+        )
+    return profile
@@ -0,0 +1,137 @@
+"""
+In-memory cache kết quả retrieval.
+
+Sinh viên cùng lớp hỏi gần như cùng câu trên cùng notebook; mỗi lần search
+đều phải embed câu hỏi rồi query Qdrant. Kết quả được cache theo
+(session, version, query đã chuẩn hóa, k, filter).
+
+Version của session (xem content_version.py) tăng khi nội dung collection thay đổi
+(ingest, xóa document, xóa chat) và nằm trong key, nên entry cũ không bao giờ
+được trả về nữa. Version được đọc từ nơi dùng chung giữa các process
+(database), nên thay đổi ở process khác có hiệu lực ngay ở lần search sau.
+"""
+from __future__ import annotations
+
+import json
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+
+from langchain_core.documents import Document
+
+from app.services.rag.embedding_cache import normalize_text
+
+logger = logging.getLogger(__name__)
+
+SearchResults = List[Tuple[Document, float]]
+
+
+def canonicalize(value: Any) -> Any:
+    """Dạng so sánh được của filter/tham số: thứ tự key và phần tử list không quan trọng"""
+    if isinstance(value, dict):
+        return {str(key): canonicalize(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple, set)):
+        return sorted((canonicalize(item) for item in value), key=repr)
+    return value
+
+
+def _copy(results: SearchResults) -> SearchResults:
+    # Caller có thể sửa metadata của Document, không để ảnh hưởng entry trong cache
+    return [
+        (Document(page_content=doc.page_content, metadata=dict(doc.metadata)), score)
+        for doc, score in results
+    ]
+
+
+class RetrievalCache:
+    """
+    LRU giới hạn max_entries, entry hết hạn sau ttl giây (None = không hết hạn).
+    hits / misses / evictions dùng để theo dõi hit rate (xem stats).
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl: Optional[float] = 300.0) -> None:
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[Hashable, Tuple[float, SearchResults]]" = OrderedDict()
+        # Version mới nhất đã thấy của mỗi session
+        self._latest: Dict[str, int] = {}
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def observe(self, session_id: str, version: int) -> None:
+        """Ghi nhận version hiện tại của session, bỏ các entry của version cũ hơn"""
+        session_id = str(session_id)
+        if version <= self._latest.get(session_id, -1):
+            return
+        self._latest[session_id] = version
+        stale = [key for key in self._entries if key[0] == session_id and key[1] < version]
+        for key in stale:
+            del self._entries[key]
+
+    def discard(self, session_id: str) -> None:
+        """Bỏ mọi entry của session (khi không cập nhật được version)"""
+        session_id = str(session_id)
+        stale = [key for key in self._entries if key[0] == session_id]
+        for key in stale:
+            del self._entries[key]
+
+    def make_key(
+        self,
+        session_id: str,
+        version: int,
+        query: str,
+        k: int,
+        metadata_filter: Optional[Dict[str, Any]] = None,
+    ) -> Hashable:
+        """
+        Key gắn với version của session đọc trước khi search, để kết quả của
+        search chạy song song với ingest không được cache sai version.
+        """
+        self.observe(session_id, version)
+        filter_key = json.dumps(canonicalize(metadata_filter), sort_keys=True, default=str) if metadata_filter else ""
+        return (
+            str(session_id),
+            version,
+            normalize_text(query).casefold(),
+            k,
+            filter_key,
+        )
+
+    def get(self, key: Hashable) -> Optional[SearchResults]:
+        entry = self._entries.get(key)
+        if entry is not None and self.ttl is not None and time.monotonic() - entry[0] > self.ttl:
+            del self._entries[key]
+            entry = None
+        if entry is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return _copy(entry[1])
+
+    def put(self, key: Hashable, results: SearchResults) -> None:
+        session_id, version = key[0], key[1]
+        if version < self._latest.get(str(session_id), 0):
+            # Session đã thay đổi trong lúc search
+            return
+        self._entries[key] = (time.monotonic(), _copy(results))
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
@@ -1,49 +1,77 @@
 from __future__ import annotations
 
+import asyncio
+import dataclasses
 import logging
 import os
+import threading
+import time
 import uuid
-from dataclasses import dataclass
+import zlib
+from collections import OrderedDict
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Sequence, Tuple
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Optional, Sequence, Set, Tuple
 from datetime import datetime
 
+import httpx
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
 from langchain_ollama import OllamaEmbeddings
-from qdrant_client import QdrantClient
+from qdrant_client import AsyncQdrantClient
 from qdrant_client.http import models as qdrant_models
 
 from app.services.exceptions import LLMRateLimitError
 from app.services.llm import LLMService
+from app.services.rag.adaptive_k import AdaptiveK
+from app.services.rag.answer_cache import SemanticAnswerCache
+from app.services.rag.chunking import iter_chunk_spans
+from app.services.rag.content_version import ContentVersions
+from app.services.rag.context import assemble_context, format_context, neighbor_indexes
 from app.services.rag.converter import ConverterFactory
-from app.services.rag.qdrant_storage.qdrant_storage import QdrantStorage
+from app.services.rag.embedding_batcher import BatchingEmbeddings
+from app.services.rag.embedding_cache import CachedEmbeddings, EmbeddingCache
+from app.services.rag.hybrid import BM25Encoder
+from app.services.rag.local_storage import LocalIndexBudget, LocalVectorStorage
+from app.services.rag.matryoshka import MatryoshkaEmbeddings
+from app.services.rag.qdrant_storage.qdrant_storage import (
+    OWNER_KEY,
+    TENANT_KEY,
+    QdrantStorage,
+    build_metadata_filter,
+)
+from app.services.rag.qdrant_storage.vector_profiles import get_profile
+from app.services.rag.retrieval_cache import RetrievalCache
+from app.services.rag.vector_storage import VectorStorage
 
 logger = logging.getLogger(__name__)
 
+COLLECTION_MODE_PER_CHAT = "per_chat"
+COLLECTION_MODE_SHARED = "shared"
 
-@dataclass
-class ChunkInfo:
-    """Thông tin về mỗi chunk được cắt ra"""
-    chunk_index: int
-    content: str
-    start_char: int  # Vị trí bắt đầu trong tài liệu gốc
-    end_char: int    # Vị trí kết thúc trong tài liệu gốc
-    metadata: Dict[str, Any]
+
+def shared_collection_name(base: str, shards: int, session_id: str) -> str:
+    """Collection dùng chung chứa session; chia theo crc32(session_id) nếu có nhiều shard"""
+    if shards <= 1:
+        return base
+    return f"{base}_{zlib.crc32(str(session_id).encode()) % shards}"
 
 
 @dataclass
 class DocumentInfo:
-    """Thông tin tài liệu để lưu vào database"""
+    """
+    Thông tin tài liệu để lưu vào database.
+    Không giữ text hay chunks: text được đẩy dần ra content_sink của ingest_file.
+    """
     document_id: str  # UUID hoặc ID duy nhất
     user_id: str
     file_name: str
     file_path: str
-    full_content: str  # Nội dung đầy đủ của tài liệu
     content_length: int
-    chunks: List[ChunkInfo]  # Danh sách các chunks
     metadata: Dict[str, Any]
     created_at: datetime
+    page_offsets: List[int] = field(default_factory=list)  # Vị trí bắt đầu của mỗi trang trong full text
 
 @dataclass
 class QueryWithLLMResult:
@@ -54,6 +82,29 @@ class QueryWithLLMResult:
     context_used: str
     model: str
     retrieved_chunks: int
+    chosen_k: int = 0  # Số chunk được chọn sau adaptive top-k (0 = trả lời không dùng tài liệu)
+
+@dataclass
+class RagStreamEvent:
+    """Một event khi stream câu trả lời RAG (sources, delta hoặc result)"""
+    event: str
+    data: Any
+
+@dataclass
+class _IngestState:
+    """Kết quả tích luỹ của pipeline ingest (chỉ giữ số liệu, không giữ text)"""
+    page_offsets: List[int] = field(default_factory=list)
+    content_length: int = 0
+    chunk_count: int = 0
+    # Số giây: parse là thời gian chạy của bước parse, embed/upsert là tổng thời gian các batch
+    parse_seconds: float = 0.0
+    embed_seconds: float = 0.0
+    upsert_seconds: float = 0.0
+
+
+# Đánh dấu kết thúc trong các hàng đợi của pipeline ingest
+_PIPELINE_DONE = object()
+
 
 @dataclass
 class IngestionSummary:
@@ -62,23 +113,73 @@ class IngestionSummary:
     collection_name: str
     document_info: DocumentInfo  # Thông tin tài liệu để lưu vào DB
     chunk_count: int
+    page_count: int = 0
+    timings: Dict[str, float] = field(default_factory=dict)  # Số giây của từng bước trong pipeline
 
 
 class RagService:
     """
     Orchestrates ingestion and retrieval with per-user isolation and document tracking.
     Mỗi user có 1 collection riêng trong Qdrant.
+
+    Service được khởi tạo 1 lần trong lifespan của app và dùng chung cho mọi request,
+    nên embedding client, Qdrant client và storage cache được giữ lại giữa các request.
     """
 
+    # Số chunk khi không truyền k và adaptive top-k bị tắt
+    DEFAULT_K = 5
+
+    # Kích thước vector đã probe, cache theo embedding model + số chiều (dùng chung toàn process)
+    _vector_sizes: Dict[str, int] = {}
+
     def __init__(
         self,
         collection_prefix: str = "user_documents",
         chunk_size: int = 800,
         chunk_overlap: int = 200,
         embedding_model: str = "mxbai-embed-large",
+        embedding_base_url: Optional[str] = None,
         qdrant_url: Optional[str] = None,
         qdrant_api_key: Optional[str] = None,
+        qdrant_prefer_grpc: bool = False,
+        qdrant_grpc_port: int = 6334,
         recreate_collections: bool = False,
+        http_pool_size: int = 20,
+        embedding_cache_path: Optional[str] = None,
+        embedding_cache_max_mb: int = 512,
+        embedding_batch_window_ms: float = 5.0,
+        embedding_max_batch_size: int = 32,
+        embedding_max_concurrency: int = 4,
+        pipeline_batch_size: int = 64,
+        pipeline_queue_size: int = 4,
+        pipeline_embed_concurrency: int = 2,
+        pipeline_upsert_concurrency: int = 4,
+        collection_mode: str = COLLECTION_MODE_PER_CHAT,
+        shared_collection: str = "chat_documents",
+        shared_collection_shards: int = 1,
+        vector_profile: str = "float32",
+        vector_oversampling: Optional[float] = None,
+        embedding_dimensions: Optional[int] = None,
+        local_index_max_points: int = 2000,
+        local_index_ttl_seconds: Optional[float] = 60.0,
+        local_index_budget_points: int = 20000,
+        storage_cache_size: int = 256,
+        hybrid_search: bool = True,
+        bm25_avg_len: float = 150.0,
+        retrieval_cache_size: int = 1024,
+        retrieval_cache_ttl_seconds: Optional[float] = 300.0,
+        content_versions: Optional[ContentVersions] = None,
+        answer_cache: bool = False,
+        answer_cache_threshold: float = 0.95,
+        answer_cache_max_entries: int = 2048,
+        answer_cache_ttl_seconds: Optional[float] = 3600.0,
+        context_max_tokens: int = 3000,
+        context_neighbor_chunks: int = 0,
+        adaptive_k: bool = True,
+        adaptive_min_k: int = 2,
+        adaptive_max_k: int = 8,
+        score_threshold: float = 0.3,
+        score_min_gap: float = 0.1,
     ) -> None:
         self.collection_prefix = collection_prefix
         self.chunk_size = chunk_size
@@ -86,62 +187,261 @@ class RagService:
         self.embedding_model = embedding_model
         self._recreate_collections = recreate_collections
 
-        # Initialize embeddings
-        self._embedding = OllamaEmbeddings(model=self.embedding_model)
-        self._vector_size = len(self._embedding.embed_query("__dimension_probe__"))
+        # Cách lưu vector: 1 collection / chat, hoặc collection dùng chung cho mọi chat
+        if collection_mode not in (COLLECTION_MODE_PER_CHAT, COLLECTION_MODE_SHARED):
+            raise ValueError(f"Unknown collection mode: {collection_mode}")
+        self.collection_mode = collection_mode
+        self.shared_collection = shared_collection
+        self.shared_collection_shards = max(1, shared_collection_shards)
+
+        # Cách Qdrant lưu vector của collection mới (quantization, vector gốc trên disk)
+        self.vector_profile = get_profile(vector_profile, vector_oversampling)
+        # Matryoshka: chỉ giữ N chiều đầu của embedding (None = đầy đủ)
+        self.embedding_dimensions = embedding_dimensions or None
 
-        # Initialize Qdrant client
+        # Notebook nhỏ (<= local_index_max_points chunk) được search trong process; 0 = luôn dùng Qdrant
+        self.local_index_max_points = local_index_max_points
+        self.local_index_ttl_seconds = local_index_ttl_seconds
+        # Tổng số point của mọi index trong process, vượt thì bỏ index ít dùng nhất
+        self._local_index_budget = LocalIndexBudget(local_index_budget_points)
+
+        # Hybrid search: thêm sparse vector BM25 (tiếng Việt, bỏ dấu) bên cạnh dense vector
+        self._sparse_encoder = BM25Encoder(avg_len=bm25_avg_len) if hybrid_search else None
+
+        # Version nội dung của session, dùng trong key của cache (mặc định chỉ trong process)
+        self._content_versions = content_versions or ContentVersions()
+        # Cache kết quả search theo (session, version, query, k, filter); 0 = tắt
+        self._retrieval_cache: Optional[RetrievalCache] = None
+        if retrieval_cache_size > 0:
+            self._retrieval_cache = RetrievalCache(
+                max_entries=retrieval_cache_size,
+                ttl=retrieval_cache_ttl_seconds,
+            )
+        # Semantic cache câu trả lời LLM (opt-in): câu hỏi cùng nghĩa trên notebook chưa đổi
+        self._answer_cache: Optional[SemanticAnswerCache] = None
+        if answer_cache:
+            self._answer_cache = SemanticAnswerCache(
+                threshold=answer_cache_threshold,
+                max_entries=answer_cache_max_entries,
+                ttl=answer_cache_ttl_seconds,
+            )
+
+        # Context cho LLM: token budget (ước lượng) và số chunk lân cận được thêm vào mỗi phía
+        self.context_max_tokens = context_max_tokens
+        self.context_neighbor_chunks = context_neighbor_chunks
+
+        # Adaptive top-k khi query_with_llm không truyền k: lấy dư max_k chunk rồi cắt theo score
+        self._adaptive_k: Optional[AdaptiveK] = None
+        if adaptive_k:
+            self._adaptive_k = AdaptiveK(
+                min_k=adaptive_min_k,
+                max_k=adaptive_max_k,
+                score_threshold=score_threshold,
+                min_gap=score_min_gap,
+            )
+
+        # Ingest pipeline: kích thước batch, độ sâu hàng đợi giữa các bước, số task mỗi bước
+        self.pipeline_batch_size = pipeline_batch_size
+        self.pipeline_queue_size = pipeline_queue_size
+        self.pipeline_embed_concurrency = pipeline_embed_concurrency
+        self.pipeline_upsert_concurrency = pipeline_upsert_concurrency
+
+        # Giới hạn connection pool dùng chung cho Ollama và Qdrant
+        pool_limits = httpx.Limits(
+            max_connections=http_pool_size,
+            max_keepalive_connections=http_pool_size,
+        )
+
+        # Initialize embeddings (kích thước vector được probe lazy, xem get_vector_size)
+        embedding_kwargs: Dict[str, Any] = {"model": self.embedding_model}
+        if embedding_base_url:
+            embedding_kwargs["base_url"] = embedding_base_url
+        self._embedding: Embeddings = OllamaEmbeddings(
+            client_kwargs={"limits": pool_limits},
+            **embedding_kwargs,
+        )
+
+        # Gom query embedding thành batch, giới hạn số request đồng thời đến Ollama
+        # và ưu tiên query hơn batch của ingestion
+        self._embedding_batcher = BatchingEmbeddings(
+            self._embedding,
+            batch_window=embedding_batch_window_ms / 1000,
+            max_batch_size=embedding_max_batch_size,
+            max_concurrency=embedding_max_concurrency,
+        )
+        self._embedding = self._embedding_batcher
+
+        # Cache vector theo (model, hash nội dung chunk) để không embed lại tài liệu đã gặp
+        self._embedding_cache: Optional[EmbeddingCache] = None
+        if embedding_cache_path:
+            self._embedding_cache = EmbeddingCache(
+                embedding_cache_path,
+                max_bytes=embedding_cache_max_mb * 1024 * 1024,
+            )
+            self._embedding = CachedEmbeddings(self._embedding, self._embedding_cache, self.embedding_model)
+
+        # Cắt sau cache để cache vẫn giữ vector đầy đủ
+        if self.embedding_dimensions:
+            self._embedding = MatryoshkaEmbeddings(self._embedding, self.embedding_dimensions)
+
+        # Initialize Qdrant client (async, 1 connection pool / gRPC channel dùng chung)
         self._qdrant_url = qdrant_url or os.getenv("QDRANT_URL", "http://localhost:6333")
         self._qdrant_api_key = qdrant_api_key or os.getenv("QDRANT_API_KEY")
-        self._client = QdrantClient(url=self._qdrant_url, api_key=self._qdrant_api_key)
+        self._client = AsyncQdrantClient(
+            url=self._qdrant_url,
+            api_key=self._qdrant_api_key,
+            prefer_grpc=qdrant_prefer_grpc,
+            grpc_port=qdrant_grpc_port,
+            limits=pool_limits,
+        )
 
         # Initialize text splitter
         self._text_splitter = RecursiveCharacterTextSplitter(
             chunk_size=self.chunk_size,
             chunk_overlap=self.chunk_overlap,
             length_function=len,
+            # Splitter tự ghi vị trí bắt đầu của chunk, xem iter_chunk_spans
+            add_start_index=True,
         )
 
-        # Cache storage cho từng user
-        self._storage_cache: Dict[str, QdrantStorage] = {}
+        # Cache storage cho từng session (LRU, tối đa storage_cache_size session)
+        self.storage_cache_size = storage_cache_size
+        self._storage_cache: "OrderedDict[str, VectorStorage]" = OrderedDict()
+        # Cache tên các collection đã tồn tại trên Qdrant, dùng chung cho mọi storage
+        self._known_collections: Set[str] = set()
 
         logger.info(
-            "RagService initialized (prefix=%s, chunk_size=%d, overlap=%d)",
+            "RagService initialized (prefix=%s, mode=%s, grpc=%s, profile=%s, dims=%s, chunk_size=%d, overlap=%d)",
             self.collection_prefix,
+            self.collection_mode,
+            qdrant_prefer_grpc,
+            self.vector_profile.name,
+            self.embedding_dimensions or "full",
             self.chunk_size,
             self.chunk_overlap,
         )
 
+    async def get_vector_size(self) -> int:
+        """
+        Kích thước vector của embedding model.
+        Chỉ probe Ollama 1 lần cho mỗi model, các lần sau lấy từ cache.
+        """
+        key = f"{self.embedding_model}:{self.embedding_dimensions or 'full'}"
+        size = self._vector_sizes.get(key)
+        if size is None:
+            size = len(await self._embedding.aembed_query("__dimension_probe__"))
+            self._vector_sizes[key] = size
+            logger.info("Probed vector size for model=%s: %d", self.embedding_model, size)
+        return size
+
+    def start(self) -> None:
+        """Gắn embedding batcher vào event loop của app (gọi trong lifespan)"""
+        self._embedding_batcher.start()
+
+    async def aclose(self) -> None:
+        """Đóng các connection pool khi app shutdown"""
+        self._embedding_batcher.close()
+        if self._retrieval_cache is not None:
+            logger.info("Retrieval cache stats: %s", self._retrieval_cache.stats())
+            self._retrieval_cache.clear()
+        if self._answer_cache is not None:
+            logger.info("Answer cache stats: %s", self._answer_cache.stats())
+            self._answer_cache.clear()
+        self._storage_cache.clear()
+        self._known_collections.clear()
+        try:
+            await self._client.close()
+        except Exception as exc:
+            logger.warning("Failed to close Qdrant client: %s", exc)
+        if self._embedding_cache is not None:
+            self._embedding_cache.close()
+
+    def retrieval_cache_stats(self) -> Optional[Dict[str, Any]]:
+        """Hit rate của retrieval cache (None nếu cache bị tắt)"""
+        return self._retrieval_cache.stats() if self._retrieval_cache is not None else None
+
+    def answer_cache_stats(self) -> Optional[Dict[str, Any]]:
+        """Hit rate của semantic answer cache (None nếu cache bị tắt)"""
+        return self._answer_cache.stats() if self._answer_cache is not None else None
+
+    async def _invalidate_session_caches(self, session_id: str) -> None:
+        """Gọi sau mọi thay đổi nội dung collection của session: tăng version dùng chung"""
+        try:
+            version = await self._content_versions.bump(session_id)
+        except Exception as exc:
+            # Các process khác chỉ thấy thay đổi sau TTL của cache
+            logger.error("Failed to bump content version of session=%s: %s", session_id, exc)
+            for cache in (self._retrieval_cache, self._answer_cache):
+                if cache is not None:
+                    cache.discard(session_id)
+        else:
+            for cache in (self._retrieval_cache, self._answer_cache):
+                if cache is not None:
+                    cache.observe(session_id, version)
+
+    async def _content_version(self, session_id: str) -> Optional[int]:
+        """Version hiện tại của session, None nếu không đọc được (bỏ qua cache)"""
+        try:
+            return await self._content_versions.get(session_id)
+        except Exception as exc:
+            logger.warning("Failed to read content version of session=%s: %s", session_id, exc)
+            return None
+
     def _get_collection_name(self, session_id: str) -> str:
         """Tạo collection name cho session (chat)"""
+        if self.collection_mode == COLLECTION_MODE_SHARED:
+            return shared_collection_name(self.shared_collection, self.shared_collection_shards, session_id)
         return f"chat_{session_id}"
 
-    def _get_storage(self, session_id: str) -> QdrantStorage:
+    async def _get_storage(self, session_id: str) -> VectorStorage:
         """
         Lấy hoặc tạo storage cho session.
-        Mỗi session (chat) có 1 collection riêng.
+        Chế độ per_chat: mỗi session (chat) có 1 collection riêng.
+        Chế độ shared: các session dùng chung collection, tách bằng payload session_id.
+        Nếu bật local index, storage Qdrant được bọc bởi LocalVectorStorage.
         """
         if not session_id:
             raise ValueError("session_id must be provided")
         
         # Check cache
         if session_id in self._storage_cache:
+            self._storage_cache.move_to_end(session_id)
             return self._storage_cache[session_id]
         
         # Tạo storage mới
         collection_name = self._get_collection_name(session_id)
-        storage = QdrantStorage(
+        vector_size = await self.get_vector_size()
+        storage: VectorStorage = QdrantStorage(
             collection_name=collection_name,
             embedding=self._embedding,
-            vector_size=self._vector_size,
+            vector_size=vector_size,
             client=self._client,
+            known_collections=self._known_collections,
+            tenant={TENANT_KEY: str(session_id)} if self.collection_mode == COLLECTION_MODE_SHARED else None,
+            profile=self.vector_profile,
+            sparse_encoder=self._sparse_encoder,
         )
+        if self.local_index_max_points > 0:
+            storage = LocalVectorStorage(
+                collection_name=collection_name,
+                embedding=self._embedding,
+                vector_size=vector_size,
+                backing=storage,
+                max_points=self.local_index_max_points,
+                ttl=self.local_index_ttl_seconds,
+                sparse_encoder=self._sparse_encoder,
+                budget=self._local_index_budget,
+            )
         
         # Tạo collection nếu chưa tồn tại
-        storage.create_collection(force_recreate=self._recreate_collections)
+        await storage.create_collection(force_recreate=self._recreate_collections)
         
         # Cache storage
         self._storage_cache[session_id] = storage
+        while len(self._storage_cache) > self.storage_cache_size:
+            _, evicted = self._storage_cache.popitem(last=False)
+            if isinstance(evicted, LocalVectorStorage):
+                evicted.evict()
         
         logger.info("Created storage for session=%s, collection=%s", session_id, collection_name)
         
@@ -151,35 +451,6 @@ class RagService:
         """Tạo document_id duy nhất bằng UUID4"""
         return str(uuid.uuid4())
 
-    def _calculate_chunk_positions(
-        self, 
-        full_content: str, 
-        chunks: List[Document]
-    ) -> List[Tuple[int, int]]:
-        """
-        Tính toán vị trí start_char và end_char của mỗi chunk trong tài liệu gốc.
-        Trả về list các tuple (start_char, end_char)
-        """
-        positions = []
-        search_start = 0
-        
-        for chunk in chunks:
-            chunk_content = chunk.page_content
-            # Tìm vị trí của chunk trong full_content
-            start_pos = full_content.find(chunk_content, search_start)
-            
-            if start_pos == -1:
-                # Nếu không tìm thấy chính xác, ước lượng vị trí
-                start_pos = search_start
-                end_pos = start_pos + len(chunk_content)
-            else:
-                end_pos = start_pos + len(chunk_content)
-                search_start = start_pos + 1
-            
-            positions.append((start_pos, end_pos))
-        
-        return positions
-
     def _sanitize_metadata_value(self, value: Any) -> Any:
         """Chuyển đổi các giá trị metadata về dạng có thể serialize"""
         if isinstance(value, Path):
@@ -209,10 +480,19 @@ class RagService:
         session_id: str,
         file_path: Path,
         metadata: Optional[Dict[str, Any]] = None,
+        content_sink: Optional[Callable[[str], None]] = None,
     ) -> IngestionSummary:
         """
         Convert, split, and persist a document into user's vector store.
         Trả về DocumentInfo để lưu vào database.
+
+        Các bước chạy chồng lên nhau qua hàng đợi có giới hạn:
+        parse (thread) -> split -> embed -> upsert (nhiều batch song song),
+        nên thời gian xử lý gần bằng bước chậm nhất thay vì tổng các bước.
+
+        Text được xử lý từng trang và không được giữ lại: nếu cần lưu text,
+        truyền content_sink để nhận lần lượt các phần của full text
+        (các trang nối nhau bằng "\\n\\n").
         """
         if not file_path.exists() or not file_path.is_file():
             raise FileNotFoundError(f"File does not exist: {file_path}")
@@ -220,78 +500,72 @@ class RagService:
         if not session_id:
             raise ValueError("session_id must be provided")
 
-        storage = self._get_storage(session_id)
+        storage = await self._get_storage(session_id)
         
         # Tạo document_id duy nhất bằng UUIDv7
         document_id = self._generate_document_id()
 
         logger.info("Starting ingestion: user=%s, session=%s, file=%s, document_id=%s", 
                    user_id, session_id, file_path, document_id)
-        
-        # Convert tài liệu
-        converter = ConverterFactory.create("file")
-        documents = converter.convert(str(file_path), metadata=metadata)
-        if not documents:
-            raise ValueError(f"No content extracted from {file_path}")
+        started_at = time.perf_counter()
 
         raw_metadata: Dict[str, Any] = dict(metadata or {})
         raw_metadata.setdefault("content_format", "markdown")
-
-        for idx, doc in enumerate(documents):
-            doc.metadata = doc.metadata or {}
-            doc.metadata.update(raw_metadata)
-
         sanitized_metadata = self._sanitize_metadata(raw_metadata)
 
-        # Ghép nội dung đầy đủ
-        full_content = "\n\n".join([doc.page_content for doc in documents])
-        logger.debug("Extracted %d documents, total length: %d chars", 
-                    len(documents), len(full_content))
-
-        # Cắt thành chunks
-        chunks = self._text_splitter.split_documents(documents)
-        if not chunks:
-            raise ValueError(f"No chunks generated from {file_path}")
-
-        # Tính toán vị trí chunks
-        chunk_positions = self._calculate_chunk_positions(full_content, chunks)
+        # Metadata chung của mọi chunk; metadata truyền vào (vd: document_id của DB) được ưu tiên
+        chunk_meta_base = {
+            "user_id": user_id,
+            "session_id": session_id,
+            "document_id": document_id,
+            "source": str(file_path),
+            "file_name": file_path.name,
+            **sanitized_metadata,
+        }
+        chunk_meta_base.setdefault("content_format", "markdown")
 
-        # Chuẩn bị metadata và lưu chunks
-        chunk_infos: List[ChunkInfo] = []
-        
-        for idx, (chunk, (start_char, end_char)) in enumerate(zip(chunks, chunk_positions)):
-            chunk_meta = {
-                "user_id": user_id,
-                "session_id": session_id,
-                "document_id": document_id,
-                "source": str(file_path),
-                "file_name": file_path.name,
-                "chunk_index": idx,
-                "start_char": start_char,
-                "end_char": end_char,
-            }
-            
-            if sanitized_metadata:
-                chunk_meta.update(sanitized_metadata)
-            
-            chunk_meta.setdefault("content_format", "markdown")
+        await storage.create_collection()
 
-            chunk.metadata = chunk_meta
+        state = _IngestState()
+        stop_parsing = threading.Event()
+        pages: asyncio.Queue = asyncio.Queue(maxsize=self.pipeline_queue_size)
+        to_embed: asyncio.Queue = asyncio.Queue(maxsize=self.pipeline_queue_size)
+        to_upsert: asyncio.Queue = asyncio.Queue(maxsize=self.pipeline_queue_size)
 
-            chunk_info = ChunkInfo(
-                chunk_index=idx,
-                content=chunk.page_content,
-                start_char=start_char,
-                end_char=end_char,
-                metadata=chunk_meta
-            )
-            chunk_infos.append(chunk_info)
+        stages = [
+            asyncio.create_task(self._parse_stage(file_path, metadata, pages, stop_parsing, state)),
+            asyncio.create_task(self._split_stage(
+                pages, to_embed, state, chunk_meta_base,
+                self.pipeline_embed_concurrency, content_sink,
+            )),
+            *(
+                asyncio.create_task(self._embed_stage(to_embed, to_upsert, state))
+                for _ in range(self.pipeline_embed_concurrency)
+            ),
+            asyncio.create_task(self._upsert_stage(
+                storage, to_upsert, self.pipeline_embed_concurrency, state, {OWNER_KEY: user_id},
+            )),
+        ]
+        try:
+            await asyncio.gather(*stages)
+        except BaseException:
+            stop_parsing.set()
+            for task in stages:
+                task.cancel()
+            await asyncio.gather(*stages, return_exceptions=True)
+            # Xóa các chunk đã upsert của lần ingest lỗi
+            await self._delete_partial_document(storage, chunk_meta_base["document_id"])
+            raise
+        finally:
+            # Chunk được upsert dần trong lúc ingest (kể cả khi lỗi giữa chừng)
+            await self._invalidate_session_caches(session_id)
 
-        # Lưu vào Qdrant
-        logger.info("Persisting %d chunks for document_id=%s to collection=%s", 
-                   len(chunks), document_id, storage.collection_name)
-        storage.create_collection()
-        await storage.add_documents(chunks)
+        total_seconds = time.perf_counter() - started_at
+        logger.info(
+            "Persisted %d chunks (%d pages) for document_id=%s to collection=%s in %.2fs",
+            state.chunk_count, len(state.page_offsets), document_id,
+            storage.collection_name, total_seconds,
+        )
 
         # Tạo DocumentInfo
         document_info = DocumentInfo(
@@ -299,23 +573,206 @@ class RagService:
             user_id=user_id,
             file_name=file_path.name,
             file_path=str(file_path),
-            full_content=full_content,
-            content_length=len(full_content),
-            chunks=chunk_infos,
+            content_length=state.content_length,
             metadata=sanitized_metadata,
-            created_at=datetime.now()
+            created_at=datetime.now(),
+            page_offsets=state.page_offsets,
         )
 
         return IngestionSummary(
             user_id=user_id,
             collection_name=storage.collection_name,
             document_info=document_info,
-            chunk_count=len(chunks),
+            chunk_count=state.chunk_count,
+            page_count=len(state.page_offsets),
+            timings={
+                "parse": round(state.parse_seconds, 3),
+                "embed": round(state.embed_seconds, 3),
+                "upsert": round(state.upsert_seconds, 3),
+                "total": round(total_seconds, 3),
+            },
         )
 
+    # -------------------------------------------------------------------------
+    # Ingestion pipeline stages
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def _put_threadsafe(
+        loop: asyncio.AbstractEventLoop,
+        queue: asyncio.Queue,
+        item: Any,
+        stop: threading.Event,
+    ) -> bool:
+        """Đưa item vào queue của event loop từ thread khác, chờ nếu queue đầy"""
+        future = asyncio.run_coroutine_threadsafe(queue.put(item), loop)
+        while True:
+            try:
+                future.result(timeout=0.5)
+                return True
+            except TimeoutError:
+                if stop.is_set():
+                    future.cancel()
+                    return False
+
+    async def _parse_stage(
+        self,
+        file_path: Path,
+        metadata: Optional[Dict[str, Any]],
+        out: asyncio.Queue,
+        stop: threading.Event,
+        state: _IngestState,
+    ) -> None:
+        """Parse file trong thread riêng, đưa từng trang vào queue ngay khi có"""
+        loop = asyncio.get_running_loop()
+        started_at = time.perf_counter()
+
+        def produce() -> None:
+            converter = ConverterFactory.create("file")
+            for page in converter.lazy_convert(str(file_path), metadata=metadata):
+                if not self._put_threadsafe(loop, out, page, stop):
+                    return
+
+        await asyncio.to_thread(produce)
+        state.parse_seconds = time.perf_counter() - started_at
+        await out.put(_PIPELINE_DONE)
 
+    def _iter_page_chunks(
+        self,
+        page: Document,
+        page_index: int,
+        page_offset: int,
+        first_index: int,
+        chunk_meta_base: Dict[str, Any],
+    ) -> Iterator[Document]:
+        """
+        Cắt 1 trang thành chunks, gắn chunk_index và vị trí của chunk
+        trong trang (page_start_char) và trong full text (start_char) trong cùng 1 lượt.
+        """
+        chunks = self._text_splitter.split_documents([page])
+        spans = iter_chunk_spans(page.page_content, chunks)
+        for idx, (chunk, start_char, end_char) in enumerate(spans, start=first_index):
+            chunk.metadata = {
+                **chunk_meta_base,
+                "chunk_index": idx,
+                "page_index": page_index,
+                "page_start_char": start_char,
+                "page_end_char": end_char,
+                "start_char": page_offset + start_char,
+                "end_char": page_offset + end_char,
+            }
+            yield chunk
+
+    async def _split_stage(
+        self,
+        pages: asyncio.Queue,
+        out: asyncio.Queue,
+        state: _IngestState,
+        chunk_meta_base: Dict[str, Any],
+        consumers: int,
+        content_sink: Optional[Callable[[str], None]],
+    ) -> None:
+        """
+        Cắt từng trang thành chunks và gom thành batch cho bước embed.
+        Trang được bỏ đi ngay sau khi cắt, chỉ offset và số lượng được giữ lại.
+        """
+        batch: List[Document] = []
+        while True:
+            page = await pages.get()
+            if page is _PIPELINE_DONE:
+                break
+
+            # Các trang được nối bằng "\n\n" trong full text
+            if state.page_offsets:
+                state.content_length += 2
+                if content_sink is not None:
+                    content_sink("\n\n")
+            page_offset = state.content_length
+            state.page_offsets.append(page_offset)
+            state.content_length += len(page.page_content)
+            if content_sink is not None:
+                content_sink(page.page_content)
+
+            page_index = len(state.page_offsets) - 1
+            for chunk in self._iter_page_chunks(page, page_index, page_offset, state.chunk_count, chunk_meta_base):
+                state.chunk_count += 1
+                batch.append(chunk)
+                if len(batch) >= self.pipeline_batch_size:
+                    await out.put(batch)
+                    batch = []
 
+        if not state.page_offsets:
+            raise ValueError("No content extracted from document")
+        if not state.chunk_count:
+            raise ValueError("No chunks generated from document")
 
+        if batch:
+            await out.put(batch)
+        for _ in range(consumers):
+            await out.put(_PIPELINE_DONE)
+
+    async def _embed_stage(self, batches: asyncio.Queue, out: asyncio.Queue, state: _IngestState) -> None:
+        while True:
+            batch = await batches.get()
+            if batch is _PIPELINE_DONE:
+                await out.put(_PIPELINE_DONE)
+                return
+            started_at = time.perf_counter()
+            vectors = await self._embedding.aembed_documents([chunk.page_content for chunk in batch])
+            state.embed_seconds += time.perf_counter() - started_at
+            await out.put((batch, vectors))
+
+    async def _upsert_stage(
+        self,
+        storage: VectorStorage,
+        batches: asyncio.Queue,
+        producers: int,
+        state: _IngestState,
+        extra_payload: Dict[str, Any],
+    ) -> None:
+        """Upsert các batch song song (tối đa pipeline_upsert_concurrency), không chờ từng batch"""
+        semaphore = asyncio.Semaphore(self.pipeline_upsert_concurrency)
+        running: Set[asyncio.Task] = set()
+        errors: List[BaseException] = []
+
+        async def upsert(batch: List[Document], vectors: List[List[float]]) -> None:
+            started_at = time.perf_counter()
+            try:
+                await storage.add_embeddings(batch, vectors, extra_payload)
+                state.upsert_seconds += time.perf_counter() - started_at
+            finally:
+                semaphore.release()
+
+        def on_done(task: asyncio.Task) -> None:
+            running.discard(task)
+            if not task.cancelled() and task.exception() is not None:
+                errors.append(task.exception())
+
+        try:
+            finished = 0
+            while finished < producers:
+                item = await batches.get()
+                if item is _PIPELINE_DONE:
+                    finished += 1
+                    continue
+                await semaphore.acquire()
+                if errors:
+                    raise errors[0]
+                task = asyncio.create_task(upsert(*item))
+                running.add(task)
+                task.add_done_callback(on_done)
+
+            if running:
+                await asyncio.gather(*running)
+        except BaseException:
+            for task in running:
+                task.cancel()
+            raise
+
+    async def _delete_partial_document(self, storage: VectorStorage, document_id: str) -> None:
+        try:
+            await storage.delete_documents(self._document_filter(document_id))
+        except Exception as exc:
+            logger.warning("Failed to clean up partial document_id=%s: %s", document_id, exc)
 
     async def search_with_scores(
         self,
@@ -324,28 +781,39 @@ class RagService:
         query: str,
         k: int = 5,
         metadata_filter: Optional[Dict[str, Any]] = None,
+        query_vector: Optional[Sequence[float]] = None,
     ) -> List[Tuple[Document, float]]:
-        """Tìm kiếm chunks kèm similarity score"""
+        """Tìm kiếm chunks kèm similarity score (query_vector: embedding của query nếu đã có)"""
         if not session_id:
             raise ValueError("session_id must be provided")
             
-        storage = self._get_storage(session_id)
+        cache_key = None
+        # Answer cache cũng dựa trên kết quả search này nên cần version khi bật 1 trong 2 cache
+        caching = self._retrieval_cache is not None or self._answer_cache is not None
+        version = await self._content_version(session_id) if caching else None
+        if version is not None and self._retrieval_cache is not None:
+            cache_key = self._retrieval_cache.make_key(session_id, version, query, k, metadata_filter)
+            cached = self._retrieval_cache.get(cache_key)
+            if cached is not None:
+                logger.info("Retrieval cache hit in session=%s (user=%s, k=%d)", session_id, user_id, k)
+                return cached
+
+        storage = await self._get_storage(session_id)
+        if version is not None and isinstance(storage, LocalVectorStorage):
+            # Index trong RAM có thể cũ hơn version (ghi từ process khác): đồng bộ lại trước khi search,
+            # để kết quả cache dưới version này không cũ hơn nó
+            storage.observe_version(version)
         
         logger.info("Searching with scores in session=%s collection (user=%s, k=%d)", session_id, user_id, k)
-        
-        # No longer need to filter by session_id in metadata since we are in a dedicated collection
-        from qdrant_client.models import Filter
-        
-        # If there are other filters arguments, we'd add them here.
-        # For now we use empty filter or metadata_filter if provided
-        
-        qdrant_filter = None
-        if metadata_filter:
-             # Basic implementation: We assume metadata_filter is simpler for now or not used heavily
-             # If needed, convert dict to Qdrant Filter
-             pass
-        
-        return await storage.search_with_score(query=query, k=k, filter=qdrant_filter)
+
+        # Session đã được tách bằng collection (hoặc tenant), chỉ còn lọc theo metadata
+        qdrant_filter = build_metadata_filter(metadata_filter) if metadata_filter else None
+        results = await storage.search_with_score(
+            query=query, k=k, filter=qdrant_filter, query_vector=query_vector,
+        )
+        if cache_key is not None:
+            self._retrieval_cache.put(cache_key, results)
+        return results
 
 
 
@@ -356,10 +824,11 @@ class RagService:
         session_id: str,
         question: str,
         llm_service: LLMService,  # LLMService instance
-        k: int = 5,
+        k: Optional[int] = None,
         metadata_filter: Optional[Dict[str, Any]] = None,
         temperature: float = 0.1,
         max_tokens: int = 1000,
+        context_max_tokens: Optional[int] = None,
     ) -> QueryWithLLMResult:
         """
         Query với RAG và trả lời bằng LLM
@@ -368,91 +837,77 @@ class RagService:
             user_id: ID của user
             question: Câu hỏi
             llm_service: Instance của LLMService
-            k: Số lượng chunks để retrieve
+            k: Số lượng chunks để retrieve (None = adaptive top-k theo score)
             metadata_filter: Filter metadata
             temperature: Temperature cho LLM
             max_tokens: Max tokens cho response
+            context_max_tokens: Token budget của context (mặc định theo config)
             
         Returns:
             QueryWithLLMResult với answer và sources
         """
         
         logger.info(
-            f"Query with LLM for user={user_id}, question='{question[:100]}...', k={k}"
+            f"Query with LLM for user={user_id}, question='{question[:100]}...', k={k or 'adaptive'}"
         )
+
+        context_max_tokens = context_max_tokens or self.context_max_tokens
+        cached, cache_slot = await self._lookup_answer(
+            session_id, question, k, metadata_filter, temperature, max_tokens, context_max_tokens,
+        )
+        if cached is not None:
+            return cached
         
-        # 1. Retrieve relevant chunks từ vector store
-        results = await self.search_with_scores(
+        # 1-2. Retrieve relevant chunks và chuẩn bị sources, context
+        sources, context, chosen_k = await self._retrieve_context(
             user_id=user_id,
             session_id=session_id,
-            query=question,
+            question=question,
             k=k,
             metadata_filter=metadata_filter,
+            max_tokens=context_max_tokens,
+            # Câu hỏi đã được embed khi tra answer cache
+            query_vector=cache_slot[2] if cache_slot is not None else None,
         )
-
-        logger.info(f"Retrieved {len(results)} relevant chunks for question: '{question}'")
-        
-        if not results:
-            logger.warning(f"No relevant chunks found for question: '{question}'")
-            # Tiep tuc xu ly voi empty context
-
-        
-        # 2. Chuẩn bị sources và context
-        sources = []
-        context_parts = []
-        
-        for idx, (doc, score) in enumerate(results, 1):
-            metadata = doc.metadata or {}
-            source_id = f"S{idx}"
-
-            source_info = {
-                "source_id": source_id,
-                "chunk_index": metadata.get("chunk_index", 0),
-                "document_id": metadata.get("document_id", "unknown"),
-                "file_name": metadata.get("file_name", "unknown"),
-                "content": doc.page_content,
-                "score": float(score),
-                "start_char": metadata.get("start_char", 0),
-                "end_char": metadata.get("end_char", 0),
-                "source_path": metadata.get("source"),
-                "content_format": "markdown",
-            }
-            sources.append(source_info)
-            
-            # Format cho context
-            context_parts.append(
-                f"[Source {source_id} - {source_info['file_name']} "
-                f"(score: {score:.2f})]\n{doc.page_content}"
-            )
-        
-        context = "\n\n---\n\n".join(context_parts)
-        
-        logger.info(f"Retrieved {len(sources)} chunks, total context length: {len(context)}")
         
         # 3. Gọi LLM để generate answer
         try:
-            llm_response = llm_service.answer_with_context(
-                question=question,
-                context=context,
-                temperature=temperature,
-                max_tokens=max_tokens,
-            )
+            if sources:
+                llm_response = await llm_service.aanswer_with_context(
+                    question=question,
+                    context=context,
+                    temperature=temperature,
+                    max_tokens=max_tokens,
+                )
+                answer_text, model = llm_response.answer, llm_response.model
+            else:
+                # Không có chunk liên quan: bỏ prompt RAG (và context), hỏi LLM trực tiếp
+                logger.info("No relevant chunks, answering without RAG context")
+                answer_text = await llm_service.agenerate(
+                    prompt=question,
+                    temperature=temperature,
+                    max_tokens=max_tokens,
+                )
+                model = llm_service.model
             
             logger.info("LLM answer generated successfully")
 
             answer_payload = llm_service.build_answer_payload(
-                llm_response.answer,
+                answer_text,
                 sources,
             )
             
-            return QueryWithLLMResult(
+            result = QueryWithLLMResult(
                 query=question,
                 answer=answer_payload,
                 sources=sources,
                 context_used=context,
-                model=llm_response.model,
+                model=model,
                 retrieved_chunks=len(sources),
+                chosen_k=chosen_k,
             )
+            self._store_answer(session_id, cache_slot, result)
+            return result
             
         except LLMRateLimitError:
             raise
@@ -460,45 +915,305 @@ class RagService:
             logger.error(f"Failed to generate LLM answer: {str(e)}", exc_info=True)
             raise ValueError(f"Failed to generate answer: {str(e)}")
 
+    async def stream_query_with_llm(
+        self,
+        user_id: str,
+        session_id: str,
+        question: str,
+        llm_service: LLMService,
+        k: Optional[int] = None,
+        metadata_filter: Optional[Dict[str, Any]] = None,
+        temperature: float = 0.1,
+        max_tokens: int = 1000,
+        context_max_tokens: Optional[int] = None,
+    ) -> AsyncIterator[RagStreamEvent]:
+        """
+        Giống query_with_llm nhưng stream kết quả theo thứ tự:
+        - "sources": danh sách references (trước khi gọi LLM)
+        - "delta": từng đoạn text của câu trả lời
+        - "result": QueryWithLLMResult đầy đủ khi LLM trả lời xong
+        Không có chunk liên quan: sources rỗng, LLM trả lời không kèm context RAG.
+        """
+        logger.info(
+            f"Streaming query with LLM for user={user_id}, question='{question[:100]}...', k={k or 'adaptive'}"
+        )
 
+        context_max_tokens = context_max_tokens or self.context_max_tokens
+        cached, cache_slot = await self._lookup_answer(
+            session_id, question, k, metadata_filter, temperature, max_tokens, context_max_tokens,
+        )
+        if cached is not None:
+            # Phát lại như một lần stream: sources, toàn bộ câu trả lời, result
+            yield RagStreamEvent(event="sources", data=cached.answer["references"])
+            yield RagStreamEvent(event="delta", data=cached.answer["content"])
+            yield RagStreamEvent(event="result", data=cached)
+            return
 
-    async def delete_document(self, session_id: str, document_id: str) -> None:
-        """Delete document from vector store"""
-        if not session_id:
-            raise ValueError("session_id must be provided")
-            
-        storage = self._get_storage(session_id)
+        sources, context, chosen_k = await self._retrieve_context(
+            user_id=user_id,
+            session_id=session_id,
+            question=question,
+            k=k,
+            metadata_filter=metadata_filter,
+            max_tokens=context_max_tokens,
+            # Câu hỏi đã được embed khi tra answer cache
+            query_vector=cache_slot[2] if cache_slot is not None else None,
+        )
+
+        yield RagStreamEvent(
+            event="sources",
+            data=llm_service.build_answer_payload("", sources)["references"],
+        )
+
+        if sources:
+            deltas = llm_service.astream_answer_with_context(
+                question=question,
+                context=context,
+                temperature=temperature,
+                max_tokens=max_tokens,
+            )
+        else:
+            # Không có chunk liên quan: bỏ prompt RAG (và context), hỏi LLM trực tiếp
+            logger.info("No relevant chunks, streaming answer without RAG context")
+            deltas = llm_service.astream_generate(
+                prompt=question,
+                temperature=temperature,
+                max_tokens=max_tokens,
+            )
+
+        answer_parts: List[str] = []
+        try:
+            async for delta in deltas:
+                answer_parts.append(delta)
+                yield RagStreamEvent(event="delta", data=delta)
+        except LLMRateLimitError:
+            raise
+        except Exception as e:
+            logger.error(f"Failed to stream LLM answer: {str(e)}", exc_info=True)
+            raise ValueError(f"Failed to generate answer: {str(e)}")
+
+        logger.info("LLM answer streamed successfully")
+
+        answer_payload = llm_service.build_answer_payload(
+            "".join(answer_parts).strip(),
+            sources,
+        )
+        result = QueryWithLLMResult(
+            query=question,
+            answer=answer_payload,
+            sources=sources,
+            context_used=context,
+            model=llm_service.model,
+            retrieved_chunks=len(sources),
+            chosen_k=chosen_k,
+        )
+        self._store_answer(session_id, cache_slot, result)
+        yield RagStreamEvent(event="result", data=result)
+
+    async def _lookup_answer(
+        self,
+        session_id: str,
+        question: str,
+        k: Optional[int],
+        metadata_filter: Optional[Dict[str, Any]],
+        temperature: float,
+        max_tokens: int,
+        context_max_tokens: int,
+    ) -> Tuple[Optional[QueryWithLLMResult], Optional[Tuple[int, str, List[float]]]]:
+        """
+        Tìm câu trả lời đã cache cho câu hỏi cùng nghĩa.
+        Trả về (result nếu hit, slot để lưu câu trả lời mới); slot là None nếu cache tắt.
+        """
+        if self._answer_cache is None:
+            return None, None
+        # Lấy version trước khi retrieve: tài liệu đổi trong lúc trả lời thì không cache
+        version = await self._content_version(session_id)
+        if version is None:
+            return None, None
+        scope = self._answer_cache.make_scope(
+            k=k,
+            metadata_filter=metadata_filter,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            context_max_tokens=context_max_tokens,
+        )
+        try:
+            # Vector được dùng lại cho retrieval (qua slot)
+            vector = await self._embedding.aembed_query(question)
+        except Exception as exc:
+            logger.warning("Answer cache lookup skipped, failed to embed question: %s", exc)
+            return None, None
+
+        hit = self._answer_cache.get(session_id, version, scope, vector)
+        if hit is None:
+            return None, (version, scope, vector)
+        result, similarity = hit
+        logger.info("Answer cache hit in session=%s (similarity=%.3f)", session_id, similarity)
+        return dataclasses.replace(result, query=question), None
+
+    def _store_answer(
+        self,
+        session_id: str,
+        slot: Optional[Tuple[int, str, List[float]]],
+        result: QueryWithLLMResult,
+    ) -> None:
+        if self._answer_cache is None or slot is None:
+            return
+        version, scope, vector = slot
+        self._answer_cache.put(session_id, version, scope, vector, result)
+
+    async def _retrieve_context(
+        self,
+        user_id: str,
+        session_id: str,
+        question: str,
+        k: Optional[int],
+        metadata_filter: Optional[Dict[str, Any]] = None,
+        max_tokens: Optional[int] = None,
+        query_vector: Optional[Sequence[float]] = None,
+    ) -> Tuple[List[Dict[str, Any]], str, int]:
+        """
+        Retrieve chunks liên quan, trả về (sources, context, số chunk được chọn) cho prompt RAG.
+        k=None: lấy dư max_k chunk rồi chọn theo score (adaptive top-k).
+        Chunk chồng nhau / liên tiếp của cùng document được gộp thành 1 source,
+        context không vượt quá max_tokens (ước lượng).
+        """
+        adaptive = self._adaptive_k if k is None else None
+        fetch_k = adaptive.max_k if adaptive is not None else (k or self.DEFAULT_K)
+        results = await self.search_with_scores(
+            user_id=user_id,
+            session_id=session_id,
+            query=question,
+            k=fetch_k,
+            metadata_filter=metadata_filter,
+            query_vector=query_vector,
+        )
+        candidates = len(results)
+        if adaptive is not None:
+            results = adaptive.select(results)
+
+        logger.info(
+            f"Retrieved {len(results)}/{candidates} relevant chunks for question: '{question}'"
+        )
         
-        # Create filter for document_id
-        # We stored document_id in metadata
-        from qdrant_client.models import Filter, FieldCondition, MatchValue
+        if not results:
+            logger.warning(f"No relevant chunks found for question: '{question}'")
+            return [], "", 0
+
+        neighbors: List[Document] = []
+        if results and self.context_neighbor_chunks > 0:
+            neighbors = await self._fetch_neighbor_chunks(session_id, results, self.context_neighbor_chunks)
+
+        spans = assemble_context(
+            results,
+            max_tokens=max_tokens or self.context_max_tokens,
+            neighbors=neighbors,
+            neighbor_rounds=self.context_neighbor_chunks,
+        )
+
+        sources = []
+        for idx, span in enumerate(spans, 1):
+            metadata = span.metadata
+            sources.append({
+                "source_id": f"S{idx}",
+                "chunk_index": span.chunk_indexes[0],
+                "chunk_indexes": span.chunk_indexes,
+                "document_id": span.document_id,
+                "file_name": metadata.get("file_name", "unknown"),
+                "content": span.content,
+                "score": span.score,
+                "start_char": span.start_char,
+                "end_char": span.end_char,
+                "source_path": metadata.get("source"),
+                "content_format": "markdown",
+            })
+
+        context = format_context(spans)
         
-        filter = Filter(
+        logger.info(
+            "Packed %d chunks into %d sources (~%d tokens), total context length: %d",
+            len(results), len(spans), sum(span.tokens for span in spans), len(context),
+        )
+
+        return sources, context, len(results)
+
+    async def _fetch_neighbor_chunks(
+        self,
+        session_id: str,
+        results: Sequence[Tuple[Document, float]],
+        rounds: int,
+    ) -> List[Document]:
+        """Chunk trong khoảng `rounds` quanh các chunk được retrieve (cùng document)"""
+        storage = await self._get_storage(session_id)
+        wanted = neighbor_indexes(results, rounds)
+        try:
+            batches = await asyncio.gather(*(
+                storage.scroll(
+                    build_metadata_filter({"document_id": document_id, "chunk_index": indexes}),
+                    limit=len(indexes),
+                )
+                for document_id, indexes in wanted.items()
+            ))
+        except Exception as exc:
+            # Thiếu chunk lân cận vẫn trả lời được, chỉ context hẹp hơn
+            logger.warning("Failed to fetch neighbor chunks in session=%s: %s", session_id, exc)
+            return []
+        return [doc for batch in batches for doc in batch]
+
+    @staticmethod
+    def _document_filter(document_id: str) -> qdrant_models.Filter:
+        """Filter các chunk của 1 document (document_id lưu trong metadata)"""
+        return qdrant_models.Filter(
             must=[
-                FieldCondition(
+                qdrant_models.FieldCondition(
                     key="metadata.document_id",
-                    match=MatchValue(value=document_id)
+                    match=qdrant_models.MatchValue(value=document_id),
                 )
             ]
         )
-        
+
+    async def list_document_chunks(
+        self,
+        session_id: str,
+        document_id: str,
+        offset: int = 0,
+        limit: int = 50,
+    ) -> List[Document]:
+        """Các chunk của document theo chunk_index trong [offset, offset + limit)"""
+        if not session_id:
+            raise ValueError("session_id must be provided")
+
+        storage = await self._get_storage(session_id)
+        chunk_filter = self._document_filter(document_id)
+        chunk_filter.must.append(
+            qdrant_models.FieldCondition(
+                key="metadata.chunk_index",
+                range=qdrant_models.Range(gte=offset, lt=offset + limit),
+            )
+        )
+        chunks = await storage.scroll(chunk_filter, limit=limit)
+        return sorted(chunks, key=lambda chunk: chunk.metadata.get("chunk_index", 0))
+
+    async def delete_document(self, session_id: str, document_id: str) -> None:
+        """Delete document from vector store"""
+        if not session_id:
+            raise ValueError("session_id must be provided")
+            
+        storage = await self._get_storage(session_id)
         
         logger.info("Deleting document_id=%s from session=%s collection", document_id, session_id)
-        await storage.delete_documents(filter)
+        await storage.delete_documents(self._document_filter(document_id))
+        await self._invalidate_session_caches(session_id)
 
     async def delete_chat_collection(self, session_id: str) -> None:
         """Delete entire collection for a chat session"""
         if not session_id:
             raise ValueError("session_id must be provided")
 
-        storage = self._get_storage(session_id)
+        storage = await self._get_storage(session_id)
         logger.info("Deleting collection for session=%s", session_id)
-        # Note: QdrantStorage doesn't list a delete_collection method in my view, 
-        # but the client does. Let's check QdrantStorage or use client directly.
-        # Actually in _get_storage we use self._client.
-        
-        await self._client.delete_collection(storage.collection_name)
+        await storage.delete_collection()
+        await self._invalidate_session_caches(session_id)
         
         # Remove from cache if exists
-        if session_id in self._storage_cache:
-            del self._storage_cache[session_id]
+        self._storage_cache.pop(session_id, None)
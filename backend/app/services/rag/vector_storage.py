@@ -0,0 +1,129 @@
+import asyncio
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from langchain_core.documents import Document
+from qdrant_client.models import Filter, SparseVector
+
+from app.services.rag.hybrid import BM25Encoder, reciprocal_rank_fusion
+
+# Mỗi nhánh (dense, sparse) lấy k * HYBRID_CANDIDATES ứng viên trước khi fusion
+HYBRID_CANDIDATES = 4
+
+# (point id, document, score)
+ScoredPoint = Tuple[str, Document, float]
+
+
+class VectorStorage(ABC):
+    """
+    Interface lưu/tìm chunk của 1 session (chat).
+    Filter dùng model Filter của Qdrant (xem build_metadata_filter).
+
+    Nếu có sparse_encoder, search chạy song song dense + sparse (BM25)
+    rồi gộp bằng reciprocal rank fusion.
+    """
+
+    collection_name: str
+    embeddings: Any
+    sparse_encoder: Optional[BM25Encoder] = None
+
+    @abstractmethod
+    async def create_collection(self, force_recreate: bool = False) -> None:
+        pass
+
+    @abstractmethod
+    async def delete_collection(self) -> None:
+        pass
+
+    @abstractmethod
+    async def add_embeddings(
+        self,
+        documents: Sequence[Document],
+        vectors: Sequence[Sequence[float]],
+        extra_payload: Optional[Dict[str, Any]] = None,
+    ) -> None:
+        pass
+
+    @abstractmethod
+    async def dense_search(self, vector: Sequence[float], k: int, filter: Optional[Filter]) -> List[ScoredPoint]:
+        pass
+
+    @abstractmethod
+    async def sparse_search(self, vector: SparseVector, k: int, filter: Optional[Filter]) -> List[ScoredPoint]:
+        pass
+
+    @abstractmethod
+    async def scroll(self, filter: Optional[Filter], limit: int) -> List[Document]:
+        pass
+
+    @abstractmethod
+    async def delete_documents(self, filter: Filter) -> None:
+        pass
+
+    @abstractmethod
+    async def count(self, filter: Optional[Filter] = None) -> int:
+        pass
+
+    async def supports_sparse(self) -> bool:
+        return self.sparse_encoder is not None
+
+    async def add_documents(self, documents: Sequence[Document]) -> None:
+        """Embed rồi lưu documents"""
+        if not documents:
+            return
+        vectors = await self.embeddings.aembed_documents([doc.page_content for doc in documents])
+        await self.add_embeddings(documents, vectors)
+
+    async def search_with_score(
+        self,
+        query: str,
+        k: int = 5,
+        filter: Optional[Filter] = None,
+        query_vector: Optional[Sequence[float]] = None,
+    ) -> List[Tuple[Document, float]]:
+        """
+        Dense-only: score là cosine similarity.
+        Hybrid: kết quả xếp theo điểm RRF (metadata["rrf_score"]), nhưng score trả về vẫn là
+        cosine để UI và prompt hiển thị cùng thang điểm; chunk chỉ khớp qua BM25 lấy điểm RRF.
+        Cosine/BM25 của từng nhánh nằm trong metadata["dense_score"] / metadata["sparse_score"]
+        (nếu chunk có trong nhánh đó).
+        query_vector: embedding của query nếu caller đã có sẵn (không embed lại).
+        """
+        if not query:
+            raise ValueError("Query must not be empty.")
+
+        async def embed_query() -> Sequence[float]:
+            if query_vector is not None:
+                return query_vector
+            return await self.embeddings.aembed_query(query)
+
+        sparse_query = self.sparse_encoder.encode_query(query) if await self.supports_sparse() else None
+        if sparse_query is None or not sparse_query.indices:
+            vector = await embed_query()
+            return [(doc, score) for _, doc, score in await self.dense_search(vector, k, filter)]
+
+        candidates = k * HYBRID_CANDIDATES
+
+        async def search_dense() -> List[ScoredPoint]:
+            return await self.dense_search(await embed_query(), candidates, filter)
+
+        # Sparse search chạy trong lúc chờ embedding query
+        dense, sparse = await asyncio.gather(
+            search_dense(),
+            self.sparse_search(sparse_query, candidates, filter),
+        )
+        branch_scores = (
+            ("dense_score", {point_id: score for point_id, _, score in dense}),
+            ("sparse_score", {point_id: score for point_id, _, score in sparse}),
+        )
+        results = []
+        for point_id, doc, score in reciprocal_rank_fusion(
+            [[(point_id, doc) for point_id, doc, _ in dense], [(point_id, doc) for point_id, doc, _ in sparse]],
+            limit=k,
+        ):
+            for key, scores in branch_scores:
+                if point_id in scores:
+                    doc.metadata[key] = scores[point_id]
+            doc.metadata["rrf_score"] = score
+            results.append((doc, doc.metadata.get("dense_score", score)))
+        return results
@@ -156,7 +156,7 @@ Tóm tắt:"""
         prompt = self.CHAPTER_EXTRACTION_PROMPT.format(content=truncated_content)
         
         try:
-            response = self.llm_service.generate(prompt=prompt, temperature=0.1)
+            response = await self.llm_service.agenerate(prompt=prompt, temperature=0.1)
             
             # Parse JSON response
             # Try to extract JSON from response
@@ -220,7 +220,7 @@ Tóm tắt:"""
         prompt = prompt_template.format(content=truncated_content)
         
         try:
-            response = self.llm_service.generate(prompt=prompt, temperature=0.3)
+            response = await self.llm_service.agenerate(prompt=prompt, temperature=0.3)
             logger.info("Full document summary generated successfully")
             return response.strip()
         except Exception as e:
@@ -273,7 +273,7 @@ Tóm tắt:"""
         )
         
         try:
-            response = self.llm_service.generate(prompt=prompt, temperature=0.3)
+            response = await self.llm_service.agenerate(prompt=prompt, temperature=0.3)
             logger.info("Chapter summary generated successfully")
             return response.strip()
         except Exception as e:
@@ -0,0 +1,46 @@
+"""
+Standalone job worker process: python -m app.worker
+"""
+
+import asyncio
+import logging
+
+from app.core.config import settings
+from app.core.database import engine, Base, SessionLocal
+from app.services.generation_jobs import register_generation_jobs
+from app.services.jobs import JobContext, JobRunner
+from app.services.llm import LLMService
+
+logger = logging.getLogger(__name__)
+
+
+def create_job_runner(llm_service: LLMService) -> JobRunner:
+    runner = JobRunner(
+        context=JobContext(session_factory=SessionLocal, llm_service=llm_service),
+        poll_interval=settings.JOB_POLL_INTERVAL,
+        lease_seconds=settings.JOB_LEASE_SECONDS,
+        retry_backoff_seconds=settings.JOB_RETRY_BACKOFF_SECONDS,
+    )
+    register_generation_jobs(runner)
+    return runner
+
+
+async def main() -> None:
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+    llm_service = LLMService(
+        api_key=settings.GOOGLE_API_KEY,
+        max_connections=settings.LLM_MAX_CONNECTIONS,
+    )
+    runner = create_job_runner(llm_service)
+    try:
+        await runner.run_forever()
+    finally:
+        await llm_service.aclose()
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(main())
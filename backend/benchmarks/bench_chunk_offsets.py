@@ -0,0 +1,115 @@
+"""
+Micro-benchmark: chunk offset computation on large documents.
+
+Compares the previous approach (``str.find`` for every chunk, advancing the
+search start by one character) with offsets reported by the splitter
+(``add_start_index=True`` + ``iter_chunk_spans``). Inputs are 1 MB+ texts with
+repeated boilerplate, which is where the old approach is slow and wrong.
+
+Run from backend/:
+    python -m benchmarks.bench_chunk_offsets --sizes 1 4
+"""
+from __future__ import annotations
+
+import argparse
+import random
+import time
+from typing import List, Tuple
+
+from langchain_core.documents import Document
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+from app.services.rag.chunking import iter_chunk_spans
+
+CHUNK_SIZE = 800
+CHUNK_OVERLAP = 200
+
+BOILERPLATE = (
+    "Trường Đại học Bách khoa - Khoa Công nghệ Thông tin\n"
+    "Tài liệu lưu hành nội bộ. Không sao chép dưới mọi hình thức.\n\n"
+)
+
+
+def make_text(size_mb: float, seed: int = 0) -> str:
+    """Text giả lập slide bài giảng: nhiều đoạn lặp lại (header/footer) xen giữa nội dung"""
+    rng = random.Random(seed)
+    words = ["thuật", "toán", "dữ", "liệu", "mạng", "nơ-ron", "học", "máy", "đồ", "thị",
+             "cây", "tìm", "kiếm", "sắp", "xếp", "độ", "phức", "tạp", "bộ", "nhớ"]
+    target = int(size_mb * 1024 * 1024)
+    parts: List[str] = []
+    length = 0
+    while length < target:
+        body = " ".join(rng.choice(words) for _ in range(rng.randint(60, 400)))
+        part = BOILERPLATE * rng.randint(1, 3) + body + "\n\n"
+        parts.append(part)
+        length += len(part)
+    return "".join(parts)
+
+
+def legacy_positions(full_content: str, chunks: List[Document]) -> List[Tuple[int, int]]:
+    """Cách tính cũ trong RagService._calculate_chunk_positions"""
+    positions = []
+    search_start = 0
+    for chunk in chunks:
+        content = chunk.page_content
+        start_pos = full_content.find(content, search_start)
+        if start_pos == -1:
+            start_pos = search_start
+        else:
+            search_start = start_pos + 1
+        positions.append((start_pos, start_pos + len(content)))
+    return positions
+
+
+def splitter_positions(full_content: str, chunks: List[Document]) -> List[Tuple[int, int]]:
+    return [(start, end) for _, start, end in iter_chunk_spans(full_content, chunks)]
+
+
+def bench(size_mb: float, repeat: int) -> None:
+    text = make_text(size_mb)
+    plain = RecursiveCharacterTextSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
+    indexed = RecursiveCharacterTextSplitter(
+        chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP, add_start_index=True,
+    )
+
+    t0 = time.perf_counter()
+    plain_chunks = plain.split_documents([Document(page_content=text)])
+    split_plain = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    indexed_chunks = indexed.split_documents([Document(page_content=text)])
+    split_indexed = time.perf_counter() - t0
+    expected = [chunk.metadata["start_index"] for chunk in indexed_chunks]
+
+    legacy_best = new_best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        legacy = legacy_positions(text, plain_chunks)
+        legacy_best = min(legacy_best, time.perf_counter() - t0)
+
+        chunks = [Document(page_content=c.page_content, metadata=dict(c.metadata)) for c in indexed_chunks]
+        t0 = time.perf_counter()
+        new = splitter_positions(text, chunks)
+        new_best = min(new_best, time.perf_counter() - t0)
+
+    legacy_wrong = sum(1 for (start, _), ref in zip(legacy, expected) if start != ref)
+    new_wrong = sum(1 for (start, _), ref in zip(new, expected) if start != ref)
+
+    print(
+        f"{len(text) / 1024 / 1024:6.2f} MB | {len(plain_chunks):6d} chunks | "
+        f"split {split_plain:6.3f}s / {split_indexed:6.3f}s (start_index) | "
+        f"offsets legacy {legacy_best * 1000:8.1f} ms ({legacy_wrong} wrong) | "
+        f"splitter {new_best * 1000:7.1f} ms ({new_wrong} wrong)"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=float, nargs="+", default=[1, 4], help="Input sizes in MB")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    for size in args.sizes:
+        bench(size, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
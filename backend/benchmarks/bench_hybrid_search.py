@@ -0,0 +1,202 @@
+"""
+Benchmark: hybrid (dense + BM25, RRF) vs dense-only retrieval on a fixed corpus.
+
+The corpus is generated deterministically and looks like lecture notes: course
+codes (IT3011), Vietnamese course names, formula/algorithm names. Each query
+has known relevant chunks:
+- exact course code ("IT3011 có bao nhiêu tín chỉ?")
+- course name typed without diacritics ("noi dung mon cau truc du lieu")
+- formula / algorithm name ("công thức Bayes")
+
+Chunks and queries are embedded once with Ollama (mxbai-embed-large by
+default). Only the search is timed, using the in-process index
+(LocalVectorStorage), or Qdrant with --url.
+
+Run from backend/:
+    python -m benchmarks.bench_hybrid_search --ollama-url http://localhost:11434
+    python -m benchmarks.bench_hybrid_search --url http://localhost:6333 --k 5
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import random
+import statistics
+import time
+from typing import Dict, List, Optional, Sequence, Set, Tuple
+
+from langchain_core.documents import Document
+from langchain_ollama import OllamaEmbeddings
+
+from app.services.rag.hybrid import BM25Encoder, fold_diacritics
+from app.services.rag.local_storage import LocalVectorStorage
+from app.services.rag.qdrant_storage.qdrant_storage import QdrantStorage
+from app.services.rag.vector_storage import VectorStorage
+
+COURSES = [
+    ("IT3011", "Cấu trúc dữ liệu và giải thuật", ["danh sách liên kết", "cây nhị phân", "bảng băm"]),
+    ("IT3020", "Toán rời rạc", ["đồ thị", "quan hệ tương đương", "tổ hợp"]),
+    ("IT3080", "Mạng máy tính", ["giao thức TCP", "định tuyến", "mô hình OSI"]),
+    ("IT3090", "Cơ sở dữ liệu", ["chuẩn hóa", "khóa chính", "giao tác"]),
+    ("IT3100", "Lập trình hướng đối tượng", ["kế thừa", "đa hình", "đóng gói"]),
+    ("IT3160", "Nhập môn trí tuệ nhân tạo", ["tìm kiếm heuristic", "logic mệnh đề", "học máy"]),
+    ("IT4060", "Lập trình mạng", ["socket", "đa luồng", "giao thức HTTP"]),
+    ("IT4110", "Tính toán khoa học", ["phương pháp Newton", "nội suy", "sai số"]),
+    ("MI1111", "Giải tích I", ["giới hạn", "đạo hàm", "tích phân"]),
+    ("MI1121", "Giải tích II", ["tích phân bội", "chuỗi số", "phương trình vi phân"]),
+    ("MI1141", "Đại số tuyến tính", ["ma trận", "định thức", "không gian vectơ"]),
+    ("MI2020", "Xác suất thống kê", ["biến ngẫu nhiên", "kiểm định giả thuyết", "phân phối chuẩn"]),
+    ("PH1110", "Vật lý đại cương I", ["động lực học", "dao động", "nhiệt động lực học"]),
+    ("PH1120", "Vật lý đại cương II", ["điện trường", "từ trường", "sóng điện từ"]),
+    ("EM1010", "Quản trị học đại cương", ["hoạch định", "tổ chức", "kiểm soát"]),
+    ("SSH1111", "Triết học Mác - Lênin", ["vật chất và ý thức", "phép biện chứng", "nhận thức"]),
+]
+
+FORMULAS = [
+    ("định lý Bayes", "xác suất có điều kiện P(A|B) = P(B|A)P(A)/P(B)"),
+    ("công thức Taylor", "khai triển hàm số thành chuỗi lũy thừa quanh một điểm"),
+    ("thuật toán Dijkstra", "tìm đường đi ngắn nhất trên đồ thị trọng số không âm"),
+    ("thuật toán Kruskal", "tìm cây khung nhỏ nhất bằng cách chọn cạnh nhỏ nhất"),
+    ("định luật Ohm", "cường độ dòng điện tỉ lệ thuận với hiệu điện thế"),
+    ("công thức Euler", "liên hệ giữa hàm mũ phức và hàm lượng giác"),
+    ("phương pháp Gauss", "khử biến để giải hệ phương trình tuyến tính"),
+    ("định lý Pythagore", "bình phương cạnh huyền bằng tổng bình phương hai cạnh góc vuông"),
+    ("thuật toán quicksort", "sắp xếp bằng cách chọn phần tử chốt và phân hoạch"),
+    ("định luật Coulomb", "lực tương tác giữa hai điện tích điểm"),
+]
+
+FILLER = [
+    "Sinh viên cần đọc trước tài liệu và làm bài tập về nhà đầy đủ.",
+    "Giảng viên sẽ kiểm tra bài cũ vào đầu mỗi buổi học.",
+    "Điểm quá trình chiếm 30% và điểm cuối kỳ chiếm 70%.",
+    "Các ví dụ minh họa được trình bày chi tiết trong slide bài giảng.",
+    "Phần này thường xuất hiện trong đề thi giữa kỳ.",
+]
+
+
+def build_corpus(seed: int = 0) -> Tuple[List[Document], List[Tuple[str, Set[int]]]]:
+    """Trả về (chunks, [(query, chỉ số các chunk liên quan)])"""
+    rng = random.Random(seed)
+    chunks: List[str] = []
+    queries: List[Tuple[str, Set[int]]] = []
+
+    for code, name, topics in COURSES:
+        credits = rng.randint(2, 4)
+        intro = len(chunks)
+        chunks.append(
+            f"Học phần {code} - {name} gồm {credits} tín chỉ. " + " ".join(rng.sample(FILLER, 2))
+        )
+        topic_rows = []
+        for topic in topics:
+            topic_rows.append(len(chunks))
+            chunks.append(
+                f"Chương về {topic} trong môn {name}. Nội dung trình bày khái niệm {topic}, "
+                f"ví dụ và bài tập áp dụng. " + rng.choice(FILLER)
+            )
+        chunks.append(f"Đề thi cuối kỳ mã {code} gồm 4 câu tự luận, thời gian 90 phút. " + rng.choice(FILLER))
+        exam = len(chunks) - 1
+
+        queries.append((f"{code} có bao nhiêu tín chỉ?", {intro}))
+        queries.append((f"đề thi {code} gồm mấy câu", {exam}))
+        queries.append((f"noi dung mon {fold_diacritics(name).lower()}", {intro, *topic_rows}))
+        topic = rng.choice(topics)
+        queries.append((f"{fold_diacritics(topic)} la gi", {topic_rows[topics.index(topic)]}))
+
+    for formula, description in FORMULAS:
+        row = len(chunks)
+        chunks.append(f"{formula[0].upper() + formula[1:]}: {description}. " + rng.choice(FILLER))
+        queries.append((f"{formula} dùng để làm gì", {row}))
+
+    # Nhiễu: các đoạn chung chung dễ gần về ngữ nghĩa với mọi query
+    for index in range(200):
+        chunks.append(" ".join(rng.sample(FILLER, 3)) + f" (trang {index + 1})")
+
+    documents = [
+        Document(page_content=text, metadata={"document_id": "bench", "chunk_index": row})
+        for row, text in enumerate(chunks)
+    ]
+    return documents, queries
+
+
+class PrecomputedEmbeddings:
+    """Embedding đã tính trước, để chỉ đo thời gian search"""
+
+    def __init__(self, vectors: Dict[str, List[float]]) -> None:
+        self.vectors = vectors
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return self.vectors[text]
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self.vectors[text] for text in texts]
+
+
+async def make_storage(
+    name: str,
+    embeddings: PrecomputedEmbeddings,
+    dim: int,
+    sparse_encoder: Optional[BM25Encoder],
+    url: Optional[str],
+):
+    if url is None:
+        return LocalVectorStorage(name, embeddings, dim, sparse_encoder=sparse_encoder), None
+    from qdrant_client import AsyncQdrantClient
+
+    client = AsyncQdrantClient(location=url)
+    storage = QdrantStorage(name, embeddings, client, dim, sparse_encoder=sparse_encoder)
+    await storage.create_collection(force_recreate=True)
+    return storage, client
+
+
+async def evaluate(
+    storage: VectorStorage,
+    queries: Sequence[Tuple[str, Set[int]]],
+    k: int,
+) -> Tuple[float, float, List[float]]:
+    hits, reciprocal_ranks, latencies = [], [], []
+    for query, relevant in queries:
+        started = time.perf_counter()
+        results = await storage.search_with_score(query, k=k)
+        latencies.append(time.perf_counter() - started)
+        rows = [doc.metadata["chunk_index"] for doc, _ in results]
+        hits.append(len(relevant & set(rows)) / min(len(relevant), k))
+        rank = next((position for position, row in enumerate(rows, 1) if row in relevant), None)
+        reciprocal_ranks.append(1 / rank if rank else 0.0)
+    return statistics.mean(hits), statistics.mean(reciprocal_ranks), sorted(latencies)
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--ollama-url", default="http://localhost:11434")
+    parser.add_argument("--model", default="mxbai-embed-large")
+    parser.add_argument("--url", help="Qdrant URL (default: in-process index)")
+    parser.add_argument("--k", type=int, default=5)
+    args = parser.parse_args()
+
+    documents, queries = build_corpus()
+    embedder = OllamaEmbeddings(model=args.model, base_url=args.ollama_url)
+    texts = [doc.page_content for doc in documents]
+    query_texts = [query for query, _ in queries]
+    vectors = dict(zip(texts, await embedder.aembed_documents(texts)))
+    vectors.update(zip(query_texts, await embedder.aembed_documents(query_texts)))
+    embeddings = PrecomputedEmbeddings(vectors)
+    dim = len(next(iter(vectors.values())))
+    print(f"{len(documents)} chunks, {len(queries)} queries, k={args.k}, backend={args.url or 'in-process'}")
+    print(f"{'mode':<8}{'recall@k':>10}{'MRR':>8}{'p50 ms':>9}{'p95 ms':>9}")
+
+    for mode, encoder in (("dense", None), ("hybrid", BM25Encoder())):
+        storage, client = await make_storage(f"bench_hybrid_{mode}", embeddings, dim, encoder, args.url)
+        try:
+            await storage.add_embeddings(documents, [vectors[text] for text in texts])
+            recall, mrr, latencies = await evaluate(storage, queries, args.k)
+            p50 = latencies[len(latencies) // 2] * 1000
+            p95 = latencies[int(len(latencies) * 0.95) - 1] * 1000
+            print(f"{mode:<8}{recall:>10.3f}{mrr:>8.3f}{p50:>9.2f}{p95:>9.2f}")
+        finally:
+            if client is not None:
+                await storage.delete_collection()
+                await client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,108 @@
+"""
+Benchmark: in-process NumPy index (LocalVectorStorage) vs Qdrant for small notebooks.
+
+The embedder is a stub that returns precomputed vectors, so only the search
+path is timed: exact cosine top-k in process vs a query_points round trip.
+Without --url only the in-process index is measured (no Qdrant server needed).
+
+Run from backend/:
+    python -m benchmarks.bench_local_index --sizes 200 1000 5000
+    python -m benchmarks.bench_local_index --sizes 200 1000 --url http://localhost:6333
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import random
+import time
+from typing import List, Optional, Sequence
+
+from langchain_core.documents import Document
+
+from app.services.rag.local_storage import LocalVectorStorage
+from app.services.rag.qdrant_storage.qdrant_storage import QdrantStorage, build_metadata_filter
+from app.services.rag.vector_storage import VectorStorage
+
+COLLECTION = "bench_local_index"
+
+
+class StubEmbeddings:
+    """Trả về vector query tiếp theo trong danh sách (không gọi model)"""
+
+    def __init__(self, queries: Sequence[List[float]]) -> None:
+        self.queries = queries
+        self.position = 0
+
+    async def aembed_query(self, text: str) -> List[float]:
+        vector = self.queries[self.position % len(self.queries)]
+        self.position += 1
+        return vector
+
+
+def make_vectors(count: int, dim: int, rng: random.Random) -> List[List[float]]:
+    return [[rng.gauss(0, 1) for _ in range(dim)] for _ in range(count)]
+
+
+async def measure(storage: VectorStorage, queries: int, k: int, filter_documents: bool) -> List[float]:
+    search_filter = build_metadata_filter({"document_id": ["0", "1"]}) if filter_documents else None
+    for _ in range(5):
+        await storage.search_with_score("warm-up", k=k, filter=search_filter)
+    latencies = []
+    for _ in range(queries):
+        started = time.perf_counter()
+        await storage.search_with_score("query", k=k, filter=search_filter)
+        latencies.append(time.perf_counter() - started)
+    return sorted(latencies)
+
+
+def report(name: str, size: int, latencies: List[float]) -> None:
+    p50 = latencies[len(latencies) // 2] * 1000
+    p95 = latencies[int(len(latencies) * 0.95) - 1] * 1000
+    print(f"{name:<8}{size:>7}{p50:>10.3f}{p95:>10.3f}")
+
+
+async def bench(size: int, args: argparse.Namespace, url: Optional[str]) -> None:
+    rng = random.Random(size)
+    vectors = make_vectors(size, args.dim, rng)
+    embeddings = StubEmbeddings(make_vectors(args.queries, args.dim, rng))
+    documents = [
+        Document(page_content=f"chunk {i}", metadata={"document_id": str(i % 10), "chunk_index": i})
+        for i in range(size)
+    ]
+
+    local = LocalVectorStorage(COLLECTION, embeddings, args.dim)
+    await local.add_embeddings(documents, vectors)
+    report("local", size, await measure(local, args.queries, args.k, args.filter))
+
+    if url:
+        from qdrant_client import AsyncQdrantClient
+
+        client = AsyncQdrantClient(location=url)
+        remote = QdrantStorage(COLLECTION, embeddings, client, args.dim)
+        try:
+            await remote.create_collection(force_recreate=True)
+            for start in range(0, size, 256):
+                await remote.add_embeddings(documents[start:start + 256], vectors[start:start + 256])
+            report("qdrant", size, await measure(remote, args.queries, args.k, args.filter))
+        finally:
+            await remote.delete_collection()
+            await client.close()
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[200, 1000, 2000, 5000])
+    parser.add_argument("--dim", type=int, default=1024)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--filter", action="store_true", help="Restrict search to 2 of 10 documents")
+    parser.add_argument("--url", help="Qdrant URL to compare against")
+    args = parser.parse_args()
+
+    print(f"{'backend':<8}{'points':>7}{'p50 ms':>10}{'p95 ms':>10}")
+    for size in args.sizes:
+        await bench(size, args, args.url)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
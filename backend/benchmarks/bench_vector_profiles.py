@@ -0,0 +1,210 @@
+"""
+Benchmark: vector profiles (float32 / float32_disk / int8 / binary) and
+Matryoshka truncation.
+
+Every profile x dimension combination gets its own temporary collection with
+the same points. For each one the script reports:
+- recall@k against exact float32 search on the full vectors
+- estimated RAM used by vectors (HNSW graph and payload not included)
+- query latency (p50/p95)
+
+Vectors are read from an existing collection (``--source chat_12``, real
+mxbai-embed-large vectors) or generated as noisy clusters. Truncation only makes
+sense with real Matryoshka embeddings; on random vectors recall drops sharply.
+
+Needs a running Qdrant server. Run from backend/:
+    python -m benchmarks.bench_vector_profiles --source chat_12 --dims 1024 512 256
+    python -m benchmarks.bench_vector_profiles --points 20000 --profiles float32 int8 binary
+"""
+from __future__ import annotations
+
+import argparse
+import random
+import statistics
+import time
+from typing import Dict, List, Sequence, Set
+
+from qdrant_client import QdrantClient
+from qdrant_client.models import CollectionStatus, Distance, PointStruct, SearchParams
+
+from app.services.rag.matryoshka import truncate_vector
+from app.services.rag.qdrant_storage.vector_profiles import PROFILES, VectorProfile
+
+PREFIX = "bench_profile"
+UPSERT_BATCH = 256
+
+
+def load_vectors(client: QdrantClient, source: str, limit: int) -> List[List[float]]:
+    vectors: List[List[float]] = []
+    offset = None
+    while len(vectors) < limit:
+        points, offset = client.scroll(
+            collection_name=source,
+            limit=min(UPSERT_BATCH, limit - len(vectors)),
+            offset=offset,
+            with_payload=False,
+            with_vectors=True,
+        )
+        vectors.extend(point.vector for point in points)
+        if offset is None:
+            break
+    return vectors
+
+
+def make_vectors(count: int, dim: int, clusters: int, seed: int) -> List[List[float]]:
+    """Vector giả lập chunk: các cụm chủ đề + nhiễu"""
+    rng = random.Random(seed)
+    centers = [[rng.gauss(0, 1) for _ in range(dim)] for _ in range(clusters)]
+    vectors = []
+    for _ in range(count):
+        center = rng.choice(centers)
+        vectors.append([value + rng.gauss(0, 0.6) for value in center])
+    return vectors
+
+
+def make_queries(vectors: Sequence[List[float]], count: int, seed: int) -> List[List[float]]:
+    """Query gần với 1 chunk có sẵn nhưng không trùng hẳn"""
+    rng = random.Random(seed + 1)
+    return [[value + rng.gauss(0, 0.3) for value in rng.choice(vectors)] for _ in range(count)]
+
+
+def wait_indexed(client: QdrantClient, name: str, timeout: float = 600) -> None:
+    deadline = time.monotonic() + timeout
+    while client.get_collection(name).status != CollectionStatus.GREEN:
+        if time.monotonic() > deadline:
+            raise TimeoutError(f"Collection {name} is still indexing")
+        time.sleep(0.5)
+
+
+def build_collection(
+    client: QdrantClient,
+    name: str,
+    vectors: Sequence[List[float]],
+    dim: int,
+    profile: VectorProfile,
+) -> float:
+    if client.collection_exists(name):
+        client.delete_collection(name)
+    client.create_collection(
+        collection_name=name,
+        vectors_config=profile.vectors_config(dim, Distance.COSINE),
+        quantization_config=profile.quantization_config(),
+    )
+    started = time.perf_counter()
+    for start in range(0, len(vectors), UPSERT_BATCH):
+        batch = vectors[start:start + UPSERT_BATCH]
+        client.upsert(
+            collection_name=name,
+            points=[
+                PointStruct(id=start + offset, vector=truncate_vector(vector, dim) if dim < len(vector) else vector)
+                for offset, vector in enumerate(batch)
+            ],
+            wait=True,
+        )
+    wait_indexed(client, name)
+    return time.perf_counter() - started
+
+
+def ground_truth(client: QdrantClient, queries: Sequence[List[float]], k: int) -> List[Set[int]]:
+    name = f"{PREFIX}_exact"
+    return [
+        {point.id for point in client.query_points(
+            collection_name=name,
+            query=query,
+            limit=k,
+            search_params=SearchParams(exact=True),
+        ).points}
+        for query in queries
+    ]
+
+
+def run_queries(
+    client: QdrantClient,
+    name: str,
+    queries: Sequence[List[float]],
+    dim: int,
+    k: int,
+    profile: VectorProfile,
+) -> tuple[List[Set[int]], List[float]]:
+    prepared = [truncate_vector(query, dim) if dim < len(query) else query for query in queries]
+    params = profile.search_params()
+    # Warm-up: nạp page cache cho vector trên disk
+    for query in prepared[:10]:
+        client.query_points(collection_name=name, query=query, limit=k, search_params=params)
+
+    results, latencies = [], []
+    for query in prepared:
+        started = time.perf_counter()
+        response = client.query_points(collection_name=name, query=query, limit=k, search_params=params)
+        latencies.append(time.perf_counter() - started)
+        results.append({point.id for point in response.points})
+    return results, latencies
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:6333", help="Qdrant URL (\":memory:\" for a smoke run, quantization is ignored there)")
+    parser.add_argument("--api-key", default=None)
+    parser.add_argument("--source", help="Read vectors from this collection instead of generating them")
+    parser.add_argument("--points", type=int, default=10000)
+    parser.add_argument("--dim", type=int, default=1024, help="Dimension of generated vectors")
+    parser.add_argument("--clusters", type=int, default=50)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--profiles", nargs="+", default=list(PROFILES), choices=list(PROFILES))
+    parser.add_argument("--dims", type=int, nargs="+", help="Matryoshka dimensions to test (default: full only)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--keep", action="store_true", help="Keep benchmark collections")
+    args = parser.parse_args()
+
+    client = QdrantClient(location=args.url, api_key=args.api_key, timeout=120)
+    if args.source:
+        vectors = load_vectors(client, args.source, args.points)
+    else:
+        vectors = make_vectors(args.points, args.dim, args.clusters, args.seed)
+    full_dim = len(vectors[0])
+    queries = make_queries(vectors, args.queries, args.seed)
+    dims = sorted(set(args.dims or [full_dim]), reverse=True)
+    print(f"{len(vectors)} vectors x {full_dim} dims, {len(queries)} queries, k={args.k}")
+
+    created: List[str] = []
+    try:
+        build_collection(client, f"{PREFIX}_exact", vectors, full_dim, PROFILES["float32"])
+        created.append(f"{PREFIX}_exact")
+        truth = ground_truth(client, queries, args.k)
+
+        rows: List[Dict[str, object]] = []
+        for dim in dims:
+            for profile_name in args.profiles:
+                profile = PROFILES[profile_name]
+                name = f"{PREFIX}_{profile_name}_{dim}"
+                build_seconds = build_collection(client, name, vectors, dim, profile)
+                created.append(name)
+                results, latencies = run_queries(client, name, queries, dim, args.k, profile)
+                recall = statistics.mean(len(got & ref) / len(ref) for got, ref in zip(results, truth) if ref)
+                latencies.sort()
+                rows.append({
+                    "profile": profile_name,
+                    "dim": dim,
+                    "recall": recall,
+                    "ram_mb": profile.ram_bytes_per_vector(dim) * len(vectors) / 1024 / 1024,
+                    "p50": latencies[len(latencies) // 2] * 1000,
+                    "p95": latencies[int(len(latencies) * 0.95) - 1] * 1000,
+                    "build": build_seconds,
+                })
+
+        print(f"{'profile':<14}{'dim':>6}{'recall@k':>10}{'vector RAM':>13}{'p50 ms':>9}{'p95 ms':>9}{'build s':>9}")
+        for row in rows:
+            print(
+                f"{row['profile']:<14}{row['dim']:>6}{row['recall']:>10.3f}{row['ram_mb']:>10.1f} MB"
+                f"{row['p50']:>9.2f}{row['p95']:>9.2f}{row['build']:>9.1f}"
+            )
+    finally:
+        if not args.keep:
+            for name in created:
+                client.delete_collection(name)
+        client.close()
+
+
+if __name__ == "__main__":
+    main()
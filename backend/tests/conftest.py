@@ -0,0 +1,14 @@
+import os
+
+# Settings bắt buộc khi import app; test không kết nối tới các service này
+for key, value in {
+    "DATABASE_URL": "sqlite+aiosqlite:///:memory:",
+    "SECRET_KEY": "test",
+    "GOOGLE_CLIENT_ID": "test",
+    "GOOGLE_API_KEY": "test",
+    "MINIO_ENDPOINT": "localhost:9000",
+    "MINIO_ACCESS_KEY": "test",
+    "MINIO_SECRET_KEY": "test",
+    "MINIO_BUCKET_NAME": "test",
+}.items():
+    os.environ.setdefault(key, value)
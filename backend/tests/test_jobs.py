@@ -0,0 +1,252 @@
+"""
+JobRunner trên SQLite (aiosqlite): claim, lease hết hạn, retry backoff, on_failure.
+"""
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import update
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.models.job import Job, JobStatus
+from app.services.jobs import JobContext, JobRunner, enqueue_job
+
+JOB_TYPE = "test.job"
+
+
+@pytest.fixture
+async def session_factory(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'jobs.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Job.__table__.create)
+    yield sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+    await engine.dispose()
+
+
+def make_runner(session_factory, worker_id, handler=None, on_failure=None, **kwargs) -> JobRunner:
+    runner = JobRunner(JobContext(session_factory=session_factory), worker_id=worker_id, **kwargs)
+
+    async def noop(payload, context):
+        pass
+
+    runner.register(JOB_TYPE, handler or noop, on_failure=on_failure)
+    return runner
+
+
+async def add_jobs(session_factory, count=1, max_attempts=3):
+    async with session_factory() as db:
+        jobs = [enqueue_job(db, JOB_TYPE, {"n": n}, max_attempts=max_attempts) for n in range(count)]
+        await db.commit()
+        return [job.id for job in jobs]
+
+
+async def load(session_factory, job_id) -> Job:
+    async with session_factory() as db:
+        return await db.get(Job, job_id)
+
+
+async def test_claim_is_exclusive_between_workers(session_factory):
+    ids = await add_jobs(session_factory, count=3)
+    first = make_runner(session_factory, "worker-a")
+    second = make_runner(session_factory, "worker-b")
+
+    claimed_a = await first._claim(JOB_TYPE, 2)
+    claimed_b = await second._claim(JOB_TYPE, 2)
+
+    assert [job.id for job in claimed_a] == ids[:2]
+    assert [job.id for job in claimed_b] == ids[2:]
+    assert await first._claim(JOB_TYPE, 2) == []
+    for job in claimed_a:
+        assert job.status == JobStatus.RUNNING
+        assert job.locked_by == "worker-a"
+        assert job.attempts == 1
+        assert job.lease_expires_at > datetime.utcnow()
+
+
+async def test_claim_skips_jobs_before_run_after(session_factory):
+    [job_id] = await add_jobs(session_factory)
+    async with session_factory() as db:
+        await db.execute(
+            update(Job).where(Job.id == job_id).values(run_after=datetime.utcnow() + timedelta(minutes=5))
+        )
+        await db.commit()
+
+    assert await make_runner(session_factory, "worker-a")._claim(JOB_TYPE, 1) == []
+
+
+async def test_expired_lease_is_claimed_by_another_worker(session_factory):
+    [job_id] = await add_jobs(session_factory)
+    first = make_runner(session_factory, "worker-a")
+    second = make_runner(session_factory, "worker-b")
+
+    assert len(await first._claim(JOB_TYPE, 1)) == 1
+    # Lease còn hạn: worker khác không nhận được
+    assert await second._claim(JOB_TYPE, 1) == []
+
+    async with session_factory() as db:
+        await db.execute(
+            update(Job).where(Job.id == job_id).values(lease_expires_at=datetime.utcnow() - timedelta(seconds=1))
+        )
+        await db.commit()
+
+    [job] = await second._claim(JOB_TYPE, 1)
+    assert job.locked_by == "worker-b"
+    assert job.attempts == 2
+
+    # Worker cũ không còn giữ lease nên không ghi đè được kết quả
+    await first._update_own(job_id, status=JobStatus.SUCCEEDED)
+    job = await load(session_factory, job_id)
+    assert job.status == JobStatus.RUNNING
+    assert job.locked_by == "worker-b"
+
+
+async def test_failed_job_is_retried_with_exponential_backoff(session_factory):
+    [job_id] = await add_jobs(session_factory, max_attempts=3)
+
+    async def fail(payload, context):
+        raise RuntimeError("boom")
+
+    runner = make_runner(session_factory, "worker-a", handler=fail, retry_backoff_seconds=30)
+    spec = runner._job_types[JOB_TYPE]
+
+    for attempt, delay in ((1, 30), (2, 60)):
+        before = datetime.utcnow()
+        [job] = await runner._claim(JOB_TYPE, 1)
+        assert job.attempts == attempt
+        await runner._execute(spec, job)
+
+        job = await load(session_factory, job_id)
+        assert job.status == JobStatus.QUEUED
+        assert job.last_error == "boom"
+        assert job.locked_by is None and job.lease_expires_at is None
+        assert before + timedelta(seconds=delay) <= job.run_after <= datetime.utcnow() + timedelta(seconds=delay)
+        # Chưa đến run_after: không được nhận lại
+        assert await runner._claim(JOB_TYPE, 1) == []
+
+        async with session_factory() as db:
+            await db.execute(update(Job).where(Job.id == job_id).values(run_after=datetime.utcnow()))
+            await db.commit()
+
+
+async def test_on_failure_runs_after_last_attempt(session_factory):
+    [job_id] = await add_jobs(session_factory, max_attempts=2)
+    failures = []
+
+    async def fail(payload, context):
+        raise RuntimeError(f"boom {payload['n']}")
+
+    async def on_failure(payload, context, error):
+        failures.append((payload, error))
+
+    runner = make_runner(session_factory, "worker-a", handler=fail, on_failure=on_failure, retry_backoff_seconds=0)
+    spec = runner._job_types[JOB_TYPE]
+
+    [job] = await runner._claim(JOB_TYPE, 1)
+    await runner._execute(spec, job)
+    assert failures == []
+
+    [job] = await runner._claim(JOB_TYPE, 1)
+    await runner._execute(spec, job)
+
+    assert failures == [({"n": 0}, "boom 0")]
+    job = await load(session_factory, job_id)
+    assert job.status == JobStatus.FAILED
+    assert job.attempts == 2
+    assert await runner._claim(JOB_TYPE, 1) == []
+
+
+async def test_job_reclaimed_too_many_times_fails_without_running(session_factory):
+    [job_id] = await add_jobs(session_factory, max_attempts=1)
+    calls, failures = [], []
+
+    async def handler(payload, context):
+        calls.append(payload)
+
+    async def on_failure(payload, context, error):
+        failures.append(error)
+
+    runner = make_runner(session_factory, "worker-a", handler=handler, on_failure=on_failure)
+    spec = runner._job_types[JOB_TYPE]
+
+    # Worker trước đã nhận job rồi chết (lease hết hạn)
+    async with session_factory() as db:
+        await db.execute(
+            update(Job).where(Job.id == job_id).values(
+                status=JobStatus.RUNNING,
+                attempts=1,
+                locked_by="dead-worker",
+                lease_expires_at=datetime.utcnow() - timedelta(seconds=1),
+            )
+        )
+        await db.commit()
+
+    [job] = await runner._claim(JOB_TYPE, 1)
+    await runner._execute(spec, job)
+
+    assert calls == []
+    assert failures == ["Lease expired too many times"]
+    assert (await load(session_factory, job_id)).status == JobStatus.FAILED
+
+
+async def test_stop_releases_running_jobs(session_factory):
+    [job_id] = await add_jobs(session_factory)
+    runner = make_runner(session_factory, "worker-a")
+
+    await runner._claim(JOB_TYPE, 1)
+    await runner.stop()
+
+    job = await load(session_factory, job_id)
+    assert job.status == JobStatus.QUEUED
+    assert job.attempts == 0
+    assert job.locked_by is None
+
+
+async def test_runner_executes_notified_jobs(session_factory):
+    done = []
+
+    async def handler(payload, context):
+        done.append(payload["n"])
+
+    runner = make_runner(session_factory, "worker-a", handler=handler, poll_interval=60)
+    await runner.start()
+    try:
+        [job_id] = await add_jobs(session_factory)
+        runner.notify()
+        for _ in range(100):
+            if (await load(session_factory, job_id)).status == JobStatus.SUCCEEDED:
+                break
+            await asyncio.sleep(0.05)
+    finally:
+        await runner.stop()
+
+    assert done == [0]
+    assert (await load(session_factory, job_id)).status == JobStatus.SUCCEEDED
+
+
+async def test_lost_lease_cancels_handler_without_finishing_job(session_factory):
+    [job_id] = await add_jobs(session_factory)
+    cancelled = asyncio.Event()
+
+    async def handler(payload, context):
+        try:
+            await asyncio.sleep(60)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    # Heartbeat mỗi giây (lease_seconds / 3, tối thiểu 1 giây)
+    runner = make_runner(session_factory, "worker-a", handler=handler, lease_seconds=3)
+    [job] = await runner._claim(JOB_TYPE, 1)
+    execution = asyncio.create_task(runner._execute(runner._job_types[JOB_TYPE], job))
+
+    # Lease hết hạn và worker khác đã nhận lại job
+    async with session_factory() as db:
+        await db.execute(update(Job).where(Job.id == job_id).values(locked_by="worker-b", attempts=2))
+        await db.commit()
+
+    await asyncio.wait_for(execution, timeout=5)
+    assert cancelled.is_set()
+    job = await load(session_factory, job_id)
+    assert job.status == JobStatus.RUNNING
+    assert job.locked_by == "worker-b"
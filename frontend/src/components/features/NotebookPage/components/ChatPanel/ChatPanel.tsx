@@ -1,9 +1,10 @@
 'use client';
 
-import { useState, useEffect } from 'react';
+import { useState, useEffect, useMemo } from 'react';
 import ChatInput from './components/ChatInput';
 import MessageList from './components/MessageList';
-import { Message } from '@/types';
+import SourceScope from './components/SourceScope';
+import { DocumentSource, Message } from '@/types';
 import { toast } from 'react-toastify';
 import { chatService } from '@/services/chatService';
 import { documentService } from '@/services/documentService';
@@ -16,6 +17,7 @@ import { useIsMobile } from '@/hooks';
 export default function ChatPanel() {
     const [messages, setMessages] = useState<Message[]>([]);
     const [isLoading, setIsLoading] = useState(false);
+    const [selectedDocIds, setSelectedDocIds] = useState<number[]>([]);
     const dispatch = useAppDispatch();
     const queryClient = useQueryClient();
     const { sessionId } = useAppSelector((state) => state.ui);
@@ -30,12 +32,31 @@ export default function ChatPanel() {
     });
 
     // Fetch documents for citation lookup (uses cache)
-    const { data: documents = [] } = useQuery({
+    const { data: documents = [] } = useQuery<DocumentSource[]>({
         queryKey: queryKeys.notebooks.documents(sessionId),
         queryFn: () => documentService.getChatDocuments(sessionId),
         enabled: !!sessionId,
     });
 
+    // Only indexed documents can be searched
+    const searchableDocuments = useMemo(
+        () => documents.filter((doc) => !doc.status || doc.status === 'indexed'),
+        [documents]
+    );
+
+    // Reset the source scope when switching notebooks
+    useEffect(() => {
+        setSelectedDocIds([]);
+    }, [sessionId]);
+
+    // Drop documents that were deleted from the selection
+    useEffect(() => {
+        setSelectedDocIds((prev) => {
+            const next = prev.filter((id) => searchableDocuments.some((doc) => doc.id === id));
+            return next.length === prev.length ? prev : next;
+        });
+    }, [searchableDocuments]);
+
     // Initialize messages from session data
     useEffect(() => {
         if (session?.messages) {
@@ -77,7 +98,7 @@ export default function ChatPanel() {
         setIsLoading(true);
 
         try {
-            const response = await chatService.sendMessage(sessionId, text);
+            const response = await chatService.sendMessage(sessionId, text, true, selectedDocIds);
 
             const aiMsg: Message = {
                 id: response.id.toString(),
@@ -116,7 +137,18 @@ export default function ChatPanel() {
                 className="flex-1 min-h-0"
                 userInfo={user ? { name: user.name, picture: user.picture } : undefined}
             />
-            <ChatInput onSend={handleSend} isLoading={isLoading} />
+            <ChatInput
+                onSend={handleSend}
+                isLoading={isLoading}
+                toolbar={
+                    <SourceScope
+                        documents={searchableDocuments}
+                        selectedIds={selectedDocIds}
+                        onSelectionChange={setSelectedDocIds}
+                        disabled={isLoading}
+                    />
+                }
+            />
         </div>
     );
 }
@@ -1,6 +1,6 @@
 'use client';
 
-import { useState, KeyboardEvent } from 'react';
+import { useState, KeyboardEvent, ReactNode } from 'react';
 import { Button } from '@/components/ui/button';
 import { Textarea } from '@/components/ui/textarea';
 import { SendHorizontal } from 'lucide-react';
@@ -8,9 +8,11 @@ import { SendHorizontal } from 'lucide-react';
 interface ChatInputProps {
     onSend: (message: string) => void;
     isLoading?: boolean;
+    // Rendered above the input, e.g. source scope
+    toolbar?: ReactNode;
 }
 
-export default function ChatInput({ onSend, isLoading }: ChatInputProps) {
+export default function ChatInput({ onSend, isLoading, toolbar }: ChatInputProps) {
     const [input, setInput] = useState('');
 
     const handleSend = () => {
@@ -28,18 +30,21 @@ export default function ChatInput({ onSend, isLoading }: ChatInputProps) {
     };
 
     return (
-        <div className="flex items-end gap-2 p-4 border-t bg-white dark:bg-gray-950">
-            <Textarea
-                value={input}
-                onChange={(e) => setInput(e.target.value)}
-                onKeyDown={handleKeyDown}
-                placeholder="Type a message..."
-                className="min-h-[50px] max-h-[150px] resize-none"
-                disabled={isLoading}
-            />
-            <Button onClick={handleSend} disabled={!input.trim() || isLoading} size="icon">
-                <SendHorizontal size={18} />
-            </Button>
+        <div className="p-4 border-t bg-white dark:bg-gray-950">
+            {toolbar && <div className="mb-2">{toolbar}</div>}
+            <div className="flex items-end gap-2">
+                <Textarea
+                    value={input}
+                    onChange={(e) => setInput(e.target.value)}
+                    onKeyDown={handleKeyDown}
+                    placeholder="Type a message..."
+                    className="min-h-[50px] max-h-[150px] resize-none"
+                    disabled={isLoading}
+                />
+                <Button onClick={handleSend} disabled={!input.trim() || isLoading} size="icon">
+                    <SendHorizontal size={18} />
+                </Button>
+            </div>
         </div>
     );
 }
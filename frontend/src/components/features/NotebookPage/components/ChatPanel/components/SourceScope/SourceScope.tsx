@@ -0,0 +1,67 @@
+'use client';
+
+import { Button } from '@/components/ui/button';
+import {
+    DropdownMenu,
+    DropdownMenuCheckboxItem,
+    DropdownMenuContent,
+    DropdownMenuItem,
+    DropdownMenuLabel,
+    DropdownMenuSeparator,
+    DropdownMenuTrigger,
+} from '@/components/ui/dropdown-menu';
+import { ChevronDown, FileText } from 'lucide-react';
+import { DocumentSource } from '@/types';
+
+interface SourceScopeProps {
+    documents: DocumentSource[];
+    selectedIds: number[];
+    onSelectionChange: (ids: number[]) => void;
+    disabled?: boolean;
+}
+
+// Limits chat answers to the checked documents; nothing checked means all sources
+export default function SourceScope({ documents, selectedIds, onSelectionChange, disabled }: SourceScopeProps) {
+    const toggleDocument = (docId: number) => {
+        onSelectionChange(
+            selectedIds.includes(docId)
+                ? selectedIds.filter((id) => id !== docId)
+                : [...selectedIds, docId]
+        );
+    };
+
+    const label = selectedIds.length === 0
+        ? 'All sources'
+        : `${selectedIds.length} of ${documents.length} sources`;
+
+    return (
+        <DropdownMenu>
+            <DropdownMenuTrigger asChild>
+                <Button variant="ghost" size="sm" className="h-7 gap-1.5 text-xs text-muted-foreground" disabled={disabled || documents.length === 0}>
+                    <FileText size={14} />
+                    {label}
+                    <ChevronDown size={14} />
+                </Button>
+            </DropdownMenuTrigger>
+            <DropdownMenuContent align="start" className="w-64">
+                <DropdownMenuLabel>Answer from</DropdownMenuLabel>
+                <DropdownMenuSeparator />
+                <DropdownMenuItem onSelect={() => onSelectionChange([])}>
+                    All sources
+                </DropdownMenuItem>
+                {documents.map((doc) => (
+                    <DropdownMenuCheckboxItem
+                        key={doc.id}
+                        checked={selectedIds.includes(doc.id)}
+                        // Keep the menu open to pick several documents
+                        onSelect={(e) => e.preventDefault()}
+                        onCheckedChange={() => toggleDocument(doc.id)}
+                        title={doc.filename || doc.name}
+                    >
+                        <span className="truncate">{doc.filename || doc.name}</span>
+                    </DropdownMenuCheckboxItem>
+                ))}
+            </DropdownMenuContent>
+        </DropdownMenu>
+    );
+}
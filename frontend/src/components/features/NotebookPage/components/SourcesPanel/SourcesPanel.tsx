@@ -1,6 +1,6 @@
 'use client';
 
-import { useState } from 'react';
+import { useEffect, useRef, useState } from 'react';
 import { Button } from '@/components/ui/button';
 import { ScrollArea } from '@/components/ui/scroll-area';
 import { Plus, FolderOpen } from 'lucide-react';
@@ -27,8 +27,26 @@ export default function SourcesPanel() {
         queryKey: queryKeys.notebooks.documents(sessionId),
         queryFn: () => documentService.getChatDocuments(sessionId),
         enabled: !!sessionId,
+        // Poll while uploads are being indexed in the background
+        refetchInterval: (query) =>
+            query.state.data?.some((doc) => doc.status === 'pending') ? 3000 : false,
     });
 
+    // Notify when a pending document finishes indexing
+    const previousStatuses = useRef<Record<number, string | undefined>>({});
+    useEffect(() => {
+        for (const doc of documents) {
+            if (previousStatuses.current[doc.id] === 'pending') {
+                if (doc.status === 'indexed') {
+                    toast.success(`${doc.filename || doc.name} is ready`);
+                } else if (doc.status === 'failed') {
+                    toast.error(`Failed to process ${doc.filename || doc.name}`);
+                }
+            }
+        }
+        previousStatuses.current = Object.fromEntries(documents.map((doc) => [doc.id, doc.status]));
+    }, [documents]);
+
     // Upload document mutation
     const uploadMutation = useMutation({
         mutationFn: (file: File) => documentService.uploadFile(sessionId, file),
@@ -6,8 +6,9 @@ import { documentService } from '@/services/documentService';
 import { useAppDispatch, useAppSelector } from '@/store';
 import { selectSource } from '@/store/features/uiSlice';
 import { useMutation, useQueryClient } from '@tanstack/react-query';
-import { FileText, Trash2 } from 'lucide-react';
+import { AlertCircle, FileText, Loader2, Trash2 } from 'lucide-react';
 import { toast } from 'react-toastify';
+import { DocumentStatus } from '@/types';
 
 interface SourceItemProps {
     source: {
@@ -15,6 +16,7 @@ interface SourceItemProps {
         filename?: string;
         name?: string;
         created_at?: string;
+        status?: DocumentStatus;
     };
     isSelected: boolean;
     onClick: () => void;
@@ -66,9 +68,21 @@ export default function SourceItem({ source, isSelected, onClick }: SourceItemPr
                 <p className={`text-sm font-medium truncate ${isSelected ? 'text-foreground' : 'text-muted-foreground group-hover:text-foreground'}`}>
                     {source.filename || source.name}
                 </p>
-                <p className="text-[10px] text-muted-foreground/70 truncate">
-                    {source.created_at ? new Date(source.created_at).toLocaleDateString('vi-VN') : ''}
-                </p>
+                {source.status === 'pending' ? (
+                    <p className="flex items-center gap-1 text-[10px] text-muted-foreground/70 truncate">
+                        <Loader2 size={10} className="animate-spin" />
+                        Processing...
+                    </p>
+                ) : source.status === 'failed' ? (
+                    <p className="flex items-center gap-1 text-[10px] text-destructive truncate">
+                        <AlertCircle size={10} />
+                        Processing failed
+                    </p>
+                ) : (
+                    <p className="text-[10px] text-muted-foreground/70 truncate">
+                        {source.created_at ? new Date(source.created_at).toLocaleDateString('vi-VN') : ''}
+                    </p>
+                )}
             </div>
             <Button
                 variant="ghost"
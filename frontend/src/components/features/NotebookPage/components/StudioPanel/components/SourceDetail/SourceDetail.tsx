@@ -1,6 +1,7 @@
 'use client';
 
 import { useRef, useEffect } from 'react';
+import { useQuery } from '@tanstack/react-query';
 import { Button } from '@/components/ui/button';
 import { ScrollArea } from '@/components/ui/scroll-area';
 import { Tabs, TabsContent, TabsList, TabsTrigger } from '@/components/ui/tabs';
@@ -9,6 +10,8 @@ import ReactMarkdown from 'react-markdown';
 import remarkGfm from 'remark-gfm';
 import { useAppDispatch, useAppSelector } from '@/store';
 import { selectSource, setHighlightRange } from '@/store/features/uiSlice';
+import { documentService } from '@/services/documentService';
+import { queryKeys } from '@/lib/queryKeys';
 import SummaryPanel from '../SummaryPanel';
 
 interface SourceDetailProps {
@@ -38,11 +41,20 @@ export default function SourceDetail({ source, highlightRange }: SourceDetailPro
     const scrollAreaRef = useRef<HTMLDivElement>(null);
     const highlightRef = useRef<HTMLSpanElement>(null);
 
+    // Document list only carries metadata; load the text when a source is opened
+    const { data: contentData, isLoading: isLoadingContent } = useQuery({
+        queryKey: queryKeys.notebooks.documentContent(sessionId, source?.id ?? 0),
+        queryFn: () => documentService.getDocumentContent(sessionId, source!.id),
+        enabled: !!source && !!sessionId && !source.content,
+        staleTime: 5 * 60 * 1000, // Cache for 5 minutes
+    });
+    const content = source?.content ?? contentData?.content;
+
     useEffect(() => {
         if (highlightRange && highlightRef.current) {
             highlightRef.current.scrollIntoView({ behavior: 'smooth', block: 'center' });
         }
-    }, [highlightRange, source]);
+    }, [highlightRange, source, content]);
 
     if (!source) {
         return (
@@ -57,32 +69,33 @@ export default function SourceDetail({ source, highlightRange }: SourceDetailPro
     }
 
     const renderContent = () => {
-        if (!source.content) return <p className="italic text-muted-foreground">No content available for this source.</p>;
+        if (isLoadingContent) return <p className="italic text-muted-foreground">Loading content...</p>;
+        if (!content) return <p className="italic text-muted-foreground">No content available for this source.</p>;
 
         if (!highlightRange) {
             return (
                 <div className="whitespace-pre-wrap leading-relaxed text-sm">
                     <ReactMarkdown remarkPlugins={[remarkGfm]}>
-                        {source.content}
+                        {content}
                     </ReactMarkdown>
                 </div>
             );
         }
 
         const { start, end } = highlightRange;
-        if (start < 0 || end > source.content.length || start >= end) {
+        if (start < 0 || end > content.length || start >= end) {
             return (
                 <div className="whitespace-pre-wrap leading-relaxed text-sm">
                     <ReactMarkdown remarkPlugins={[remarkGfm]}>
-                        {source.content}
+                        {content}
                     </ReactMarkdown>
                 </div>
             );
         }
 
-        const before = source.content.substring(0, start);
-        const highlighted = source.content.substring(start, end);
-        const after = source.content.substring(end);
+        const before = content.substring(0, start);
+        const highlighted = content.substring(start, end);
+        const after = content.substring(end);
 
         return (
             <div className="whitespace-pre-wrap leading-relaxed text-sm">
@@ -5,6 +5,8 @@ export const queryKeys = {
         list: (page: number = 1) => [...queryKeys.notebooks.all, 'list', page] as const,
         detail: (id: string | number) => [...queryKeys.notebooks.all, 'detail', id] as const,
         documents: (id: string | number) => [...queryKeys.notebooks.all, 'documents', id] as const,
+        documentContent: (sessionId: string | number, documentId: number) =>
+            [...queryKeys.notebooks.all, 'documentContent', sessionId, documentId] as const,
         chapters: (sessionId: string | number, documentId: number) =>
             [...queryKeys.notebooks.all, 'chapters', sessionId, documentId] as const,
         summary: (sessionId: string | number, documentId: number, scope: string, format: string, chapterIndex?: number) =>
@@ -22,10 +22,11 @@ export const chatService = {
         return response.data;
     },
 
-    async sendMessage(sessionId: string, question: string, useRag: boolean = true) {
+    async sendMessage(sessionId: string, question: string, useRag: boolean = true, documentIds?: number[]) {
         const response = await api.post(`/chats/${sessionId}/messages`, {
             question,
-            use_rag: useRag
+            use_rag: useRag,
+            ...(documentIds && documentIds.length > 0 ? { document_ids: documentIds } : {})
         });
         return response.data;
     },
@@ -1,5 +1,5 @@
 import api from './api';
-import { SummaryRequest, SummaryResponse, ChaptersResponse } from '@/types';
+import { SummaryRequest, SummaryResponse, ChaptersResponse, DocumentContentChunk, DocumentContentParams } from '@/types';
 
 export const documentService = {
     async uploadFile(sessionId: string, file: File) {
@@ -19,6 +19,15 @@ export const documentService = {
         return response.data;
     },
 
+    async getDocumentContent(
+        sessionId: string,
+        documentId: number,
+        params?: DocumentContentParams
+    ): Promise<DocumentContentChunk> {
+        const response = await api.get(`/chats/${sessionId}/documents/${documentId}/content`, { params });
+        return response.data;
+    },
+
     async deleteDocument(sessionId: string, documentId: number) {
         await api.delete(`/chats/${sessionId}/documents/${documentId}`);
     },
@@ -15,6 +15,9 @@ export interface ChatSessionDetail extends Notebook {
   documents?: DocumentSource[];
 }
 
+// Ingestion status of an uploaded document
+export type DocumentStatus = 'pending' | 'indexed' | 'failed';
+
 // Document source type for notebook documents
 export interface DocumentSource {
   id: number;
@@ -23,4 +26,27 @@ export interface DocumentSource {
   created_at?: string;
   content?: string;
   type?: string;
+  status?: DocumentStatus;
+  content_length?: number | null;
+  page_count?: number | null;
+}
+
+// A character or page range of a document's extracted text
+export interface DocumentContentChunk {
+  document_id: number;
+  content: string;
+  start_char: number;
+  end_char: number;
+  total_length: number;
+  page_start?: number | null;
+  page_end?: number | null;
+  total_pages: number;
+  page_offsets: number[];
+}
+
+export interface DocumentContentParams {
+  start?: number;
+  end?: number;
+  page?: number;
+  page_count?: number;
 }